@@ -0,0 +1,234 @@
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Container, Dict, Mapping, Optional, TextIO
+
+import attr
+
+from bento.result import VIOLATIONS_KEY, Hash, load_baseline
+
+SCHEMA_VERSION = "1"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS tools (tool_id TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS findings (
+    tool_id TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (tool_id, hash)
+) WITHOUT ROWID;
+"""
+
+
+def _render(finding: Mapping[str, Any]) -> str:
+    """
+    Renders a finding as it appears in the JSON archive (before indentation)
+    """
+    return json.dumps(finding, indent=2)
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class ArchivedHashes(Container[Hash]):
+    """
+    The hashes of a tool's archived findings, looked up individually in the archive index
+    """
+
+    store: "ArchiveStore"
+    tool_id: str
+
+    def __contains__(self, h: object) -> bool:
+        return isinstance(h, str) and self.store.contains(self.tool_id, h)
+
+
+@attr.s
+class ArchiveStore:
+    """
+    Indexes the archive (the baseline of findings hidden from `bento check`)
+
+    The archive is shared as a JSON file (`.bento/archive.json`), which is
+    imported into a local SQLite index whenever the JSON file changes (e.g. when
+    it is modified by a git pull). Lookups and additions use the index, so their
+    cost does not grow with the size of the archive; the JSON file is exported
+    from the index after findings are archived.
+
+    Access is threadsafe.
+    """
+
+    index_path = attr.ib(type=Path)
+    json_path = attr.ib(type=Path)
+    _lock = attr.ib(type=threading.Lock, factory=threading.Lock, init=False)
+    _connection = attr.ib(type=Optional[sqlite3.Connection], default=None, init=False)
+    _modified = attr.ib(type=bool, default=False, init=False)
+
+    def _json_state(self) -> str:
+        """
+        Returns an identifier of the JSON file's current state
+        """
+        try:
+            stat = self.json_path.stat()
+        except OSError:
+            return ""
+        return f"{stat.st_ino}:{stat.st_mtime_ns}:{stat.st_size}"
+
+    def _get_meta(self, connection: sqlite3.Connection, key: str) -> Optional[str]:
+        row = connection.execute("SELECT value FROM meta WHERE key = ?", (key,))
+        found = row.fetchone()
+        return found[0] if found else None
+
+    def _set_meta(self, connection: sqlite3.Connection, key: str, value: str) -> None:
+        connection.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Returns a connection to the index, importing the JSON file if it changed
+        """
+        if self._connection is not None:
+            return self._connection
+
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            connection = self._open_index()
+        except sqlite3.DatabaseError as e:
+            # A corrupt index can always be rebuilt from the JSON file
+            logging.warning(f"Rebuilding archive index {self.index_path}: {e}")
+            self.index_path.unlink()
+            connection = self._open_index()
+
+        self._connection = connection
+        return connection
+
+    def _open_index(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(str(self.index_path), check_same_thread=False)
+        try:
+            with connection:
+                connection.executescript(_SCHEMA)
+                json_state = self._json_state()
+                if (
+                    self._get_meta(connection, "schema") != SCHEMA_VERSION
+                    or self._get_meta(connection, "json_state") != json_state
+                ):
+                    self._import(connection)
+                    self._set_meta(connection, "schema", SCHEMA_VERSION)
+                    self._set_meta(connection, "json_state", json_state)
+        except sqlite3.DatabaseError:
+            connection.close()
+            raise
+        return connection
+
+    def _import(self, connection: sqlite3.Connection) -> None:
+        logging.info(f"Indexing archive {self.json_path}")
+        connection.execute("DELETE FROM tools")
+        connection.execute("DELETE FROM findings")
+        if not self.json_path.exists():
+            return
+        with self.json_path.open() as stream:
+            archive = load_baseline(stream)
+        for tool_id, results in archive.items():
+            connection.execute("INSERT INTO tools VALUES (?)", (tool_id,))
+            violations = results.get(VIOLATIONS_KEY) or {}
+            connection.executemany(
+                "INSERT OR IGNORE INTO findings VALUES (?, ?, ?)",
+                ((tool_id, h, _render(v)) for h, v in violations.items()),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def baseline(self) -> Dict[str, Container[Hash]]:
+        """
+        Returns the hashes of archived findings, by tool ID
+        """
+        with self._lock:
+            connection = self._connect()
+            tool_ids = [r[0] for r in connection.execute("SELECT tool_id FROM tools")]
+        return {t: ArchivedHashes(self, t) for t in tool_ids}
+
+    def contains(self, tool_id: str, h: Hash) -> bool:
+        """
+        Returns whether a finding is archived
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT 1 FROM findings WHERE tool_id = ? AND hash = ?", (tool_id, h)
+            )
+            return row.fetchone() is not None
+
+    def add(self, tool_id: str, findings: Mapping[Hash, Mapping[str, Any]]) -> int:
+        """
+        Archives findings for a tool, returning the number of newly archived findings
+
+        :param findings: Finding data, by hash, as produced by Violation.to_dict
+        """
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                before = connection.total_changes
+                connection.execute("INSERT OR IGNORE INTO tools VALUES (?)", (tool_id,))
+                tools_changed = connection.total_changes - before
+                connection.executemany(
+                    "INSERT OR IGNORE INTO findings VALUES (?, ?, ?)",
+                    ((tool_id, h, _render(v)) for h, v in findings.items()),
+                )
+                added = connection.total_changes - before - tools_changed
+            if tools_changed or added:
+                self._modified = True
+            return added
+
+    def export(self, stream: TextIO) -> None:
+        """
+        Writes the archive as JSON, in the format of bento.result.write_tool_results
+
+        Tools and findings are sorted, so that exports are stable.
+        """
+        with self._lock:
+            connection = self._connect()
+            tool_ids = [
+                r[0]
+                for r in connection.execute(
+                    "SELECT tool_id FROM tools ORDER BY tool_id"
+                )
+            ]
+            # Equivalent to json.dump(..., indent=2) of the whole archive, but
+            # streams findings, which are stored pre-rendered
+            stream.write("{")
+            for ix, tool_id in enumerate(tool_ids):
+                separator = "," if ix else ""
+                stream.write(
+                    f"{separator}\n  {json.dumps(tool_id)}: {{\n    {json.dumps(VIOLATIONS_KEY)}: {{"
+                )
+                rows = connection.execute(
+                    "SELECT hash, data FROM findings WHERE tool_id = ? ORDER BY hash",
+                    (tool_id,),
+                )
+                n_rows = 0
+                for h, data in rows:
+                    separator = "," if n_rows else ""
+                    indented = data.replace("\n", "\n      ")
+                    stream.write(f"{separator}\n      {json.dumps(h)}: {indented}")
+                    n_rows += 1
+                stream.write("\n    }\n  }" if n_rows else "}\n  }")
+            stream.write("\n}" if tool_ids else "}")
+
+    def save(self) -> bool:
+        """
+        Exports the archive to its JSON file, if findings were archived since it was imported
+
+        Returns whether the JSON file was written.
+        """
+        if not self._modified and self.json_path.exists():
+            return False
+        self.json_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.json_path.open("w") as stream:
+            self.export(stream)
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                self._set_meta(connection, "json_state", self._json_state())
+            self._modified = False
+        return True
@@ -1,3 +1,4 @@
+import copy
 import logging
 from pathlib import Path
 from threading import Lock
@@ -8,7 +9,12 @@ import yaml
 
 import bento.constants as constants
 import bento.git
+import bento.tracing as tracing
+from bento.archive_store import ArchiveStore
+from bento.file_classifier import FileClassifier
+from bento.install_manifest import InstallManifest
 from bento.run_cache import RunCache
+from bento.scheduler import Scheduler, default_jobs
 
 
 def _clean_path(path: Union[str, Path]) -> Path:
@@ -27,7 +33,15 @@ class BaseContext:
     cache_path = attr.ib(type=Path, default=None)
     _config = attr.ib(type=Dict[str, Any], default=None)
     _resource_path = attr.ib(type=Path, default=None)
+    # Maximum number of concurrently running tool subprocesses
+    jobs = attr.ib(type=Optional[int], default=None)
+    # For a view of an overlay of a project (see at), the project's own base path
+    linked_path = attr.ib(type=Optional[Path], default=None)
     _cache = attr.ib(type=RunCache, default=None, init=False)
+    _scheduler = attr.ib(type=Scheduler, default=None, init=False)
+    _install_manifest = attr.ib(type=InstallManifest, default=None, init=False)
+    _archive = attr.ib(type=ArchiveStore, default=None, init=False)
+    _file_classifier = attr.ib(type=FileClassifier, default=None, init=False)
     _ignore_lock = attr.ib(type=Lock, factory=Lock, init=False)
 
     @base_path.default
@@ -90,6 +104,24 @@ class BaseContext:
         except ValueError:
             return path
 
+    def at(self, base_path: Path) -> "BaseContext":
+        """
+        Returns a view of this context for an overlay of this project at base_path,
+        whose entries link into this project
+
+        The view shares this context's configuration, cache, and scheduler, so that
+        tools run on the overlay as they do on the project.
+        """
+        # Load shared state first, so that the view does not load its own
+        self.resource_path
+        self.config
+        self.cache
+        self.scheduler
+        view = copy.copy(self)
+        view.base_path = _clean_path(base_path)
+        view.linked_path = self.base_path
+        return view
+
     def __attrs_post_init__(self) -> None:
         # We need to make sure the resource directory exists prior to creating the FileIgnore object,
         # otherwise it won't be detected in its directory scan.
@@ -113,6 +145,17 @@ class BaseContext:
         """
         return self.config.get("autorun", {}).get("block", False)
 
+    @property
+    def target_index_path(self) -> Optional[Path]:
+        """
+        Returns where to persist the walk of this project's files, if enabled
+
+        Enabled by setting `targets: {index: true}` in this project's configuration.
+        """
+        if not self.config.get("targets", {}).get("index", False):
+            return None
+        return self.cache.cache_dir / constants.TARGET_INDEX_FILE_NAME
+
     @property
     def cache(self) -> RunCache:
         if self._cache is None:
@@ -120,12 +163,42 @@ class BaseContext:
             self._cache = RunCache(cache_dir=cp)
         return self._cache
 
+    @property
+    def scheduler(self) -> Scheduler:
+        if self._scheduler is None:
+            self._scheduler = Scheduler(
+                jobs=self.jobs or default_jobs(),
+                history_path=self.cache.cache_dir / constants.DURATIONS_FILE_NAME,
+            )
+        return self._scheduler
+
+    @property
+    def archive(self) -> ArchiveStore:
+        if self._archive is None:
+            self._archive = ArchiveStore(
+                index_path=self.cache.cache_dir / constants.ARCHIVE_INDEX_FILE_NAME,
+                json_path=self.baseline_file_path,
+            )
+        return self._archive
+
+    @property
+    def file_classifier(self) -> FileClassifier:
+        if self._file_classifier is None:
+            self._file_classifier = FileClassifier()
+        return self._file_classifier
+
+    @property
+    def install_manifest(self) -> InstallManifest:
+        if self._install_manifest is None:
+            self._install_manifest = InstallManifest(constants.INSTALL_MANIFEST_PATH)
+        return self._install_manifest
+
     def _open_config(self) -> Dict[str, Any]:
         """
         Opens this project's configuration file
         """
         logging.info(f"Loading bento configuration from {self.config_path}")
-        with self.config_path.open() as yaml_file:
+        with tracing.span("context.config"), self.config_path.open() as yaml_file:
             return yaml.safe_load(yaml_file)
 
     def _write_config(self, config: Dict[str, Any]) -> None:
@@ -0,0 +1,302 @@
+"""
+Binary, versioned, on-disk format for cached tool results
+
+A cache file holds one tool's results, for each file the tool ran on. It is laid
+out as (all integers little-endian):
+
+  - a header (see _HEADER)
+  - a string table: (string count + 1) offsets into the string data, followed
+    by the UTF-8 string data; every string in the file (tool and check IDs,
+    paths, messages, ...) is stored once, and referenced by its index
+  - one fixed-width record per file (see _FILE), referencing a contiguous
+    range of finding records
+  - one fixed-width record per finding (see _ROW)
+
+Cache files are memory-mapped, and strings and findings are only decoded when
+accessed, so that looking up a few files in a large cache is fast.
+"""
+import mmap
+import struct
+from pathlib import Path
+from typing import Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+from bento.violation import Violation
+
+MAGIC = b"BNTC"
+FORMAT_VERSION = 1
+
+# magic, format version, Bento version string, tool key string, string count,
+# file count, finding count
+_HEADER = struct.Struct("<4sHIIIII")
+_OFFSET = struct.Struct("<Q")
+# path string, mtime (ns), size, content digest, first finding, finding count
+_FILE = struct.Struct("<Iqq16sII")
+# tool ID, check ID, path, line, column, message, severity, syntactic context,
+# filtered, link, syntactic identifier
+_ROW = struct.Struct("<IIIiiIiIbI16s")
+
+NO_STRING = 0xFFFFFFFF
+"""String index of absent (None) strings"""
+
+_FILTERED_TO_INT = {None: -1, False: 0, True: 1}
+_INT_TO_FILTERED = {v: k for k, v in _FILTERED_TO_INT.items()}
+
+# tool ID, check ID, path, line, column, message, severity, syntactic context,
+# filtered, link, syntactic identifier
+RowValues = Tuple[
+    str, str, str, int, int, str, int, str, Optional[bool], Optional[str], int
+]
+
+
+class StoredFile(NamedTuple):
+    """
+    A file's state, and the results of a tool run on that file
+
+    Results are either a range of finding records in a cache file, or
+    violations not yet written to a cache file.
+    """
+
+    mtime_ns: int
+    size: int
+    digest: str
+    results: Union[range, Sequence[Violation]]
+
+
+class CacheReader:
+    """
+    Lazily reads a memory-mapped cache file
+
+    Raises ValueError if the file is not a valid cache file.
+    """
+
+    def __init__(self, path: Path) -> None:
+        with path.open("rb") as stream:
+            self._buffer = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_header()
+        except (ValueError, struct.error) as e:
+            self.close()
+            raise ValueError(f"Invalid cache file {path}: {e}")
+        self._strings: Dict[int, str] = {}
+
+    def _read_header(self) -> None:
+        (
+            magic,
+            format_version,
+            self._version_index,
+            self._key_index,
+            n_strings,
+            self._n_files,
+            n_rows,
+        ) = _HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"unknown format {magic!r} v{format_version}")
+
+        self._offsets_start = _HEADER.size
+        self._data_start = self._offsets_start + (n_strings + 1) * _OFFSET.size
+        (data_size,) = _OFFSET.unpack_from(
+            self._buffer, self._offsets_start + n_strings * _OFFSET.size
+        )
+        self._files_start = self._data_start + data_size
+        self._rows_start = self._files_start + self._n_files * _FILE.size
+        if self._rows_start + n_rows * _ROW.size != len(self._buffer):
+            raise ValueError("file is truncated")
+
+    def close(self) -> None:
+        self._buffer.close()
+
+    def string(self, index: int) -> str:
+        """
+        Returns the string at an index of the string table
+        """
+        try:
+            return self._strings[index]
+        except KeyError:
+            pass
+        start, end = struct.unpack_from(
+            "<QQ", self._buffer, self._offsets_start + index * _OFFSET.size
+        )
+        s = self._buffer[self._data_start + start : self._data_start + end].decode(
+            "utf-8", "surrogatepass"
+        )
+        self._strings[index] = s
+        return s
+
+    @property
+    def version(self) -> str:
+        """The Bento version that wrote this file"""
+        return self.string(self._version_index)
+
+    @property
+    def key(self) -> str:
+        """The cache key of the tool whose results this file holds"""
+        return self.string(self._key_index)
+
+    def files(self) -> Dict[str, StoredFile]:
+        """
+        Returns the state of each file in this cache file, by path
+
+        Results are returned as ranges of finding records; use `violations`
+        to read them.
+        """
+        files = {}
+        for ix in range(self._n_files):
+            path, mtime_ns, size, digest, first, count = _FILE.unpack_from(
+                self._buffer, self._files_start + ix * _FILE.size
+            )
+            files[self.string(path)] = StoredFile(
+                mtime_ns, size, digest.hex(), range(first, first + count)
+            )
+        return files
+
+    def row_values(self, ix: int) -> RowValues:
+        """
+        Returns the decoded fields of a finding record
+        """
+        (
+            tool_id,
+            check_id,
+            path,
+            line,
+            column,
+            message,
+            severity,
+            syntactic_context,
+            filtered,
+            link,
+            identifier,
+        ) = _ROW.unpack_from(self._buffer, self._rows_start + ix * _ROW.size)
+        string = self.string
+        return (
+            string(tool_id),
+            string(check_id),
+            string(path),
+            line,
+            column,
+            string(message),
+            severity,
+            string(syntactic_context),
+            _INT_TO_FILTERED[filtered],
+            None if link == NO_STRING else string(link),
+            int.from_bytes(identifier, "big"),
+        )
+
+    def violations(self, rows: range) -> List[Violation]:
+        """
+        Returns the violations stored in a range of finding records
+        """
+        return [Violation.restore(*self.row_values(ix)) for ix in rows]
+
+
+def _violation_values(v: Violation) -> RowValues:
+    return (
+        v.tool_id,
+        v.check_id,
+        v.path,
+        v.line,
+        v.column,
+        v.message,
+        v.severity,
+        v.syntactic_context,
+        v.filtered,
+        v.link,
+        v.syntactic_identifier_int(),
+    )
+
+
+def write(
+    path: Path,
+    version: str,
+    key: str,
+    files: Mapping[str, StoredFile],
+    reader: Optional[CacheReader] = None,
+) -> None:
+    """
+    Writes a cache file
+
+    Raises TypeError or struct.error if a violation's fields can not be stored.
+
+    :param reader: The cache file that holds results stored as finding record
+                   ranges, if any
+    """
+    strings: Dict[str, int] = {}
+
+    def intern(s: str) -> int:
+        if not isinstance(s, str):
+            raise TypeError(f"can not store {s!r} as a string")
+        ix = strings.get(s)
+        if ix is None:
+            ix = strings[s] = len(strings)
+        return ix
+
+    version_index = intern(version)
+    key_index = intern(key)
+
+    file_records = bytearray()
+    row_records = bytearray()
+    n_rows = 0
+    for file_path, stored in files.items():
+        first = n_rows
+        if isinstance(stored.results, range):
+            assert reader is not None
+            values = [reader.row_values(ix) for ix in stored.results]
+        else:
+            values = [_violation_values(v) for v in stored.results]
+        for (
+            tool_id,
+            check_id,
+            v_path,
+            line,
+            column,
+            message,
+            severity,
+            syntactic_context,
+            filtered,
+            link,
+            identifier,
+        ) in values:
+            row_records += _ROW.pack(
+                intern(tool_id),
+                intern(check_id),
+                intern(v_path),
+                line,
+                column,
+                intern(message),
+                severity,
+                intern(syntactic_context),
+                _FILTERED_TO_INT[filtered],
+                NO_STRING if link is None else intern(link),
+                identifier.to_bytes(16, "big"),
+            )
+        n_rows += len(values)
+        file_records += _FILE.pack(
+            intern(file_path),
+            stored.mtime_ns,
+            stored.size,
+            bytes.fromhex(stored.digest),
+            first,
+            n_rows - first,
+        )
+
+    offsets = bytearray(_OFFSET.pack(0))
+    data = bytearray()
+    for s in strings:
+        data += s.encode("utf-8", "surrogatepass")
+        offsets += _OFFSET.pack(len(data))
+
+    with path.open("wb") as stream:
+        stream.write(
+            _HEADER.pack(
+                MAGIC,
+                FORMAT_VERSION,
+                version_index,
+                key_index,
+                len(strings),
+                len(files),
+                n_rows,
+            )
+        )
+        stream.write(offsets)
+        stream.write(data)
+        stream.write(file_records)
+        stream.write(row_records)
@@ -10,7 +10,7 @@ import click
 from packaging.version import InvalidVersion, Version
 
 import bento.constants as constants
-from bento.commands import archive, check, disable, enable, init, register
+from bento.commands import archive, check, daemon, disable, enable, init, register
 from bento.context import Context
 from bento.error import InvalidRegistrationException, OutdatedPythonException
 
@@ -128,6 +128,7 @@ def cli(
 
 cli.add_command(archive.archive)
 cli.add_command(check.check)
+cli.add_command(daemon.daemon)
 cli.add_command(init.init)
 cli.add_command(enable.enable)
 cli.add_command(disable.disable)
@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Any, Dict, Set, Tuple
+from typing import Optional, Tuple
 
 import click
 
@@ -21,9 +21,17 @@ from bento.util import echo_newline, echo_next_step
     default=False,
     help="Archive findings for all tracked files.",
 )
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(1),
+    help="Maximum number of tool processes to run at once. Defaults to the number of CPUs, limited by available memory.",
+)
 @click.argument("paths", nargs=-1, type=Path, autocompletion=list_paths)
 @click.pass_obj
-def archive(context: Context, all_: bool, paths: Tuple[Path, ...]) -> None:
+def archive(
+    context: Context, all_: bool, paths: Tuple[Path, ...], jobs: Optional[int] = None
+) -> None:
     """
     Suppress current findings.
 
@@ -57,30 +65,21 @@ def archive(context: Context, all_: bool, paths: Tuple[Path, ...]) -> None:
     if not context.config_path.exists():
         raise NoConfigurationException()
 
-    if context.baseline_file_path.exists():
-        with context.baseline_file_path.open() as json_file:
-            old_baseline = bento.result.load_baseline(json_file)
-            old_hashes = {
-                h
-                for findings in old_baseline.values()
-                for h in findings.get(VIOLATIONS_KEY, {}).keys()
-            }
-    else:
-        old_baseline = {}
-        old_hashes = set()
+    if jobs:
+        context.jobs = jobs
 
-    new_baseline: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    store = context.archive
     tools = context.tools.values()
 
     target_file_manager = TargetFileManager(
-        context.base_path, path_list, not all_, context.ignore_file_path
+        context.base_path,
+        path_list,
+        not all_,
+        context.ignore_file_path,
+        context.target_index_path,
     )
 
-    baseline: Baseline = {}
-    if context.baseline_file_path.exists():
-        with context.baseline_file_path.open() as json_file:
-            # TODO there's some deconflicting needed with old_baseline, old_hashes, baseline
-            baseline = bento.result.json_to_violation_hashes(json_file)
+    baseline: Baseline = store.baseline()
 
     all_findings, elapsed = bento.orchestrator.orchestrate(
         baseline, target_file_manager, not all_, tools
@@ -88,7 +87,6 @@ def archive(context: Context, all_: bool, paths: Tuple[Path, ...]) -> None:
 
     n_found = 0
     n_existing = 0
-    found_hashes: Set[str] = set()
 
     for tool_id, vv in all_findings:
         if isinstance(vv, Exception):
@@ -96,22 +94,15 @@ def archive(context: Context, all_: bool, paths: Tuple[Path, ...]) -> None:
         # Remove filtered
         vv = [f for f in vv if not f.filtered]
         n_found += len(vv)
-        new_baseline[tool_id] = bento.result.dump_results(vv)
-        if tool_id in old_baseline:
-            new_baseline[tool_id][VIOLATIONS_KEY].update(
-                old_baseline[tool_id][VIOLATIONS_KEY]
-            )
-        for v in vv:
-            h = v.syntactic_identifier_str()
-            found_hashes.add(h)
-            if h in old_hashes:
-                n_existing += 1
+        new_findings = bento.result.dump_results(vv)[VIOLATIONS_KEY]
+        n_existing += sum(
+            1 for v in vv if store.contains(tool_id, v.syntactic_identifier_str())
+        )
+        store.add(tool_id, new_findings)
 
     n_new = n_found - n_existing
 
-    context.baseline_file_path.parent.mkdir(exist_ok=True, parents=True)
-    with context.baseline_file_path.open("w") as json_file:
-        bento.result.write_tool_results(json_file, new_baseline)
+    store.save()
 
     finding_source_text = "in this project" if all_ else "due to staged changes"
     success_str = f"{n_new} finding(s) {finding_source_text} were archived, and will be hidden in future Bento runs."
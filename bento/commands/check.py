@@ -1,9 +1,11 @@
 import logging
+import shutil
 import subprocess
 import sys
 import threading
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Callable, Collection, Dict, Iterable, List, Optional, Set, Tuple
 
 import click
 
@@ -13,6 +15,7 @@ import bento.metrics
 import bento.orchestrator
 import bento.result
 import bento.tool_runner
+import bento.tracing
 from bento.config import get_valid_tools, update_tool_run
 from bento.context import Context
 from bento.error import (
@@ -22,11 +25,21 @@ from bento.error import (
     NoIgnoreFileException,
     ToolRunException,
 )
+from bento.formatter import Formatter
 from bento.paths import list_paths
 from bento.result import Baseline
+from bento.scheduler import RunCancelled
 from bento.target_file_manager import TargetFileManager
 from bento.tool import Tool
-from bento.util import echo_error, echo_next_step, echo_success, echo_warning
+from bento.tool_runner import RunResults
+from bento.util import (
+    echo_error,
+    echo_next_step,
+    echo_styles,
+    echo_success,
+    echo_warning,
+    style,
+)
 from bento.violation import Violation
 
 OVERRUN_PAGES = 3
@@ -38,6 +51,64 @@ def __get_ignores_for_tool(tool: str, config: Dict[str, Any]) -> List[str]:
     return tool_specific_config.get("ignore", [])
 
 
+def __write_profile(context: Context) -> None:
+    """
+    Writes the trace of this run, and prints its summary
+    """
+    tracer = bento.tracing.stop()
+    if tracer is None:
+        return
+    trace_path = context.cache.cache_dir / bento.constants.PROFILE_FILE_NAME
+    trace_path.parent.mkdir(parents=True, exist_ok=True)
+    with trace_path.open("w") as stream:
+        tracer.write_chrome_trace(stream)
+
+    click.echo("", err=True)
+    click.echo(tracer.format_summary(), err=True)
+    echo_styles(
+        "◦ ",
+        style("To view this run's trace, load ", dim=True),
+        str(context.pretty_path(trace_path)),
+        style(" in chrome://tracing or https://ui.perfetto.dev", dim=True),
+    )
+
+
+def __stream_findings(
+    fmts: Collection[Formatter], pager: bool, streamed: Set[str]
+) -> Callable[[RunResults], Collection[str]]:
+    """
+    Returns a callback that formats each tool's findings as soon as the tool completes
+
+    Once streamed output would overrun the pager threshold, remaining tools'
+    findings are deferred, so that they are paged after all tools complete.
+
+    :param streamed: Updated with the IDs of tools whose findings were streamed
+    """
+    budget: Optional[int] = None
+    if pager and sys.stdout.isatty():
+        _, height = shutil.get_terminal_size()
+        budget = height * OVERRUN_PAGES
+    n_streamed = 0
+    deferred = False
+
+    def on_result(result: RunResults) -> Collection[str]:
+        nonlocal n_streamed, deferred
+        tool_id, findings = result
+        if deferred or not isinstance(findings, list):
+            return []
+        filtered = [f for f in findings if not f.filtered]
+        with bento.tracing.span("format", tool=tool_id):
+            lines = [line for f in fmts for line in f.dump_tool(tool_id, filtered)]
+        if budget is not None and n_streamed + len(lines) >= budget:
+            deferred = True
+            return []
+        n_streamed += len(lines)
+        streamed.add(tool_id)
+        return lines
+
+    return on_result
+
+
 @click.command()
 @click.option(
     "--all",
@@ -65,6 +136,24 @@ def __get_ignores_for_tool(tool: str, config: Dict[str, Any]) -> List[str]:
     metavar="TOOL",
     autocompletion=get_valid_tools,
 )
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(1),
+    help="Maximum number of tool processes to run at once. Defaults to the number of CPUs, limited by available memory.",
+)
+@click.option(
+    "--fail-fast",
+    is_flag=True,
+    default=False,
+    help="Stop checking as soon as any tool reports a new finding. Useful when blocking commits, where any finding fails the commit.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help=f"Print the time spent in each phase of this run, and write a Chrome trace of the run to `{bento.constants.RESOURCE_PATH / bento.constants.CACHE_PATH / bento.constants.PROFILE_FILE_NAME}`.",
+)
 @click.option("--staged-only", is_flag=True, default=False, hidden=True)
 @click.argument("paths", nargs=-1, type=Path, autocompletion=list_paths)
 @click.pass_obj
@@ -74,6 +163,9 @@ def check(
     formatter: Tuple[str, ...] = (),
     pager: bool = True,
     tool: Optional[str] = None,
+    jobs: Optional[int] = None,
+    fail_fast: bool = False,
+    profile: bool = False,
     staged_only: bool = False,  # Should not be used. Legacy support for old pre-commit hooks
     paths: Tuple[Path, ...] = (),
 ) -> None:
@@ -90,9 +182,16 @@ def check(
 
     Optional PATHS can be specified to check specific directories or files.
 
+    Use `--fail-fast` to stop all tools as soon as one reports a new finding;
+    only findings from tools that completed are shown.
+
     See `bento archive --help` to learn about suppressing findings.
     """
 
+    if profile:
+        bento.tracing.start()
+        click.get_current_context().call_on_close(partial(__write_profile, context))
+
     # Fail out if not configured
     if not context.config_path.exists():
         raise NoConfigurationException()
@@ -117,6 +216,9 @@ def check(
         # update and include newly added tool
         context._configured_tools = None
 
+    if jobs:
+        context.jobs = jobs
+
     # Handle specified formatters
     if formatter:
         context.config["formatter"] = [{f: {}} for f in formatter]
@@ -130,26 +232,43 @@ def check(
     if tool:
         tools = [context.configured_tools[tool]]
 
-    baseline: Baseline = {}
-    if context.baseline_file_path.exists():
-        with context.baseline_file_path.open() as json_file:
-            baseline = bento.result.json_to_violation_hashes(json_file)
+    with bento.tracing.span("archive.baseline"):
+        baseline: Baseline = context.archive.baseline()
 
     target_file_manager = TargetFileManager(
-        context.base_path, path_list, not all_, context.ignore_file_path
+        context.base_path,
+        path_list,
+        not all_,
+        context.ignore_file_path,
+        context.target_index_path,
+    )
+
+    fmts = context.formatters
+    streamed: Set[str] = set()
+    on_result = (
+        __stream_findings(fmts, pager, streamed)
+        if all(f.streams for f in fmts)
+        else None
     )
 
     all_results, elapsed = bento.orchestrator.orchestrate(
-        baseline, target_file_manager, not all_, tools
+        baseline,
+        target_file_manager,
+        not all_,
+        tools,
+        on_result=on_result,
+        fail_fast=fail_fast,
     )
 
-    fmts = context.formatters
     findings_to_log: List[Any] = []
     n_all = 0
     n_all_filtered = 0
+    n_cancelled = 0
     filtered_findings: Dict[str, List[Violation]] = {}
     for tool_id, findings in all_results:
-        if isinstance(findings, Exception):
+        if isinstance(findings, RunCancelled):
+            n_cancelled += 1
+        elif isinstance(findings, Exception):
             logging.error(findings)
             echo_error(f"Error while running {tool_id}: {findings}")
             if isinstance(findings, BentoException):
@@ -189,7 +308,9 @@ def check(
             n_all_filtered += n_filtered
             logging.debug(f"{tool_id}: {n_filtered} findings passed filter")
 
-    dumped = [f.dump(filtered_findings) for f in fmts]
+    with bento.tracing.span("format"):
+        remaining = {k: v for k, v in filtered_findings.items() if k not in streamed}
+        dumped = [f.dump(remaining) for f in fmts]
     context.start_user_timer()
     bento.util.less(dumped, pager=pager, overrun_pages=OVERRUN_PAGES)
     context.stop_user_timer()
@@ -205,6 +326,9 @@ def check(
     else:
         echo_success(f"0 findings {finding_source_text} in {elapsed:.2f} s\n")
 
+    if n_cancelled > 0:
+        echo_warning(f"Stopped {n_cancelled} tool(s) early, since `--fail-fast` is set")
+
     n_archived = n_all - n_all_filtered
     if n_archived > 0:
         echo_next_step(
@@ -0,0 +1,54 @@
+import click
+
+from bento.context import Context
+from bento.tool.runner.docker import DOCKER_INSTALLED, stop_daemons
+from bento.tool.runner.python_tool import stop_workers
+from bento.util import echo_success, echo_warning
+
+
+@click.group()
+def daemon() -> None:
+    """
+    Manage Bento's daemon containers and worker processes.
+
+    Docker-based tools with the `daemon` option set in `.bento/config.yml`
+    run in long-lived containers, which are reused across Bento runs:
+
+        tools:
+          shellcheck:
+            daemon: true
+
+    Python-based tools (bandit, flake8, and jinjalint) and eslint with this
+    option run in long-lived worker processes instead.
+
+    These containers and processes keep running after Bento exits; worker
+    processes exit once they are unused for 15 minutes.
+    """
+
+
+@daemon.command()
+@click.option(
+    "--all",
+    "all_",
+    is_flag=True,
+    default=False,
+    help="Stop daemon containers for all projects, not just this one.",
+)
+@click.pass_obj
+def stop(context: Context, all_: bool) -> None:
+    """
+    Stop Bento's Docker daemon containers and worker processes.
+
+    By default, only containers used by this project are stopped. Worker
+    processes are always stopped.
+    """
+    n_workers = stop_workers()
+    if n_workers:
+        echo_success(f"Stopped {n_workers} worker process(es).")
+
+    if not DOCKER_INSTALLED.value:
+        echo_warning("Docker is not installed; no daemon containers to stop.")
+        return
+
+    n_stopped = stop_daemons(None if all_ else context.base_path)
+    echo_success(f"Stopped {n_stopped} daemon container(s).")
@@ -180,6 +180,7 @@ class InitCommand:
         if clean:
             content.Clean.tools.echo()
             shutil.rmtree(constants.VENV_PATH, ignore_errors=True)
+            self.context.install_manifest.wipe()
         runner = bento.tool_runner.Runner(paths=[], install_only=True, use_cache=False)
         tools = self.context.tools.values()
         runner.parallel_results(tools, {})
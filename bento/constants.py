@@ -11,11 +11,17 @@ DEFAULT_LOG_PATH = GLOBAL_RESOURCE_PATH / "last.log"
 VENV_PATH = GLOBAL_RESOURCE_PATH / "venv"
 DEFAULT_GLOBAL_GIT_IGNORE_PATH = Path(os.path.expanduser("~/.config/git/ignore"))
 GLOBAL_VERSION_CACHE_PATH = GLOBAL_RESOURCE_PATH / "version"
+INSTALL_MANIFEST_PATH = GLOBAL_RESOURCE_PATH / "installed.json"
+WORKER_PATH = GLOBAL_RESOURCE_PATH / "workers"
 
 RESOURCE_PATH = Path(".bento")
 CACHE_PATH = Path("cache")
 
 ARCHIVE_FILE_NAME = "archive.json"
+ARCHIVE_INDEX_FILE_NAME = "archive.sqlite"
+DURATIONS_FILE_NAME = "durations.json"
+PROFILE_FILE_NAME = "profile.json"
+TARGET_INDEX_FILE_NAME = "targets.json"
 CONFIG_FILE_NAME = "config.yml"
 IGNORE_FILE_NAME = ".bentoignore"
 GREP_CONFIG_FILE_NAME = "grep-config.yml"
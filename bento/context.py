@@ -7,6 +7,7 @@ import attr
 
 import bento.extra
 import bento.formatter
+import bento.tracing as tracing
 from bento.base_context import BaseContext
 from bento.error import EnabledToolNotFoundException, MultipleErrorsException
 from bento.formatter import Formatter
@@ -139,16 +140,17 @@ class Context(BaseContext):
         """
         tools: Dict[str, Tool] = {}
         inventory = self.tool_inventory
-        for tn, tool_config in self.config["tools"].items():
-            if "run" in tool_config and not tool_config["run"]:
-                continue
+        with tracing.span("context.tools"):
+            for tn, tool_config in self.config["tools"].items():
+                if "run" in tool_config and not tool_config["run"]:
+                    continue
 
-            ti = inventory.get(tn, None)
-            if not ti:
-                self.error_on_exit(EnabledToolNotFoundException(tool=tn))
-                continue
+                ti = inventory.get(tn, None)
+                if not ti:
+                    self.error_on_exit(EnabledToolNotFoundException(tool=tn))
+                    continue
 
-            tools[tn] = ti(self)
+                tools[tn] = ti(self)
 
         return tools
 
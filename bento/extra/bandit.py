@@ -1,11 +1,11 @@
 import json
-from typing import Any, Dict, Iterable, List, Type
+from typing import Any, Dict, Iterable, Iterator, List, TextIO, Type
 
 from semantic_version import SimpleSpec
 
+from bento.json_reader import JsonReader
 from bento.parser import Parser
 from bento.tool import output, runner
-from bento.util import fetch_line_in_file
 from bento.violation import Violation
 
 # Input example:
@@ -200,7 +200,7 @@ class BanditParser(Parser[str]):
 
         if source == "" and result["line_number"] != 0:
             source = (
-                fetch_line_in_file(self.base_path / path, result["line_number"])
+                self.fetch_line(self.base_path / path, result["line_number"])
                 or "<no source found>"
             )
 
@@ -228,6 +228,7 @@ class BanditTool(runner.Python, output.Str):
     VENV_DIR = "bandit"
     PROJECT_NAME = "Python"
     PACKAGES = {"bandit": SimpleSpec("~=1.6.2")}
+    WORKER_PRELOAD_GROUPS = ["bandit.plugins", "bandit.formatters"]
 
     @property
     def parser_type(self) -> Type[Parser]:
@@ -250,12 +251,25 @@ class BanditTool(runner.Python, output.Str):
         return BanditTool.PROJECT_NAME
 
     def run(self, paths: Iterable[str]) -> str:
-        cmd = [
-            "python",
-            str(self.venv_dir() / "bin" / "bandit"),
-            "-f",
-            "json",
-            "-r",
-            *paths,
-        ]
-        return self.venv_exec(cmd, check_output=False)
+        return self.venv_run_script("bandit", ["-f", "json", "-r", *paths])
+
+    def stream(self, paths: Iterable[str]) -> Iterator[str]:
+        return self.venv_stream_script(
+            "bandit", ["-f", "json", "-r", *paths], self._report_parts
+        )
+
+    @staticmethod
+    def _report_parts(stdout: TextIO) -> Iterator[str]:
+        """
+        Splits bandit's JSON report, as it is read, into reports of its errors, and
+        of each of its results
+        """
+        reader = JsonReader(stdout)
+        for key in reader.members():
+            if key == "results":
+                for r in reader.items():
+                    yield json.dumps({"results": [r]})
+            elif key == "errors":
+                yield json.dumps({"errors": reader.value()})
+            else:
+                reader.value()
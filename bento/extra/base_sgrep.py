@@ -6,7 +6,6 @@ from typing import Iterable, List, Mapping, Optional, Pattern
 
 from bento.parser import Parser
 from bento.tool import JsonR, output, runner
-from bento.util import fetch_line_in_file
 from bento.violation import Violation
 
 
@@ -26,7 +25,7 @@ class BaseSgrepParser(Parser[JsonR]):
             # Custom way to get check_name for sgrep-lint:0.1.10
             message = check.get("extra", {}).get("message")
             source = (
-                fetch_line_in_file(self.base_path / path, start_line)
+                self.fetch_line(self.base_path / path, start_line)
                 or "<no source found>"
             ).rstrip()
             violation = Violation(
@@ -1,6 +1,4 @@
-from typing import Type
-
-from semantic_version import SimpleSpec
+from typing import List, Type
 
 from bento.extra.flake8 import Flake8Parser, Flake8Tool
 from bento.parser import Parser
@@ -26,12 +24,6 @@ class Boto3Parser(Flake8Parser):
 
 class Boto3Tool(Flake8Tool):
     TOOL_ID = "r2c.boto3"
-    VENV_DIR = "boto3"
-    PACKAGES = {
-        "flake8": SimpleSpec("~=3.7.0"),
-        "flake8-json": SimpleSpec("~=19.8.0"),
-        "flake8-boto3": SimpleSpec("~=0.3.0"),
-    }
 
     @property
     def parser_type(self) -> Type[Parser]:
@@ -45,5 +37,6 @@ class Boto3Tool(Flake8Tool):
     def tool_desc(cls) -> str:
         return "Checks for the AWS boto3 library in Python"
 
-    def select_clause(self) -> str:
-        return "--select={}".format(PREFIX)
+    @classmethod
+    def code_prefixes(cls) -> List[str]:
+        return [PREFIX]
@@ -1,6 +1,4 @@
-from typing import Type
-
-from semantic_version import SimpleSpec
+from typing import List, Type
 
 from bento.extra.flake8 import Flake8Parser, Flake8Tool
 from bento.parser import Parser
@@ -26,12 +24,6 @@ class ClickParser(Flake8Parser):
 
 class ClickTool(Flake8Tool):
     TOOL_ID = "r2c.click"  # to-do: versioning?
-    VENV_DIR = "click"
-    PACKAGES = {
-        "flake8": SimpleSpec("~=3.7.0"),
-        "flake8-json": SimpleSpec("~=19.8.0"),
-        "flake8-click": SimpleSpec("==0.3.1"),
-    }
 
     @property
     def parser_type(self) -> Type[Parser]:
@@ -45,5 +37,6 @@ class ClickTool(Flake8Tool):
     def tool_desc(cls) -> str:
         return "Checks for the Python Click framework"
 
-    def select_clause(self) -> str:
-        return "--select=r2c-click"
+    @classmethod
+    def code_prefixes(cls) -> List[str]:
+        return [PREFIX]
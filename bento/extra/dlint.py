@@ -1,10 +1,8 @@
 import json
-from typing import Iterable, List, Type
-
-from semantic_version import SimpleSpec
+from typing import List, Type
 
+from bento.extra.flake8 import Flake8PluginTool
 from bento.parser import Parser
-from bento.tool import output, runner
 from bento.violation import Violation
 
 """
@@ -58,11 +56,9 @@ class DlintParser(Parser[str]):
         return violations
 
 
-class DlintTool(runner.Python, output.Str):
+class DlintTool(Flake8PluginTool):
     TOOL_ID = "dlint"
-    VENV_DIR = "dlint"
     PROJECT_NAME = "Python"
-    PACKAGES = {"dlint": SimpleSpec("~=0.10.2"), "flake8-json": SimpleSpec("~=19.8.0")}
 
     @property
     def parser_type(self) -> Type[Parser]:
@@ -76,24 +72,10 @@ class DlintTool(runner.Python, output.Str):
     def tool_desc(cls) -> str:
         return "A tool for encouraging best coding practices and helping ensure Python code is secure"
 
-    @classmethod
-    def venv_subdir_name(cls) -> str:
-        return DlintTool.VENV_DIR
-
     @property
     def project_name(self) -> str:
         return DlintTool.PROJECT_NAME
 
-    def select_clause(self) -> str:
-        return f"--select={','.join(DLINT_TO_BENTO.keys())}"
-
-    def run(self, paths: Iterable[str]) -> str:
-        cmd = [
-            "python",
-            str(self.venv_dir() / "bin" / "flake8"),
-            self.select_clause(),
-            "--format=json",
-            "--isolated",
-            *paths,
-        ]
-        return self.venv_exec(cmd, check_output=False)
+    @classmethod
+    def code_prefixes(cls) -> List[str]:
+        return list(DLINT_TO_BENTO.keys())
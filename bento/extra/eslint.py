@@ -1,19 +1,30 @@
+import hashlib
 import json
 import logging
 import os
 import re
 import shutil
 import subprocess
+import threading
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Pattern, Type
+from typing import Any, Dict, Iterable, Iterator, List, Pattern, TextIO, Type
 
+import attr
 import yaml
 from semantic_version import Version
 
 import bento.constants as constants
+import bento.tool.runner.python_worker as python_worker
+import bento.tracing as tracing
+from bento import __version__ as BENTO_VERSION
+from bento.install_manifest import stamp
+from bento.json_reader import JsonReader
+from bento.line_index import LineIndex
 from bento.parser import Parser
 from bento.tool import JsonR, output, runner
+from bento.tool.runner.docker import DAEMON_KEY
 from bento.tool.runner.js_tool import NpmDeps
+from bento.tool.runner.python_tool import MAX_SOCKET_PATH, WORKER_IDLE_TIMEOUT
 from bento.violation import Violation
 
 # Input example:
@@ -36,7 +47,13 @@ from bento.violation import Violation
 RC_ENVIRONMENTS = "env"
 """'env' field of .eslintrc.yml"""
 
+EXTENSIONS = ["js", "jsx", "ts", "tsx"]
+IGNORE_PATTERNS = [".bento/", "node_modules/"]
 
+_daemon_lock = threading.Lock()
+
+
+@attr.s
 class EslintParser(Parser[JsonR]):
     REACT_PREFIX = "react/"
     REACT_PREFIX_LEN = len(REACT_PREFIX)
@@ -47,6 +64,14 @@ class EslintParser(Parser[JsonR]):
     TS_PREFIX = "@typescript-eslint/"
     TS_PREFIX_LEN = len(TS_PREFIX)
 
+    # Like ESLint, read files as UTF-8, split on "\n" only
+    _lines = attr.ib(
+        type=LineIndex,
+        factory=lambda: LineIndex(encoding="utf-8", errors="replace", newline="\n"),
+        init=False,
+        repr=False,
+    )
+
     @staticmethod
     def to_link(check_id: str) -> str:
         if check_id.startswith(EslintParser.REACT_PREFIX):
@@ -70,7 +95,7 @@ class EslintParser(Parser[JsonR]):
         path = self.trim_base(result["filePath"])
         startLine = message["line"]
         endLine = message.get("endLine", startLine)
-        source = result["source"][startLine - 1 : endLine]  # line numbers are 1-indexed
+        context = self.source_context(result, startLine, endLine)
         check_id = message.get("ruleId", None)
         if check_id:
             link = self.to_link(check_id)
@@ -86,14 +111,45 @@ class EslintParser(Parser[JsonR]):
             column=message["column"],
             message=message["message"],
             severity=message["severity"],
-            syntactic_context="\n".join(source).rstrip(),
+            syntactic_context=context,
             link=link,
         )
 
+    def source_context(
+        self, result: Dict[str, Any], start_line: int, end_line: int
+    ) -> str:
+        """
+        Returns the source of lines start_line through end_line of a result's file
+
+        Lines are taken from the result's embedded source if present, and
+        otherwise read from the file as ESLint reads it (see _lines).
+        """
+        if "source" in result:
+            # line numbers are 1-indexed
+            return "\n".join(result["source"][start_line - 1 : end_line]).rstrip()
+
+        path = self.base_path / self.trim_base(result["filePath"])
+        lines: List[str] = []
+        for line_number in range(start_line, end_line + 1):
+            line = self._lines.line(path, line_number)
+            if line is None:
+                break
+            lines.append(line)
+        # Lines keep their "\n", so they need not be joined with one
+        return "".join(lines).rstrip()
+
     def parse(self, tool_output: JsonR) -> List[Violation]:
+        """
+        Parses ESLint results
+
+        Results output by ESLint's JSON formatter embed each file's source; results
+        output by Bento's slim formatter (see eslint/formatter.js) do not, and
+        only the lines that messages refer to are read from the file.
+        """
         violations: List[Violation] = []
         for r in tool_output:
-            r["source"] = r.get("source", "").split("\n")
+            if "source" in r:
+                r["source"] = r["source"].split("\n")
             violations += [self.to_violation(r, m) for m in r["messages"]]
         return violations
 
@@ -106,6 +162,8 @@ class EslintTool(runner.Node, output.Json):
     JS_NAME_PATTERN = re.compile(r".*\.(?:js|jsx|ts|tsx)\b")
 
     MANIFEST_PATH: Path = Path(__file__).parent.resolve() / "eslint"
+    DAEMON_SCRIPT: Path = MANIFEST_PATH / "daemon.js"
+    FORMATTER_SCRIPT: Path = MANIFEST_PATH / "formatter.js"
 
     # Packages we always need no matter what.
     ALWAYS_NEEDED = {
@@ -188,6 +246,13 @@ class EslintTool(runner.Node, output.Json):
     def matches_project(self, files: Iterable[Path]) -> bool:
         return (self.context.base_path / "package.json").exists()
 
+    def tool_version(self) -> str:
+        packages = {**self.ALWAYS_NEEDED, **self.TYPESCRIPT_PACKAGES}
+        return ",".join(f"{p}@{v}" for p, v in sorted(packages.items()))
+
+    def extra_cache_paths(self) -> List[Path]:
+        return [self.eslintrc_path]
+
     def __uses_typescript(self, deps: NpmDeps) -> bool:
         # ts dependency shouldn't be in main deps, but, if it is, ok
         return "typescript" in deps
@@ -230,8 +295,7 @@ class EslintTool(runner.Node, output.Json):
         if project_has_typescript:
             needed_packages.update(self.TYPESCRIPT_PACKAGES)
 
-        self._ensure_packages(needed_packages)
-        self._ensure_node_version()
+        self._ensure_installed(needed_packages)
 
         # install .eslintrc.yml if necessary
         if not self.eslintrc_path.exists():
@@ -248,18 +312,148 @@ class EslintTool(runner.Node, output.Json):
 
             self.__add_globals(project_deps)
 
-    @staticmethod
-    def raise_failure(cmd: List[str], result: subprocess.CompletedProcess) -> None:
-        # Tool returned fialure, or did not return json
-        raise subprocess.CalledProcessError(
-            result.returncode, cmd, output=result.stdout, stderr=result.stderr
+    def _disabled_rules(self) -> List[str]:
+        return self.config.get("ignore", [])
+
+    @property
+    def use_daemon(self) -> bool:
+        """
+        Returns whether ESLint runs in a long-lived worker process
+
+        Daemon mode is enabled by the tool's "daemon" option, and is only
+        supported on platforms with Unix sockets.
+        """
+        return bool(self.config.get(DAEMON_KEY, False)) and python_worker.SUPPORTED
+
+    def daemon_key(self) -> str:
+        """
+        Returns the key of an up-to-date ESLint worker process for this project
+
+        The key changes when Bento is upgraded, or when the ESLint configuration,
+        the installed packages, or Node.js change; workers with a different key
+        are replaced.
+        """
+        state = [
+            BENTO_VERSION,
+            self.tool_version(),
+            stamp(
+                [
+                    self.eslintrc_path,
+                    self.DAEMON_SCRIPT,
+                    self.FORMATTER_SCRIPT,
+                    *self._install_stamp_paths(),
+                ]
+            ),
+        ]
+        return hashlib.blake2b(json.dumps(state).encode(), digest_size=16).hexdigest()
+
+    def _daemon_socket(self) -> Path:
+        name = hashlib.blake2b(
+            f"{self.install_location}:eslint".encode(), digest_size=8
+        ).hexdigest()
+        return constants.WORKER_PATH / f"{name}.sock"
+
+    def _start_daemon(self, socket_path: Path, key: str) -> None:
+        """
+        Starts an ESLint worker process, returning once it accepts requests
+        """
+        logging.info(f"{self.tool_id()}: Starting ESLint worker")
+        socket_path.parent.mkdir(parents=True, exist_ok=True)
+        cmd = [
+            "node",
+            str(self.DAEMON_SCRIPT),
+            f"--socket={socket_path}",
+            f"--key={key}",
+            f"--idle-timeout={WORKER_IDLE_TIMEOUT}",
+            f"--eslint={self.install_location / 'node_modules' / 'eslint'}",
+        ]
+        worker = subprocess.Popen(
+            cmd,
+            cwd=str(self.install_location),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
         )
+        assert worker.stdout is not None
+        with worker.stdout:
+            if worker.stdout.readline() != python_worker.READY:
+                raise OSError("ESLint worker failed to start")
+
+    def _daemon_exchange(
+        self, socket_path: Path, message: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Sends a message to the ESLint worker, interrupting it if the run is cancelled
+        """
+        conn = python_worker.connection()
+        with self.context.scheduler.cancellable(lambda: python_worker.interrupt(conn)):
+            return python_worker.exchange(str(socket_path), message, conn)
+
+    def _run_in_daemon(self, files: Iterable[str]) -> JsonR:
+        """
+        Runs ESLint in its worker process, starting the worker if necessary
+
+        Options are equivalent to those passed to the ESLint CLI by _stream_cli.
+
+        Raises OSError if the worker can not be started, or if ESLint fails.
+        """
+        socket_path = self._daemon_socket()
+        if len(bytes(socket_path)) > MAX_SOCKET_PATH:
+            raise OSError(f"Worker socket path {socket_path} is too long")
+        key = self.daemon_key()
+        message = {
+            "key": key,
+            "options": {
+                "cwd": str(self.install_location),
+                "useEslintrc": False,
+                "ignore": False,
+                "configFile": str(self.eslintrc_path),
+                "extensions": [f".{e}" for e in EXTENSIONS],
+                "ignorePattern": IGNORE_PATTERNS,
+                "rules": {d: "off" for d in self._disabled_rules()},
+            },
+            "files": [os.path.abspath(f) for f in files],
+        }
+
+        with self.context.scheduler.slot(self.tool_id()), tracing.span(
+            "tool.worker", tool=self.tool_id()
+        ):
+            try:
+                response = self._daemon_exchange(socket_path, message)
+            except (OSError, python_worker.StaleWorker) as e:
+                logging.debug(f"{self.tool_id()}: {e}")
+                with _daemon_lock:
+                    self._start_daemon(socket_path, key)
+                response = self._daemon_exchange(socket_path, message)
+
+        if "error" in response:
+            raise OSError(f"ESLint worker failed:\n{response['error']}")
+        return response["results"]
 
     def run(self, files: Iterable[str]) -> JsonR:
+        return [r for part in self.stream(files) for r in part]
+
+    def stream(self, files: Iterable[str]) -> Iterator[JsonR]:
+        files = list(files)
+        if self.use_daemon:
+            try:
+                results = self._run_in_daemon(files)
+            except (OSError, python_worker.StaleWorker) as e:
+                logging.warning(
+                    f"{self.tool_id()}: Could not run in worker process, falling back to a new process: {e}"
+                )
+            else:
+                yield from ([r] for r in results)
+                return
+        yield from self._stream_cli(files)
+
+    def _stream_cli(self, files: Iterable[str]) -> Iterator[JsonR]:
+        """
+        Runs the ESLint CLI, yielding each file's results as ESLint outputs them
+        """
         disables = [
-            arg
-            for d in self.config.get("ignore", [])
-            for arg in ["--rule", f"{d}: off"]
+            arg for d in self._disabled_rules() for arg in ["--rule", f"{d}: off"]
         ]
         cmd = [
             "./node_modules/eslint/bin/eslint.js",
@@ -268,40 +462,27 @@ class EslintTool(runner.Node, output.Json):
             "-c",
             str(self.eslintrc_path),
             "-f",
-            "json",
+            str(self.FORMATTER_SCRIPT),
             "--ext",
-            "js,jsx,ts,tsx",
-            "--ignore-pattern",
-            ".bento/",
-            "--ignore-pattern",
-            "node_modules/",
-        ] + disables
+            ",".join(EXTENSIONS),
+        ]
+        for pattern in IGNORE_PATTERNS:
+            cmd += ["--ignore-pattern", pattern]
+        cmd += disables
         for f in files:
             cmd.append(os.path.abspath(f))
-        result = self.execute(
+
+        def parse(stdout: TextIO) -> Iterator[JsonR]:
+            # Timing output (see TIMING below) follows the results, and is logged
+            # as unparsed output
+            return ([r] for r in JsonReader(stdout).items())
+
+        # Return codes:
+        # 0 = no violations, 1 = violations, 2+ = tool failure
+        yield from self.execute_streaming(
             cmd,
+            parse,
+            is_allowed_returncode=lambda returncode: returncode <= 1,
             cwd=self.install_location,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
             env={"TIMING": "1", **os.environ},
-            check=False,
         )
-        logging.debug(f"{self.tool_id()}: stderr:\n" + result.stderr[0:4000])
-        logging.debug(f"{self.tool_id()}: stdout:\n" + result.stdout[0:4000])
-
-        # Return codes:
-        # 0 = no violations, 1 = violations, 2+ = tool failure
-        if result.returncode > 1:
-            self.raise_failure(cmd, result)
-
-        try:
-            # TODO: this double-parses, which we can avoid in the future by having type-parameterized parsers
-            lines = result.stdout.split("\n")
-            data = lines[0]
-            timing = "\n".join(lines[1:])
-            logging.debug(f"r2c.eslint: TIMING:\n{timing}")
-            return json.loads(data.strip())
-        except Exception as ex:
-            logging.error("Could not parse json output of eslint tool", ex)
-            self.raise_failure(cmd, result)
-            return []  # Unreachable, but mypy is poor
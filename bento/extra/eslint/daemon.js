@@ -0,0 +1,133 @@
+#!/usr/bin/env node
+/*
+ * Long-lived ESLint worker for Bento
+ *
+ * Loads ESLint once, and serves lint requests over a Unix socket, so that
+ * ESLint, its configuration, plugins, and parsers stay loaded between Bento
+ * runs. Requests and responses are JSON objects, one per line (see
+ * bento/tool/runner/python_worker.py):
+ *
+ *   request:  {"key": ..., "options": {<CLIEngine options>}, "files": [...]}
+ *   response: {"results": [<results, as output by formatter.js>]} or {"error": "..."}
+ *
+ * A request with a different key than this worker's is answered with
+ * {"stale": true}, after which the worker exits. The worker also exits after
+ * an idle timeout, or once its socket is removed or replaced.
+ *
+ * Usage: node daemon.js --socket PATH --key KEY --idle-timeout SECONDS --eslint MODULE_PATH
+ */
+"use strict";
+
+const fs = require("fs");
+const net = require("net");
+
+const { slim } = require("./formatter");
+
+const POLL_INTERVAL_MS = 1000;
+
+function parseArgs(argv) {
+  const args = {};
+  for (const arg of argv) {
+    const match = /^--([^=]+)=(.*)$/.exec(arg);
+    if (!match) {
+      throw new Error(`Unexpected argument ${arg}`);
+    }
+    args[match[1]] = match[2];
+  }
+  return args;
+}
+
+function socketId(path) {
+  try {
+    const stat = fs.statSync(path);
+    return `${stat.dev}:${stat.ino}`;
+  } catch (e) {
+    return null;
+  }
+}
+
+function main() {
+  const args = parseArgs(process.argv.slice(2));
+  const socketPath = args.socket;
+  const idleTimeoutMs = parseFloat(args["idle-timeout"]) * 1000;
+  const { CLIEngine } = require(args.eslint);
+
+  // Engines load their configuration, plugins, and parsers on first use; keep
+  // one per distinct set of options
+  const engines = new Map();
+  function engineFor(options) {
+    const engineKey = JSON.stringify(options);
+    let engine = engines.get(engineKey);
+    if (!engine) {
+      engine = new CLIEngine(options);
+      engines.set(engineKey, engine);
+    }
+    return engine;
+  }
+
+  let ownId = null;
+  let lastUsed = Date.now();
+  let poller = null;
+
+  function shutdown() {
+    clearInterval(poller);
+    server.close();
+    if (ownId !== null && socketId(socketPath) === ownId) {
+      fs.unlinkSync(socketPath);
+    }
+  }
+
+  function respond(message) {
+    if (message.key !== args.key) {
+      setImmediate(shutdown);
+      return { stale: true };
+    }
+    try {
+      const report = engineFor(message.options).executeOnFiles(message.files);
+      return { results: slim(report.results) };
+    } catch (e) {
+      return { error: String((e && e.stack) || e) };
+    }
+  }
+
+  const server = net.createServer(conn => {
+    lastUsed = Date.now();
+    let data = "";
+    conn.setEncoding("utf8");
+    conn.on("data", chunk => {
+      data += chunk;
+      const newline = data.indexOf("\n");
+      if (newline < 0) {
+        return;
+      }
+      let response;
+      try {
+        response = respond(JSON.parse(data.slice(0, newline)));
+      } catch (e) {
+        response = { error: String(e) };
+      }
+      lastUsed = Date.now();
+      conn.end(`${JSON.stringify(response)}\n`);
+    });
+    conn.on("error", () => {});
+  });
+
+  // Listen on a temporary path and move it into place, so that concurrently
+  // started workers do not fail; the last one started serves requests
+  const bindPath = `${socketPath}.${process.pid}`;
+  server.listen(bindPath, () => {
+    fs.renameSync(bindPath, socketPath);
+    ownId = socketId(socketPath);
+    poller = setInterval(() => {
+      if (
+        Date.now() - lastUsed > idleTimeoutMs ||
+        socketId(socketPath) !== ownId
+      ) {
+        shutdown();
+      }
+    }, POLL_INTERVAL_MS);
+    process.stdout.write("ready\n");
+  });
+}
+
+main();
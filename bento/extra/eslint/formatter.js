@@ -0,0 +1,28 @@
+/*
+ * Slim ESLint formatter for Bento
+ *
+ * Like ESLint's JSON formatter, but only outputs what Bento parses: each
+ * file's path, and its messages' rules, severities, texts, and line ranges.
+ * In particular, files' source text is not output; Bento reads the lines
+ * that messages reference from the files themselves.
+ *
+ * Usage: eslint -f /path/to/formatter.js ...
+ */
+"use strict";
+
+function slim(results) {
+  return results.map(result => ({
+    filePath: result.filePath,
+    messages: result.messages.map(message => ({
+      ruleId: message.ruleId,
+      severity: message.severity,
+      message: message.message,
+      line: message.line,
+      column: message.column,
+      endLine: message.endLine
+    }))
+  }));
+}
+
+module.exports = results => JSON.stringify(slim(results));
+module.exports.slim = slim;
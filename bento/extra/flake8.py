@@ -1,10 +1,28 @@
 import json
-from typing import Any, Dict, Iterable, List, Mapping, Type
+import logging
+import os
+import threading
+from abc import abstractmethod
+from concurrent.futures import Future
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+)
 
 from semantic_version import SimpleSpec
 
 from bento.parser import Parser
-from bento.tool import output, runner
+from bento.tool import Tool, output, runner
 from bento.violation import Violation
 
 # Input example:
@@ -25,6 +43,21 @@ from bento.violation import Violation
 # Only these prefixes will be inspected
 RULE_PREFIXES = "B,C90,E113,E74,E9,EXE,F,T100,W6"
 
+SHARED_VENV_DIR = "flake8"
+
+# Installed into the shared virtual environment of all flake8 plugin tools
+PLUGIN_PACKAGES = {
+    "flake8": SimpleSpec("~=3.7.0"),
+    "flake8-json": SimpleSpec("~=19.8.0"),
+    "flake8-bugbear": SimpleSpec("~=20.1.4"),
+    "flake8-debugger": SimpleSpec("~=3.2.0"),
+    "flake8-boto3": SimpleSpec("~=0.3.0"),
+    "flake8-click": SimpleSpec("==0.3.1"),
+    "flake8-flask": SimpleSpec("~=0.9.0"),
+    "flake8-requests": SimpleSpec("==0.4.0"),
+    "dlint": SimpleSpec("~=0.10.2"),
+}
+
 FLAKE8_TO_BENTO = {
     "B001": "bare-except-bugbear",
     "B002": "unsupported-unary-increment",
@@ -152,16 +185,180 @@ class Flake8Parser(Parser[str]):
         return [self.to_violation(v) for r in results.values() for v in r]
 
 
-class Flake8Tool(runner.Python, output.Str):
+class Flake8PluginTool(runner.Python, output.Str):
+    """
+    Base class for tools that run as flake8 plugins
+
+    All plugin tools share a single virtual environment, in which every plugin is
+    installed. Plugin tools that are scheduled in the same run share a single
+    flake8 invocation (see SharedRun), which selects the checks of every plugin
+    tool that must run; its output is then split between tools by file and by
+    check code prefix.
+    """
+
+    PACKAGES = PLUGIN_PACKAGES
+    WORKER_PRELOAD_GROUPS = ["flake8.extension", "flake8.report"]
+    _setup_lock = threading.Lock()
+    _shared_run: Optional["SharedRun"] = None
+
+    @classmethod
+    @abstractmethod
+    def code_prefixes(cls) -> List[str]:
+        """Returns the prefixes of the flake8 check codes reported by this tool"""
+        pass
+
+    @classmethod
+    def venv_subdir_name(cls) -> str:
+        return SHARED_VENV_DIR
+
+    def setup(self) -> None:
+        # All plugin tools install into the same virtual environment
+        with Flake8PluginTool._setup_lock:
+            super().setup()
+
+    def begin_run(self, tools: Sequence[Tool]) -> None:
+        plugin_tools = [t for t in tools if isinstance(t, Flake8PluginTool)]
+        if plugin_tools[0] is not self:
+            # Set up by the first plugin tool
+            return
+        shared_run = SharedRun(plugin_tools) if len(plugin_tools) > 1 else None
+        for t in plugin_tools:
+            t._shared_run = shared_run
+
+    def end_run(self) -> None:
+        if self._shared_run is not None:
+            self._shared_run.leave(self)
+            self._shared_run = None
+
+    def _get_findings_from_run(self, paths: Iterable[Path]) -> List[Violation]:
+        # Shared runs are not sharded, so that waiting for the other participants
+        # never holds a thread of the shared shard executor
+        if self._shared_run is not None:
+            return self._run_batches(paths)
+        return super()._get_findings_from_run(paths)
+
+    def run_flake8(self, paths: Iterable[str], prefixes: Iterable[str]) -> str:
+        """Runs flake8 on paths, returning JSON output for checks matching prefixes"""
+        args = [
+            f"--select={','.join(sorted(set(prefixes)))}",
+            "--format=json",
+            "--isolated",
+            *paths,
+        ]
+        return self.venv_run_script("flake8", args)
+
+    def _own_results(
+        self, paths: Iterable[str]
+    ) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        Yields each file's results for this tool's checks, from a shared flake8 run if possible
+        """
+        path_list = list(paths)
+        results = None
+        if self._shared_run is not None:
+            results = self._shared_run.results(self, path_list)
+        if results is None:
+            results = json.loads(self.run_flake8(path_list, self.code_prefixes()))
+        prefixes = tuple(self.code_prefixes())
+        for filename, file_results in results.items():
+            yield filename, [r for r in file_results if r["code"].startswith(prefixes)]
+
+    def run(self, paths: Iterable[str]) -> str:
+        return json.dumps(dict(self._own_results(paths)))
+
+    def stream(self, paths: Iterable[str]) -> Iterator[str]:
+        for filename, file_results in self._own_results(paths):
+            if file_results:
+                yield json.dumps({filename: file_results})
+
+
+class SharedRun:
+    """
+    A single flake8 pass, shared by the plugin tools scheduled in a run
+
+    Each participating tool either requests results for the files it must run on
+    (e.g., its cache misses), or leaves the run once it completes without
+    requesting results. Once every participant has done either, one requesting
+    tool runs flake8 once, on the union of the requested files, selecting the
+    checks of every requesting tool; each requesting tool then takes the results
+    for its own files. The pass's output is dropped once every requesting tool
+    has taken its results.
+    """
+
+    def __init__(self, tools: Iterable[Flake8PluginTool]) -> None:
+        self._condition = threading.Condition()
+        # Participants that have neither requested results nor left
+        self._pending: Set[str] = {t.tool_id() for t in tools}
+        # Requested files and check code prefixes, by requesting tool ID
+        self._requests: Dict[str, Tuple[List[str], List[str]]] = {}
+        # Tools that requested results, but have not yet taken them
+        self._untaken: Set[str] = set()
+        self._output: Optional[Future] = None
+
+    def leave(self, tool: Flake8PluginTool) -> None:
+        """
+        Withdraws a tool from the run, if it has not yet requested results
+        """
+        with self._condition:
+            self._pending.discard(tool.tool_id())
+            self._condition.notify_all()
+
+    def results(
+        self, tool: Flake8PluginTool, paths: List[str]
+    ) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        """
+        Returns parsed flake8 output, for all requesting tools' checks, for paths
+
+        Waits until every other participant has requested results or left.
+
+        :return: None if the tool no longer participates in this run (e.g., if it
+                 already requested results), in which case it should run alone
+        """
+        tool_id = tool.tool_id()
+        with self._condition:
+            if tool_id not in self._pending:
+                return None
+            self._pending.discard(tool_id)
+            self._requests[tool_id] = (paths, tool.code_prefixes())
+            self._untaken.add(tool_id)
+            self._condition.notify_all()
+            while self._pending:
+                self._condition.wait()
+            output = self._output
+            is_owner = output is None
+            if output is None:
+                output = self._output = Future()
+                requests = dict(self._requests)
+
+        if is_owner:
+            all_paths = sorted({p for pp, _ in requests.values() for p in pp})
+            prefixes = [p for _, pp in requests.values() for p in pp]
+            logging.debug(
+                f"{tool_id}: Running flake8 on {len(all_paths)} file(s) for "
+                f"{', '.join(sorted(requests))}"
+            )
+            try:
+                output.set_result(json.loads(tool.run_flake8(all_paths, prefixes)))
+            except Exception as e:
+                output.set_exception(e)
+
+        try:
+            results: Dict[str, List[Dict[str, Any]]] = output.result()
+        finally:
+            with self._condition:
+                self._untaken.discard(tool_id)
+                if not self._untaken:
+                    # Every requesting tool has its results
+                    self._output = None
+                    self._requests = {}
+
+        own = {os.path.normpath(p) for p in paths}
+        return {f: r for f, r in results.items() if os.path.normpath(f) in own}
+
+
+class Flake8Tool(Flake8PluginTool):
     TOOL_ID = "flake8"  # to-do: versioning?
-    VENV_DIR = "flake8"
     PROJECT_NAME = "Python"
-    PACKAGES = {
-        "flake8": SimpleSpec("~=3.7.0"),
-        "flake8-json": SimpleSpec("~=19.8.0"),
-        "flake8-bugbear": SimpleSpec("~=20.1.4"),
-        "flake8-debugger": SimpleSpec("~=3.2.0"),
-    }
 
     @property
     def parser_type(self) -> Type[Parser]:
@@ -180,20 +377,5 @@ class Flake8Tool(runner.Python, output.Str):
         return self.PROJECT_NAME
 
     @classmethod
-    def venv_subdir_name(self) -> str:
-        return self.VENV_DIR
-
-    def select_clause(self) -> str:
-        """Returns a --select argument to identify which checks flake8 should run"""
-        return f"--select={RULE_PREFIXES}"
-
-    def run(self, paths: Iterable[str]) -> str:
-        cmd = [
-            "python",
-            str(self.venv_dir() / "bin" / "flake8"),
-            self.select_clause(),
-            "--format=json",
-            "--isolated",
-            *paths,
-        ]
-        return self.venv_exec(cmd, check_output=False)
+    def code_prefixes(cls) -> List[str]:
+        return RULE_PREFIXES.split(",")
@@ -6,7 +6,6 @@ from typing import Any, Dict, Iterable, List, Pattern, Type
 
 from bento.parser import Parser
 from bento.tool import JsonR, output, runner
-from bento.util import fetch_line_in_file
 from bento.violation import Violation
 
 REMOTE_BASE_PATH = PurePath("/mnt")
@@ -28,7 +27,7 @@ class GosecParser(Parser[JsonR]):
         link = result.get("cwe", {}).get("URL", "")
 
         line_of_code = (
-            fetch_line_in_file(self.base_path / path, start_line) or "<no source found>"
+            self.fetch_line(self.base_path / path, start_line) or "<no source found>"
         )
 
         return Violation(
@@ -95,15 +94,21 @@ class GosecTool(runner.Docker, output.Json):
         return returncode == 0 or returncode == 1
 
     # gosec only operates on modules, not individual files, so we
-    # set the max batch size to effectively unbounded, and filter the results
+    # set the max batch to effectively unbounded, and filter the results
     # returned by gosec
     #
     # Unfortunately this means the runtime of gosec is constant with the number
     # of queried paths, and linear in the project size :(
     @classmethod
-    def max_batch_size(cls) -> int:
+    def max_batch_bytes(cls) -> int:
         return sys.maxsize
 
+    # For the same reason, findings in a file may depend on other files in its
+    # package, so results are cached for whole runs
+    @classmethod
+    def caches_per_file(cls) -> bool:
+        return False
+
     def assemble_full_command(self, targets: Iterable[str]) -> List[str]:
         return self.docker_command + [self.remote_code_path]
 
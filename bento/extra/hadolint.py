@@ -1,10 +1,9 @@
 import json
 import re
-from typing import Any, Dict, Iterable, List, Pattern, Type
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Type
 
 from bento.parser import Parser
 from bento.tool import JsonR, output, runner
-from bento.util import fetch_line_in_file
 from bento.violation import Violation
 
 
@@ -33,7 +32,7 @@ class HadolintParser(Parser[JsonR]):
             link = ""
 
         line_of_code = (
-            fetch_line_in_file(self.base_path / path, start_line) or "<no source found>"
+            self.fetch_line(self.base_path / path, start_line) or "<no source found>"
         )
 
         if check_id == "DL1000":
@@ -88,6 +87,11 @@ class HadolintTool(runner.Docker, output.Json):
     def docker_command(self) -> List[str]:
         return ["hadolint", "--format", "json"]
 
+    @property
+    def daemon_image(self) -> Optional[str]:
+        # The image contains only the hadolint binary, which can not idle
+        return None
+
     @property
     def remote_code_path(self) -> str:
         return "/mnt"
@@ -120,12 +120,11 @@ class JinjalintTool(runner.Python, output.Str):
         return has_jinja and has_python
 
     def run(self, paths: Iterable[str]) -> str:
-        launchpoint: str = str(self.venv_dir() / "bin" / "jinjalint")
         exclude_rules = [
             "--exclude",
             "jinjalint-space-only-indent",
             "--exclude",
             "jinjalint-misaligned-indentation",
         ]
-        cmd = ["python", launchpoint, "--json"] + exclude_rules + list(paths)
-        return self.venv_exec(cmd, check_output=False)
+        args = ["--json"] + exclude_rules + list(paths)
+        return self.venv_run_script("jinjalint", args)
@@ -6,7 +6,6 @@ from typing import Any, Dict, Iterable, List, Pattern, Type
 
 from bento.parser import Parser
 from bento.tool import output
-from bento.util import fetch_line_in_file
 from bento.violation import Violation
 
 # Input example:
@@ -41,7 +40,7 @@ class PyreParser(Parser):
             column=result["column"],
             message=result["description"],
             severity=2,
-            syntactic_context=fetch_line_in_file(abspath, line) or "<no source found>",
+            syntactic_context=self.fetch_line(abspath, line) or "<no source found>",
             link="https://pyre-check.org/docs/error-types.html",
         )
 
@@ -74,6 +73,20 @@ class PyreTool(output.Str):
     def file_name_filter(self) -> Pattern:
         return re.compile(r".*\.py\b")
 
+    def tool_version(self) -> str:
+        return PINNED_PYRE_VERSION
+
+    @classmethod
+    def can_shard(cls) -> bool:
+        # Pyre type-checks entire source directories together
+        return False
+
+    @classmethod
+    def caches_per_file(cls) -> bool:
+        # Findings in a file depend on the types of other files, so results are
+        # cached for whole runs
+        return False
+
     def matches_project(self, files: Iterable[Path]) -> bool:
         # disabled by default for now
         return False
@@ -1,6 +1,4 @@
-from typing import Type
-
-from semantic_version import SimpleSpec
+from typing import List, Type
 
 from bento.extra.flake8 import Flake8Parser, Flake8Tool
 from bento.parser import Parser
@@ -26,12 +24,6 @@ class RequestsParser(Flake8Parser):
 
 class RequestsTool(Flake8Tool):
     TOOL_ID = "r2c.requests"  # to-do: versioning?
-    VENV_DIR = "requests"
-    PACKAGES = {
-        "flake8": SimpleSpec("~=3.7.0"),
-        "flake8-json": SimpleSpec("~=19.8.0"),
-        "flake8-requests": SimpleSpec("==0.4.0"),
-    }
 
     @property
     def parser_type(self) -> Type[Parser]:
@@ -45,5 +37,6 @@ class RequestsTool(Flake8Tool):
     def tool_desc(cls) -> str:
         return "Checks for the Python Requests framework"
 
-    def select_clause(self) -> str:
-        return "--select=r2c"
+    @classmethod
+    def code_prefixes(cls) -> List[str]:
+        return ["r2c-requests-"]
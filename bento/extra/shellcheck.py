@@ -4,7 +4,6 @@ from typing import Any, Dict, Iterable, List, Optional, Pattern, Type
 
 from bento.parser import Parser
 from bento.tool import JsonR, output, runner
-from bento.util import fetch_line_in_file
 from bento.violation import Violation
 
 
@@ -26,7 +25,7 @@ class ShellcheckParser(Parser[JsonR]):
 
         link = f"https://github.com/koalaman/shellcheck/wiki/{check_id}"
         line_of_code = (
-            fetch_line_in_file(self.base_path / path, start_line) or "<no source found>"
+            self.fetch_line(self.base_path / path, start_line) or "<no source found>"
         )
 
         return Violation(
@@ -50,6 +49,8 @@ class ShellcheckParser(Parser[JsonR]):
 
 class ShellcheckTool(runner.Docker, output.Json):
     DOCKER_IMAGE = "koalaman/shellcheck:v0.7.0"
+    # The default image contains only the shellcheck binary, which can not idle
+    DAEMON_IMAGE = "koalaman/shellcheck-alpine:v0.7.0"
     FILE_NAME_FILTER = re.compile(r".*\.(sh|bash|ksh|dash)$")
     CONTAINER_NAME = "bento-shell-check-daemon"
     TOOL_ID = "shellcheck"
@@ -83,6 +84,14 @@ class ShellcheckTool(runner.Docker, output.Json):
     def docker_image(self) -> str:
         return self.DOCKER_IMAGE
 
+    @property
+    def daemon_image(self) -> Optional[str]:
+        return self.DAEMON_IMAGE
+
+    @property
+    def daemon_entrypoint(self) -> Optional[List[str]]:
+        return ["shellcheck"]
+
     @property
     def remote_code_path(self) -> str:
         return "/mnt/"
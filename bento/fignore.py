@@ -4,11 +4,24 @@ import os
 import re
 import time
 from pathlib import Path
-from typing import Collection, Dict, Iterable, Iterator, List, Mapping, Set, TextIO
+from typing import (
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Pattern,
+    Set,
+    TextIO,
+)
 
 import attr
 
 import bento.constants as constants
+import bento.tracing as tracing
+from bento.target_index import DIRECTORY, FILE, IGNORED, Listing, TargetIndex, index_key
 from bento.util import echo_warning
 
 CONTROL_REGEX = re.compile(r"(?!<\\):")  # Matches unescaped colons
@@ -16,6 +29,8 @@ MULTI_CHAR_REGEX = re.compile(
     r"(?!<\\)\[.*(?!<\\)\]"
 )  # Matches anything in unescaped brackets
 COMMENT_START_REGEX = re.compile(r"(?P<ignore_pattern>.*?)(?:\s+|^)#.*")
+GLOB_CHARS = re.compile(r"[*?\[]")
+ANY_PREFIX = "**/"
 
 
 @attr.s
@@ -40,85 +55,104 @@ class WalkEntries(Collection[Entry]):
 
 @attr.s
 class FileIgnore(Mapping[Path, Entry]):
+    """
+    Walks target paths, recording which files survive the ignore patterns
+
+    :param index_path: If set, directory listings are persisted to, and reused
+                       from, a target index at this path (see TargetIndex)
+    """
+
     base_path = attr.ib(type=Path)
     patterns = attr.ib(type=Set[str])
     target_paths = attr.ib(type=List[Path])
+    index_path = attr.ib(type=Optional[Path], default=None)
     _processed_patterns = attr.ib(type=Set[str], init=False)
+    _matcher = attr.ib(type="Matcher", init=False)
+    _index = attr.ib(type=Optional[TargetIndex], default=None, init=False)
     _walk_cache: Dict[Path, Entry] = attr.ib(default=None, init=False)
 
     def __attrs_post_init__(self) -> None:
         self._processed_patterns = Processor(self.base_path).process(self.patterns)
+        self._matcher = Matcher(self.base_path, self._processed_patterns)
+        if self.index_path:
+            self._index = TargetIndex(
+                self.index_path, index_key(self.base_path, self._processed_patterns)
+            )
         self._init_cache()
 
     def _survives(self, path: Path) -> bool:
         """
         Determines if a single Path survives the ignore filter.
         """
-        for p in self._processed_patterns:
-            if path.is_dir() and p.endswith("/") and fnmatch.fnmatch(str(path), p[:-1]):
-                return False
-            if fnmatch.fnmatch(str(path), p):
-                return False
-
-            # Check any subpath of path satisfies a pattern
-            # i.e. a/b/c/d is ignored with rule a/b
-            # This is a hack. TargetFileManager should be pruning while searching
-            # instead of post filtering to avoid this
-            # Note: Use relative to base to avoid ignore rules firing on parent directories
-            # i.e. /private/var/.../instabot should not be ignored with var/ rule
-            # in instabot dir as base_path
-            # Note: Append "/" to path before running fnmatch so **/pattern matches with pattern/stuff
-            if p.endswith("/") and fnmatch.fnmatch(
-                "/" + str(path.relative_to(self.base_path)), p + "*"
-            ):
-                return False
-            if (
-                p.endswith("/")
-                and p.startswith(str(self.base_path))
-                and fnmatch.fnmatch(str(path), p + "*")
-            ):
-                return False
+        return not self._matcher.ignores(str(path), path.is_dir())
+
+    def _scan(self, this_path: str) -> Listing:
+        """
+        Lists a directory's entries, and whether each is ignored. Symlinks are skipped.
 
-        return True
+        File types are read from the directory entries themselves, so no
+        additional stat calls are made.
+        """
+        listing: Listing = []
+        with os.scandir(this_path) as it:
+            for e in it:
+                if e.is_symlink():
+                    continue
+                is_dir = e.is_dir(follow_symlinks=False)
+                if self._matcher.ignores(e.path, is_dir):
+                    listing.append((e.name, IGNORED))
+                else:
+                    listing.append((e.name, DIRECTORY if is_dir else FILE))
+        return listing
 
-    def _walk(self, this_path: str, root_path: str) -> Iterator[Entry]:
+    def _walk(self, this_path: str) -> Iterator[Entry]:
         """
-        Walks path, returning an Entry iterator for each item.
+        Walks a directory, returning an Entry iterator for each item.
 
         If an item is not ignored, it is traversed recursively. Traversal stops on
-        ignored items.
+        ignored items, so ignored subtrees are never scanned.
+
+        With a target index, unchanged directories are not scanned either.
+        """
+        listing = (
+            self._index.listing(this_path, self._scan)
+            if self._index
+            else self._scan(this_path)
+        )
+        for name, kind in listing:
+            path = os.path.join(this_path, name)
+            if kind == IGNORED:
+                # TODO I think we can remove the false ones and have existence be survival
+                yield Entry(Path(path), False)
+            elif kind == DIRECTORY:
+                yield from self._walk(path)
+            else:
+                yield Entry(Path(path), True)
 
-        Recalculates on every call.
+    def _walk_target(self, target: Path) -> Iterator[Entry]:
+        """
+        Walks a target path, which may be either a file or a directory
         """
         # Handle non existent paths passed to cli.
         # TODO handle further up
-        if not Path(this_path).exists():
+        if not target.exists():
             return
 
-        if Path(this_path).is_file():
-            yield Entry(Path(this_path), self._survives(Path(this_path)))
+        if target.is_file():
+            yield Entry(target, self._survives(target))
         else:
-            for e in os.scandir(this_path):
-                if e.is_symlink():
-                    continue
-                elif self._survives(Path(e.path)):
-                    before = time.time()
-                    for ee in self._walk(e.path, root_path):
-                        yield ee
-                    filename = Path(this_path) / e.name
-                    logging.debug(f"Scanned {filename} in {time.time() - before} s")
-                else:
-                    # TODO I think we can remove the false ones and have existence be survival
-                    yield Entry(Path(e.path), False)
+            yield from self._walk(str(target))
 
     def _init_cache(self) -> None:
         pretty_patterns = "\n".join(self.patterns)
         logging.info(f"Ignored patterns are:\n{pretty_patterns}")
         before = time.time()
         self._walk_cache = {}
-        for target in self.target_paths:
-            entries = self._walk(str(target), str(self.base_path))
-            self._walk_cache.update(dict((e.path, e) for e in entries))
+        with tracing.span("ignore.walk"):
+            for target in self.target_paths:
+                self._walk_cache.update((e.path, e) for e in self._walk_target(target))
+            if self._index:
+                self._index.save()
         logging.info(f"Loaded file ignore cache in {time.time() - before} s.")
 
     def entries(self) -> Collection[Entry]:
@@ -297,6 +331,95 @@ class Processor:
         }
 
 
+class Matcher:
+    """
+    Determines whether paths are ignored by a set of processed (fnmatch) patterns.
+
+    Patterns are compiled once, rather than being re-translated by fnmatch for
+    every path. Patterns of the form "**/name" and "**/name/", where "name" is a
+    literal, are matched by set lookup on path segments; all remaining patterns
+    are combined into single regular expressions.
+
+    A path is ignored if:
+    - it matches any pattern;
+    - it is a directory, and it matches any directory pattern (a pattern
+      ending in "/") with the trailing slash removed;
+    - any of its parent directories within the base path matches a directory pattern.
+    """
+
+    def __init__(self, base_path: Path, patterns: Iterable[str]) -> None:
+        self._base = str(base_path)
+        self._base_len = len(self._base) + 1
+
+        any_names: Set[str] = set()
+        dir_names: Set[str] = set()
+        any_patterns: List[str] = []
+        dir_patterns: List[str] = []
+        for p in patterns:
+            is_dir = p.endswith("/")
+            name = p[len(ANY_PREFIX) : -1 if is_dir else None]
+            if (
+                p.startswith(ANY_PREFIX)
+                and name
+                and "/" not in name
+                and not GLOB_CHARS.search(name)
+            ):
+                (dir_names if is_dir else any_names).add(name)
+            else:
+                (dir_patterns if is_dir else any_patterns).append(p)
+
+        self._any_names = any_names
+        self._dir_names = dir_names
+        self._any_regex = self._compile(any_patterns)
+        self._dir_regex = self._compile(p[:-1] for p in dir_patterns)
+        # Matches "/" + the path relative to the base path, so that "**/pattern/"
+        # matches pattern/stuff, but does not fire on the base path's parents
+        # (i.e. /private/var/.../instabot is not ignored by a var/ rule when
+        # instabot is the base path)
+        self._sub_regex = self._compile(p + "*" for p in dir_patterns)
+        self._abs_sub_regex = self._compile(
+            p + "*" for p in dir_patterns if p.startswith(self._base)
+        )
+
+    @staticmethod
+    def _compile(patterns: Iterable[str]) -> Optional[Pattern]:
+        translated = [fnmatch.translate(p) for p in patterns]
+        if not translated:
+            return None
+        return re.compile("|".join(f"(?:{t})" for t in translated))
+
+    def ignores(self, path: str, is_dir: bool) -> bool:
+        """
+        Returns true iff a path is ignored
+
+        :param path: The path, in the same form (absolute or relative) as the base path
+        :param is_dir: Whether the path is a directory
+        """
+        name = path[path.rfind("/") + 1 :]
+        if name in self._any_names or (is_dir and name in self._dir_names):
+            return True
+        if self._any_regex and self._any_regex.match(path):
+            return True
+        if is_dir and self._dir_regex and self._dir_regex.match(path):
+            return True
+
+        if (
+            path.startswith(self._base)
+            and path[self._base_len - 1 : self._base_len] == "/"
+        ):
+            relative = path[self._base_len :]
+            if self._dir_names and not self._dir_names.isdisjoint(
+                relative.split("/")[:-1]
+            ):
+                return True
+            if self._sub_regex and self._sub_regex.match("/" + relative):
+                return True
+        if self._abs_sub_regex and self._abs_sub_regex.match(path):
+            return True
+
+        return False
+
+
 def open_ignores(
     base_path: Path, ignore_path: Path, is_init: bool = False
 ) -> FileIgnore:
@@ -0,0 +1,72 @@
+import os
+import stat
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+
+SNIFF_SIZE = 512
+"""Number of bytes read from the start of each file to classify it"""
+
+
+class FileClass(NamedTuple):
+    binary: bool
+    # The file's first line, without its terminator, if it is a text file starting with "#!"
+    shebang: Optional[str]
+
+
+def sniff(prefix: bytes) -> FileClass:
+    """
+    Classifies a file from the first SNIFF_SIZE bytes of its contents
+    """
+    if b"\0" in prefix:
+        return FileClass(binary=True, shebang=None)
+    if not prefix.startswith(b"#!"):
+        return FileClass(binary=False, shebang=None)
+    line = prefix.splitlines()[0]
+    return FileClass(binary=False, shebang=line.decode("utf-8", "replace"))
+
+
+class FileClassifier:
+    """
+    Classifies files by their contents, for all tools in a Bento run
+
+    Each file's prefix is read at most once while the file is unchanged:
+    classifications are cached per path and modification time.
+
+    Access is threadsafe.
+    """
+
+    def __init__(self) -> None:
+        self._classes: Dict[str, Tuple[int, FileClass]] = {}
+
+    def classify(self, path: Path) -> Optional[FileClass]:
+        """
+        Returns a file's classification, or None if it is not a readable regular file
+        """
+        key = str(path)
+        try:
+            st = os.stat(key)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+
+        cached = self._classes.get(key)
+        if cached is not None and cached[0] == st.st_mtime_ns:
+            return cached[1]
+
+        try:
+            with open(key, "rb") as stream:
+                file_class = sniff(stream.read(SNIFF_SIZE))
+        except OSError:
+            return None
+        # Single assignments are atomic, so concurrent classifications of the
+        # same file at worst read it twice
+        self._classes[key] = (st.st_mtime_ns, file_class)
+        return file_class
+
+    def shebang(self, path: Path) -> Optional[str]:
+        """
+        Returns a file's shebang line, if it is a text file that starts with one
+        """
+        file_class = self.classify(path)
+        return file_class.shebang if file_class else None
@@ -26,6 +26,22 @@ class Formatter(ABC):
         """Formats the list of violations for the end user."""
         pass
 
+    @property
+    def streams(self) -> bool:
+        """
+        Whether this formatter can output each tool's findings as soon as that tool completes
+
+        Streaming formatters' outputs are the concatenation of dump_tool's
+        outputs for each tool, rather than a single document or summary.
+        """
+        return False
+
+    def dump_tool(
+        self, tool_id: str, findings: Collection[Violation]
+    ) -> Collection[str]:
+        """Formats a single tool's violations for the end user."""
+        return self.dump({tool_id: findings})
+
     @staticmethod
     def path_of(violation: Violation) -> str:
         return violation.path
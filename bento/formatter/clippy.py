@@ -61,6 +61,10 @@ class Clippy(Formatter):
 
         return f"{Clippy.BOLD}{tool_id} {link}{Clippy.END}"
 
+    @property
+    def streams(self) -> bool:
+        return True
+
     def dump(self, findings: FindingsMap) -> Collection[str]:
         if not findings:
             return []
@@ -46,6 +46,10 @@ class Stylish(Formatter):
 
         return out
 
+    @property
+    def streams(self) -> bool:
+        return True
+
     def dump(self, findings: FindingsMap) -> Collection[str]:
         violations = self.by_path(findings)
         lines = []
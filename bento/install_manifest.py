@@ -0,0 +1,111 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+import attr
+
+from bento import __version__ as BENTO_VERSION
+
+Stamp = Dict[str, Optional[int]]
+
+
+def stamp(paths: Iterable[Path]) -> Stamp:
+    """
+    Returns the modification times, in nanoseconds, of each path
+
+    Missing paths have a modification time of None.
+    """
+    mtimes: Stamp = {}
+    for p in paths:
+        try:
+            mtimes[str(p)] = p.stat().st_mtime_ns
+        except OSError:
+            mtimes[str(p)] = None
+    return mtimes
+
+
+@attr.s
+class InstallManifest:
+    """
+    Records which tools are known to be installed, so that tool setup can be skipped
+
+    Each installation is identified by a name (e.g. the tool's ID), and its entry
+    holds:
+      - the tool's installation key, which identifies what the tool requires
+        (e.g. its package specifications, or its Docker images)
+      - the modification times of the paths the tool is installed into (e.g. its
+        virtual environment, or its node_modules directory); these change
+        when packages are added or removed
+      - the resolved package versions or image IDs, at the time of installation
+
+    An entry is current if its key and modification times match; otherwise the
+    tool's full installation checks must run again.
+
+    Access is threadsafe.
+    """
+
+    path: Path = attr.ib(converter=Path)
+    _lock = attr.ib(type=threading.Lock, factory=threading.Lock, init=False)
+    _entries: Dict[str, Dict[str, Any]] = attr.ib(default=None, init=False)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            self._entries = {}
+            if self.path.exists():
+                try:
+                    with self.path.open() as stream:
+                        data = json.load(stream)
+                    if data.get("version") == BENTO_VERSION:
+                        self._entries = data.get("tools", {})
+                except (OSError, ValueError):
+                    logging.warning(f"Ignoring invalid install manifest {self.path}")
+        return self._entries
+
+    def is_current(self, name: str, key: str, paths: Iterable[Path]) -> bool:
+        """
+        Returns whether an installation was recorded with this key, and its paths are unchanged
+        """
+        with self._lock:
+            entry = self._load().get(name)
+        return bool(entry and entry["key"] == key and entry["stamp"] == stamp(paths))
+
+    def record(
+        self, name: str, key: str, paths: Iterable[Path], installed: Mapping[str, str]
+    ) -> None:
+        """
+        Records that a tool's installation is complete
+
+        Should be called after the tool's installation has completed, so that
+        modification times reflect the installed state.
+        """
+        entry = {"key": key, "stamp": stamp(paths), "installed": dict(installed)}
+        with self._lock:
+            entries = self._load()
+            entries[name] = entry
+            self._save(entries)
+
+    def wipe(self) -> None:
+        """
+        Forgets all installed tools
+        """
+        with self._lock:
+            self._entries = {}
+            try:
+                self.path.unlink()
+            except OSError:
+                pass
+
+    def _save(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first, so that concurrent Bento runs never
+            # observe a partially written manifest
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}")
+            with tmp_path.open("w") as stream:
+                json.dump({"version": BENTO_VERSION, "tools": entries}, stream)
+            os.replace(str(tmp_path), str(self.path))
+        except OSError:
+            logging.warning(f"Could not write install manifest {self.path}")
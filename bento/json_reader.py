@@ -0,0 +1,143 @@
+import json
+from typing import Any, Iterator, TextIO
+
+CHUNK_SIZE = 64 * 1024
+"""Number of characters read from a stream at a time"""
+
+WHITESPACE = " \t\n\r"
+
+_decoder = json.JSONDecoder()
+
+
+class JsonReader:
+    """
+    Incrementally decodes a JSON document from a text stream
+
+    Arrays and objects can be iterated (see items and members), rather than
+    decoded whole, so that memory use is bounded by their largest element,
+    rather than by the whole document. E.g., for a document like
+    {"errors": [...], "results": [...]}:
+
+        reader = JsonReader(stream)
+        for key in reader.members():
+            if key == "results":
+                for result in reader.items():
+                    ...
+            else:
+                reader.value()
+    """
+
+    def __init__(self, stream: TextIO, chunk_size: int = CHUNK_SIZE) -> None:
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """
+        Reads more of the stream into the buffer
+
+        Reads at least as much as is buffered, so that values spanning many
+        chunks are re-decoded a logarithmic number of times.
+
+        :return: False if the stream has ended
+        """
+        if self._eof:
+            return False
+        pending = len(self._buffer) - self._pos
+        chunk = self._stream.read(max(self._chunk_size, pending))
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """
+        Returns the next character that is not whitespace, without consuming it
+
+        :raises ValueError: If the stream ends first
+        """
+        while True:
+            while (
+                self._pos < len(self._buffer) and self._buffer[self._pos] in WHITESPACE
+            ):
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def _expect(self, char: str) -> None:
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' in JSON document, found '{found}'")
+        self._pos += 1
+
+    def _at(self, char: str) -> bool:
+        """
+        Consumes char if it is next (ignoring whitespace)
+        """
+        if self._peek() == char:
+            self._pos += 1
+            return True
+        return False
+
+    def value(self) -> Any:
+        """
+        Decodes the next value whole
+
+        :raises ValueError: If the value is not valid JSON
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number that ends the buffer may continue in the stream
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def items(self) -> Iterator[Any]:
+        """
+        Decodes the next value, which must be an array, yielding its elements
+
+        :raises ValueError: If the value is not a valid JSON array
+        """
+        self._expect("[")
+        if self._at("]"):
+            return
+        while True:
+            yield self.value()
+            if not self._at(","):
+                self._expect("]")
+                return
+
+    def members(self) -> Iterator[str]:
+        """
+        Decodes the next value, which must be an object, yielding its keys
+
+        Each member's value must be consumed (with value, items, or members)
+        before the next key is yielded.
+
+        :raises ValueError: If the value is not a valid JSON object
+        """
+        self._expect("{")
+        if self._at("}"):
+            return
+        while True:
+            if self._peek() != '"':
+                raise ValueError("Expected a key in JSON object")
+            key = self.value()
+            self._expect(":")
+            yield key
+            if not self._at(","):
+                self._expect("}")
+                return
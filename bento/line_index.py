@@ -0,0 +1,110 @@
+"""
+Source line lookups for tool output parsers
+
+Parsers attach the source line of each finding as its syntactic context.
+Rather than re-reading a file for each finding, a LineIndex memory-maps each
+file once, records the offset at which each of its lines starts, and slices out
+requested lines.
+"""
+import locale
+import mmap
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Union, cast
+
+_LINE_END = re.compile(rb"\r\n|\r|\n")
+_NEWLINE = re.compile(rb"\n")
+
+
+class _IndexedFile:
+    """
+    The line offsets of a single memory-mapped file
+    """
+
+    def __init__(self, path: Path, universal_newlines: bool) -> None:
+        self._buffer: Union[bytes, mmap.mmap]
+        with path.open("rb") as stream:
+            try:
+                self._buffer = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files can not be mapped
+                self._buffer = b""
+        self._starts: List[int] = [0]
+        # mmap supports the buffer protocol, so the pattern can scan it in place
+        buffer = cast(bytes, self._buffer)
+        self._universal_newlines = universal_newlines
+        line_end = _LINE_END if universal_newlines else _NEWLINE
+        self._starts.extend(m.end() for m in line_end.finditer(buffer))
+        if self._starts[-1] == len(self._buffer):
+            # Terminated last line (or empty file)
+            self._starts.pop()
+
+    def line(self, line_number: int, encoding: str, errors: str) -> Optional[str]:
+        if not 0 < line_number <= len(self._starts):
+            return None
+        start = self._starts[line_number - 1]
+        end = (
+            self._starts[line_number]
+            if line_number < len(self._starts)
+            else len(self._buffer)
+        )
+        raw = self._buffer[start:end]
+        if not self._universal_newlines:
+            return raw.decode(encoding, errors)
+        stripped = raw.rstrip(b"\r\n")
+        text = stripped.decode(encoding, errors)
+        # Lines are returned as read in text mode, with newlines translated to "\n"
+        return text + "\n" if len(stripped) < len(raw) else text
+
+    def close(self) -> None:
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+
+class LineIndex:
+    """
+    Looks up lines in files, reading each file at most once
+
+    Files are decoded as by open(), so lines returned here are identical to
+    those returned by bento.util.fetch_line_in_file. Files are assumed not to
+    change while indexed; create one index per parse, and close it once done.
+
+    As for open(), encoding defaults to the locale's preferred encoding, and
+    errors to "strict". If newline is None, lines end in "\n", "\r", or "\r\n",
+    which are translated to "\n"; if newline is "\n", lines end only in "\n",
+    and are returned untranslated (so that lines of files with CRLF line endings
+    keep their "\r").
+    """
+
+    def __init__(
+        self,
+        encoding: Optional[str] = None,
+        errors: Optional[str] = None,
+        newline: Optional[str] = None,
+    ) -> None:
+        if newline not in (None, "\n"):
+            raise ValueError(f"illegal newline value: {newline!r}")
+        self._files: Dict[Path, Optional[_IndexedFile]] = {}
+        self._encoding = encoding or locale.getpreferredencoding(False)
+        self._errors = errors or "strict"
+        self._universal_newlines = newline is None
+
+    def line(self, path: Path, line_number: int) -> Optional[str]:
+        """
+        `line_number` is one-indexed! Returns the line if it can be found, returns None if the path doesn't exist
+        """
+        try:
+            indexed = self._files[path]
+        except KeyError:
+            indexed = self._files[path] = (
+                _IndexedFile(path, self._universal_newlines) if path.is_file() else None
+            )
+        if indexed is None:
+            return None
+        return indexed.line(line_number, self._encoding, self._errors)
+
+    def close(self) -> None:
+        for indexed in self._files.values():
+            if indexed is not None:
+                indexed.close()
+        self._files.clear()
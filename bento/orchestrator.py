@@ -1,11 +1,13 @@
 import logging
 import time
-from typing import Collection, Iterable, Tuple
+from typing import Callable, Collection, Iterable, List, Optional, Tuple
 
+import attr
 import click
 
+import bento.tracing as tracing
 from bento.constants import IGNORE_FILE_NAME
-from bento.result import Baseline
+from bento.result import Baseline, HashUnion
 from bento.target_file_manager import NoGitHeadException, TargetFileManager
 from bento.tool import Tool
 from bento.tool_runner import Runner, RunResults, RunStep
@@ -18,6 +20,8 @@ def orchestrate(
     target_file_manager: TargetFileManager,
     staged: bool,
     tools: Iterable[Tool],
+    on_result: Optional[Callable[[RunResults], Collection[str]]] = None,
+    fail_fast: bool = False,
 ) -> Tuple[Collection[RunResults], float]:
     """
         Manages interactions between TargetFileManager, Runner and Tools
@@ -25,21 +29,38 @@ def orchestrate(
         Uses passed target_file_manager, staged flag, and tool list to setup
         Runner and runs tools on relevant files, returning aggregated output
         of tool running and time to run all tools in parallel
+
+        If present, on_result is called with each tool's results as soon as the
+        tool completes (see Runner.parallel_results)
+
+        If fail_fast is set, all tools are cancelled once any tool finds an
+        unarchived finding (see Runner.fail_fast)
     """
     elapsed = 0.0
     if staged:
-        head_baseline, elapsed = _calculate_head_comparison(target_file_manager, tools)
+        with tracing.span("run.head"):
+            head_baseline, elapsed = _calculate_head_comparison(
+                target_file_manager, tools
+            )
         for t in tools:
             tool_id = t.tool_id()
+            head_hashes = head_baseline.get(tool_id, set())
             if tool_id not in baseline:
-                baseline[tool_id] = head_baseline.get(tool_id, set())
+                baseline[tool_id] = head_hashes
             else:
-                baseline[tool_id].update(head_baseline.get(tool_id, set()))
+                baseline[tool_id] = HashUnion((baseline[tool_id], head_hashes))
 
     with target_file_manager.run_context(staged, RunStep.CHECK) as target_paths:
-        use_cache = not staged  # if --all then can use cache
+        # Results are cached by file contents, so staged results can be cached as well;
+        # once committed, they are reused as the next commit's head baseline
         skip_setup = staged  # if check --all then include setup
-        runner = Runner(paths=target_paths, use_cache=use_cache, skip_setup=skip_setup)
+        runner = Runner(
+            paths=target_paths,
+            use_cache=True,
+            skip_setup=skip_setup,
+            fail_fast=fail_fast,
+            walked=target_file_manager.walked_paths(),
+        )
 
         if len(runner.paths) == 0:
             echo_warning(
@@ -50,39 +71,87 @@ def orchestrate(
             elapsed = 0.0
         else:
             before = time.time()
-            all_results = runner.parallel_results(tools, baseline)
+            with tracing.span("run.check"):
+                all_results = runner.parallel_results(
+                    tools, baseline, on_result=on_result
+                )
             elapsed += time.time() - before
 
     return all_results, elapsed
 
 
+def _cached_head_comparison(
+    target_file_manager: TargetFileManager, tools: Iterable[Tool]
+) -> Tuple[Baseline, List[Tool]]:
+    """
+    Calculates the branch head baseline from cached results, where possible
+
+    Results are looked up by the contents of the branch head's versions of
+    files, so the branch head need not be checked out.
+
+    :return: The baseline for tools whose results were all cached, and the
+             remaining tools
+    """
+    with tracing.span("cache.head"):
+        digests = target_file_manager.head_digests()
+        if digests is None:
+            return {}, list(tools)
+
+        baseline: Baseline = {}
+        remaining: List[Tool] = []
+        for t in tools:
+            findings = t.cached_results(digests)
+            if findings is None:
+                remaining.append(t)
+            else:
+                baseline[t.tool_id()] = {f.syntactic_identifier_str() for f in findings}
+    logging.debug(f"Head baseline cached for {len(baseline)} tool(s)")
+    return baseline, remaining
+
+
 def _calculate_head_comparison(
     target_file_manager: TargetFileManager, tools: Iterable[Tool]
 ) -> Tuple[Baseline, float]:
     """
     Calculates a baseline consisting of all findings from the branch head
 
-    If no HEAD branch exists return empty baseline
+    Only staged files that exist in the branch head are analyzed. Tools whose
+    results for the branch head's versions of these files are cached are not
+    run; other tools run on an overlay of the project that has the branch
+    head's versions of these files (see TargetFileManager.head_context), so the
+    working tree is never modified. If no HEAD branch exists return empty
+    baseline
 
     :param paths: Which paths are being checked
     :param tools: Which tools to check
     :return: The branch head baseline
     """
     try:
-        with target_file_manager.run_context(True, RunStep.BASELINE) as target_paths:
-            runner = Runner(paths=target_paths, use_cache=True, skip_setup=True)
+        baseline, remaining = _cached_head_comparison(target_file_manager, tools)
+        if not remaining:
+            return baseline, 0.0
+        with target_file_manager.head_context() as (head_path, target_paths):
+            # Results in the overlay are not cached, since its paths are not the
+            # project's; the HEAD versions of files were usually checked (and
+            # cached) before they were committed
+            runner = Runner(paths=target_paths, use_cache=False, skip_setup=True)
             if len(runner.paths) > 0:
                 before = time.time()
-                comparison_results = runner.parallel_results(tools, {}, keep_bars=False)
-                baseline = {
-                    tool_id: {f.syntactic_identifier_str() for f in findings}
+                head_tools = [
+                    attr.evolve(t, context=t.context.at(head_path)) for t in remaining
+                ]
+                comparison_results = runner.parallel_results(
+                    head_tools, {}, keep_bars=False
+                )
+                baseline.update(
+                    (tool_id, {f.syntactic_identifier_str() for f in findings})
                     for tool_id, findings in comparison_results
                     if isinstance(findings, list)
-                }
+                )
                 elapsed = time.time() - before
                 return baseline, elapsed
             else:
-                return {}, 0.0
+                return baseline, 0.0
     except NoGitHeadException:
         logging.debug("No git head found so defaulting to empty head baseline")
         return {}, 0.0
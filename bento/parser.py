@@ -1,9 +1,10 @@
 import os
 from pathlib import Path
-from typing import Generic, List, TypeVar
+from typing import Generic, List, Optional, TypeVar
 
 import attr
 
+from bento.line_index import LineIndex
 from bento.violation import Violation
 
 R = TypeVar("R", contravariant=True)
@@ -16,6 +17,7 @@ def _absolute(path: Path) -> Path:
 @attr.s
 class Parser(Generic[R]):
     base_path = attr.ib(type=Path, converter=_absolute)
+    _lines = attr.ib(type=LineIndex, factory=LineIndex, init=False, repr=False)
 
     def trim_base(self, path: str) -> str:
         wrapped = Path(path)
@@ -23,5 +25,19 @@ class Parser(Generic[R]):
             wrapped = self.base_path / wrapped
         return os.path.relpath(wrapped, self.base_path)
 
+    def fetch_line(self, path: Path, line_number: int) -> Optional[str]:
+        """
+        `line_number` is one-indexed! Returns the line if it can be found, returns None if the path doesn't exist
+
+        Each file is read at most once per parser.
+        """
+        return self._lines.line(path, line_number)
+
+    def close(self) -> None:
+        """
+        Releases files read by fetch_line
+        """
+        self._lines.close()
+
     def parse(self, result: R) -> List[Violation]:
         return []
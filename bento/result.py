@@ -1,6 +1,6 @@
 import json
 from collections import OrderedDict
-from typing import Any, Dict, List, Mapping, Set, TextIO, Union
+from typing import Any, Container, Dict, List, Mapping, Set, TextIO, Tuple, Union
 
 import attr
 
@@ -10,17 +10,29 @@ VIOLATIONS_KEY = "violations"
 
 Hash = str
 ToolId = str
-Baseline = Dict[str, Set[Hash]]
+Baseline = Dict[str, Container[Hash]]
+# A baseline that is only read, e.g. while filtering findings
+BaselineView = Mapping[str, Container[Hash]]
 ToolResults = Mapping[str, Mapping[Hash, Mapping[str, Any]]]
 
 
+@attr.s(auto_attribs=True, frozen=True)
+class HashUnion(Container[Hash]):
+    """
+    The union of several collections of finding hashes
+    """
+
+    parts: Tuple[Container[Hash], ...]
+
+    def __contains__(self, h: object) -> bool:
+        return any(h in p for p in self.parts)
+
+
 def filtered(
-    tool_id: str, output: List[Violation], baseline: Baseline
+    tool_id: str, output: List[Violation], baseline: BaselineView
 ) -> List[Violation]:
-    rejects: Set[Hash] = set(baseline.get(tool_id, {}))
-    return [
-        attr.evolve(v, filtered=v.syntactic_identifier_str() in rejects) for v in output
-    ]
+    rejects: Container[Hash] = baseline.get(tool_id, set())
+    return [v.with_filtered(v.syntactic_identifier_str() in rejects) for v in output]
 
 
 def dump_results(results: List[Violation]) -> Dict[str, Dict[Hash, Dict[str, Any]]]:
@@ -42,7 +54,7 @@ def load_baseline(text: Union[str, TextIO]) -> Mapping[str, ToolResults]:
     return parsed or {}
 
 
-def json_to_violation_hashes(text: Union[str, TextIO]) -> Baseline:
+def json_to_violation_hashes(text: Union[str, TextIO]) -> Dict[str, Set[Hash]]:
     parsed = load_baseline(text)
     out = {}
     for (tool_id, r) in parsed.items():
@@ -52,11 +64,9 @@ def json_to_violation_hashes(text: Union[str, TextIO]) -> Baseline:
     return out
 
 
-def to_cache_repr(findings: List[Violation]) -> str:
-    as_dict = [attr.asdict(f) for f in findings]
-    return json.dumps(as_dict)
+def to_cache_repr(findings: List[Violation]) -> List[Dict[str, Any]]:
+    return [attr.asdict(f, filter=lambda a, _: a.init) for f in findings]
 
 
-def from_cache_repr(text: str) -> List[Violation]:
-    parsed = json.loads(text)
+def from_cache_repr(parsed: List[Dict[str, Any]]) -> List[Violation]:
     return [Violation(**kwargs) for kwargs in parsed]
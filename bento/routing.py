@@ -0,0 +1,111 @@
+import re
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, List, Optional, Pattern, Set, Tuple
+
+from bento.tool import Tool
+
+SCOPED_FLAGS = [(re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s")]
+"""Pattern flags that are preserved when patterns are combined"""
+
+
+def _key(pattern: Pattern) -> Hashable:
+    return (pattern.pattern, pattern.flags)
+
+
+def _combine(patterns: Iterable[Pattern]) -> Optional[Pattern]:
+    """
+    Returns a pattern that matches iff any of patterns match, if one can be built
+    """
+    parts = []
+    for p in patterns:
+        if not isinstance(p.pattern, str) or p.flags & re.VERBOSE:
+            return None
+        letters = "".join(letter for flag, letter in SCOPED_FLAGS if p.flags & flag)
+        parts.append(f"(?{letters}:{p.pattern})" if letters else f"(?:{p.pattern})")
+    return re.compile("|".join(parts)) if parts else None
+
+
+def route(tools: Iterable[Tool], paths: Iterable[Path]) -> Dict[str, Set[Path]]:
+    """
+    Returns the paths that each tool should analyze, by tool ID
+
+    Equivalent to each tool's filter_paths, but each path is classified once for
+    all tools: tools that share file name filters (e.g., all Python tools) are
+    matched once, paths whose names match no filter are rejected by a single
+    combined pattern, and files' shebangs are read at most once.
+    """
+    tool_list = list(tools)
+    path_list = list(paths)
+    routes: Dict[str, Set[Path]] = {t.tool_id(): set() for t in tool_list}
+
+    # Tools that customize filter_paths filter for themselves
+    routed: List[Tool] = []
+    for t in tool_list:
+        if type(t).filter_paths is Tool.filter_paths:
+            routed.append(t)
+        else:
+            routes[t.tool_id()] = t.filter_paths(path_list)
+    if not routed:
+        return routes
+
+    name_filters: Dict[Hashable, Pattern] = {}
+    shebang_filters: Dict[Hashable, Pattern] = {}
+    # Each tool's (name filter, shebang filter) keys
+    rules: Dict[str, Tuple[Hashable, Optional[Hashable]]] = {}
+    for t in routed:
+        name_key = _key(t.file_name_filter)
+        name_filters[name_key] = t.file_name_filter
+        shebang_key = None
+        if t.shebang_pattern:
+            shebang_key = _key(t.shebang_pattern)
+            shebang_filters[shebang_key] = t.shebang_pattern
+        rules[t.tool_id()] = (name_key, shebang_key)
+
+    # Tools, by the name filter they use, or by the shebang pattern they use
+    # for files that do not match their name filter
+    by_name: Dict[Hashable, List[str]] = {}
+    by_shebang: Dict[Tuple[Hashable, Hashable], List[str]] = {}
+    for tool_id, (name_key, shebang_key) in rules.items():
+        by_name.setdefault(name_key, []).append(tool_id)
+        if shebang_key is not None:
+            by_shebang.setdefault((name_key, shebang_key), []).append(tool_id)
+
+    any_name = _combine(name_filters.values())
+    classifier = routed[0].context.file_classifier
+    name_matches: Dict[str, Set[Hashable]] = {}
+    shebang_matches: Dict[str, Set[Hashable]] = {}
+
+    for p in path_list:
+        # Run targets are already resolved (see TargetFileManager)
+        p = p if p.is_absolute() else p.resolve()
+        name = p.name
+        matched = name_matches.get(name)
+        if matched is None:
+            if any_name is not None and not any_name.match(name):
+                matched = set()
+            else:
+                matched = {k for k, f in name_filters.items() if f.match(name)}
+            name_matches[name] = matched
+
+        for name_key in matched:
+            for tool_id in by_name[name_key]:
+                routes[tool_id].add(p)
+
+        unmatched = [k for k in by_shebang if k[0] not in matched]
+        if not unmatched:
+            continue
+        shebang = classifier.shebang(p)
+        if shebang is None:
+            continue
+        shebang_matched = shebang_matches.get(shebang)
+        if shebang_matched is None:
+            shebang_matched = {
+                k for k, f in shebang_filters.items() if f.match(shebang)
+            }
+            shebang_matches[shebang] = shebang_matched
+        for name_key, shebang_key in unmatched:
+            if shebang_key in shebang_matched:
+                for tool_id in by_shebang[(name_key, shebang_key)]:
+                    routes[tool_id].add(p)
+
+    return routes
@@ -1,139 +1,454 @@
-import json
+import hashlib
 import logging
+import os
+import struct
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
 
 import attr
-import pymmh3 as mmh3
 
+import bento.cache_format as cache_format
 from bento import __version__ as BENTO_VERSION
+from bento.cache_format import CacheReader, StoredFile
+from bento.result import to_cache_repr
+from bento.violation import Violation
+
+CACHE_EXTENSION = "bin"
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class FileState:
+    """
+    Identifies the contents of a single file at the time of a cache lookup
+    """
+
+    mtime_ns: int
+    size: int
+    digest: str
+
+
+@attr.s(auto_attribs=True)
+class _ToolEntries:
+    """
+    A tool's loaded cache entries
+    """
+
+    key: str
+    files: Dict[str, StoredFile]
+    # The cache file from which stored results are lazily read, if any
+    reader: Optional[CacheReader]
 
 
 @attr.s
 class RunCache:
     """
-        Acts as a local cache for tool run output
+        Acts as a local, per-file cache for tool results
+
+        Each tool's entries are keyed by the tool's cache key (which captures the
+        tool version and configuration) and, for each file, by the file's content
+        hash. Modifying a file thus only invalidates the cached results for that file.
+
+        Results are stored in the binary format of bento.cache_format, which
+        is read lazily, so that cache hits only decode the hit files' results.
+
+        Results of tools whose findings in a file depend on other files are
+        instead cached for whole runs (see get_run), keyed by the tool's cache
+        key and the content hashes of every file in the run.
 
         Different tools can be accessed concurrently, but cache access
         is not threadsafe if multiple threads access the same tool.
     """
 
     cache_dir: Path = attr.ib(converter=Path)
-
-    def __cache_metadata_path(self, tool_id: str) -> Path:
-        """
-            Returns name of file that cache results metadata for a given tool
-        """
-        return self.cache_dir / f"{tool_id}-meta.json"
+    _entries: Dict[str, _ToolEntries] = attr.ib(factory=dict, init=False)
 
     def __cache_data_path(self, tool_id: str) -> Path:
         """
             Returns name of file that cache results would be contained in
         """
-        return self.cache_dir / f"{tool_id}.data"
+        return self.cache_dir / f"{tool_id}.{CACHE_EXTENSION}"
 
-    def _modified_hash(self, paths: Iterable[Path]) -> str:
+    @staticmethod
+    def content_hash(path: Path) -> str:
         """
-        Returns a hash of the recursive mtime of a path.
-
-        Any modification of a file within this tree (that does not match an ignore pattern)
-        will change the hash.
+        Returns a hash of the contents of a file
         """
+        h = hashlib.blake2b(digest_size=16)
+        with path.open("rb") as stream:
+            for chunk in iter(lambda: stream.read(1 << 16), b""):
+                h.update(chunk)
+        return h.hexdigest()
 
-        # No matter settings of .bentoignore, these are always excluded
-        files_and_times = ((str(p), p.stat().st_mtime_ns) for p in paths if p.exists())
-        h = 0
-        for f, m in files_and_times:
-            h ^= mmh3.hash128(f"{f}:{m}")
+    @staticmethod
+    def data_hash(data: bytes) -> str:
+        """
+        Returns a hash of a file's contents, as read into memory
 
-        return format(h, "x")
+        Matches content_hash for a file with these contents.
+        """
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
 
     def __cleanup(self, tool_id: str) -> None:
         """
             Delete all state relevant for cacheing tool_id
         """
-        cache_metadata_path = self.__cache_metadata_path(tool_id)
-        cache_data_path = self.__cache_data_path(tool_id)
+        loaded = self._entries.pop(tool_id, None)
+        if loaded and loaded.reader:
+            loaded.reader.close()
 
         # Silently delete file if exists
         # note that checking for file before deletion
         # has a TOCTOU race so will need a try-catch anyway
         try:
-            cache_metadata_path.unlink()
-        except OSError:
-            pass
-
-        try:
-            cache_data_path.unlink()
+            self.__cache_data_path(tool_id).unlink()
         except OSError:
             pass
 
     def wipe(self) -> None:
+        for loaded in self._entries.values():
+            if loaded.reader:
+                loaded.reader.close()
+        self._entries = {}
+        if not self.cache_dir.is_dir():
+            return
+        for p in self.cache_dir.iterdir():
+            try:
+                p.unlink()
+            except OSError:
+                pass
+
+    def _open(self, tool_id: str) -> Optional[CacheReader]:
+        """
+        Opens a tool's cache file, or returns None if it does not exist or is invalid
+        """
+        cache_data_path = self.__cache_data_path(tool_id)
+        if not cache_data_path.exists():
+            return None
         try:
-            self.cache_dir.unlink()
-        except OSError:
-            pass
+            return CacheReader(cache_data_path)
+        except (OSError, ValueError) as e:
+            logging.error(f"Failed to read tool {tool_id} cache: {e}")
+            return None
 
-    def get(self, tool_id: str, paths: Iterable[Path]) -> Optional[str]:
+    def _load(self, tool_id: str, tool_key: str) -> _ToolEntries:
         """
-            Returns stored run output if it exists in local run cache and the
-            cache entry is still valid (files have not been modified since caching)
+        Returns the per-file cache entries for a tool
 
-            Returns None if no such cache entry is found
+        Entries stored for a different Bento version or tool key are discarded.
         """
-        cache_metadata_path = self.__cache_metadata_path(tool_id)
-        cache_data_path = self.__cache_data_path(tool_id)
+        loaded = self._entries.get(tool_id)
+        if loaded is not None and loaded.key == tool_key:
+            return loaded
 
-        if not (cache_metadata_path.exists() and cache_data_path.exists()):
+        reader = self._open(tool_id)
+        files: Dict[str, StoredFile] = {}
+        if reader and reader.version == BENTO_VERSION and reader.key == tool_key:
+            files = reader.files()
+        elif self.__cache_data_path(tool_id).exists():
+            logging.warning(f"Invalidating cache for {tool_id}")
+            if reader:
+                reader.close()
+                reader = None
             self.__cleanup(tool_id)
+
+        loaded = _ToolEntries(key=tool_key, files=files, reader=reader)
+        self._entries[tool_id] = loaded
+        return loaded
+
+    def _stored(self, tool_id: str) -> _ToolEntries:
+        """
+        Returns a tool's stored entries, whatever their key
+
+        Stored file states let file contents be identified without hashing them,
+        before the key of a whole-run entry is known.
+        """
+        loaded = self._entries.get(tool_id)
+        if loaded is not None:
+            return loaded
+        reader = self._open(tool_id)
+        if reader and reader.version == BENTO_VERSION:
+            loaded = _ToolEntries(key=reader.key, files=reader.files(), reader=reader)
+            self._entries[tool_id] = loaded
+            return loaded
+        if reader:
+            reader.close()
+        return _ToolEntries(key="", files={}, reader=None)
+
+    @staticmethod
+    def _run_key(tool_key: str, digests: Mapping[Path, str]) -> str:
+        """
+        Returns the key of a whole-run entry for files with these contents
+        """
+        h = hashlib.blake2b(tool_key.encode(), digest_size=16)
+        for path, digest in sorted((str(p), d) for p, d in digests.items()):
+            h.update(f"\0{path}\0{digest}".encode())
+        return h.hexdigest()
+
+    def _file_state(
+        self, path: Path, entry: Optional[StoredFile]
+    ) -> Optional[FileState]:
+        """
+        Returns the current state of a file, or None if it can not be read
+
+        File contents are only hashed if the file's size or mtime differ from
+        those recorded in its cache entry.
+        """
+        try:
+            stat = path.stat()
+            if (
+                entry
+                and entry.mtime_ns == stat.st_mtime_ns
+                and entry.size == stat.st_size
+            ):
+                digest = entry.digest
+            else:
+                digest = self.content_hash(path)
+        except OSError:
             return None
+        return FileState(mtime_ns=stat.st_mtime_ns, size=stat.st_size, digest=digest)
 
-        with cache_metadata_path.open() as file:
-            try:
-                metadata = json.load(file)
-            except json.JSONDecodeError as e:
-                logging.error(f"Failed to parse tool {tool_id} cache metadata as json")
-                logging.error(e.msg, e.doc, e.pos)
-                self.__cleanup(tool_id)
+    @staticmethod
+    def _results(loaded: _ToolEntries, entry: StoredFile) -> List[Violation]:
+        if isinstance(entry.results, range):
+            assert loaded.reader is not None
+            return loaded.reader.violations(entry.results)
+        return list(entry.results)
+
+    def get(
+        self,
+        tool_id: str,
+        tool_key: str,
+        paths: Iterable[Path],
+        walked: Iterable[Path] = (),
+    ) -> Tuple[Dict[Path, List[Violation]], Dict[Path, Optional[FileState]]]:
+        """
+            Looks up stored results for each path
+
+            Returns a tuple of:
+              - A mapping from each path with a valid cache entry to its stored results
+              - A mapping from each remaining path to its current state; these
+                states should be passed back to `put` once results are available
+
+            :param walked: Directories that were walked in full to find paths;
+                           entries for other files in these directories are for
+                           files that were removed (or are now ignored), and are
+                           pruned once results are next stored
+        """
+        loaded = self._load(tool_id, tool_key)
+        path_list = list(paths)
+        roots = [os.path.join(str(w), "") for w in walked]
+        if roots:
+            requested = {str(p) for p in path_list}
+            for stale in [
+                f
+                for f in loaded.files
+                if f not in requested and any(f.startswith(r) for r in roots)
+            ]:
+                del loaded.files[stale]
+
+        hits: Dict[Path, List[Violation]] = {}
+        misses: Dict[Path, Optional[FileState]] = {}
+        for p in path_list:
+            entry = loaded.files.get(str(p))
+            state = self._file_state(p, entry)
+            if entry and state and entry.digest == state.digest:
+                hits[p] = self._results(loaded, entry)
+                loaded.files[str(p)] = entry._replace(mtime_ns=state.mtime_ns)
+            else:
+                misses[p] = state
+
+        logging.debug(f"{tool_id}: {len(hits)} cache hits, {len(misses)} misses")
+        return hits, misses
+
+    def lookup(
+        self, tool_id: str, tool_key: str, digests: Mapping[Path, str]
+    ) -> Optional[Dict[Path, List[Violation]]]:
+        """
+            Looks up stored results for files with known contents
+
+            Unlike `get`, files are not read, so results can be looked up for file
+            contents that are not on disk (e.g. a file's committed version).
+
+            :param digests: Each path's content hash (see data_hash)
+            :return: A mapping from each path to its stored results, or None if any
+                     path has no stored results for its contents
+        """
+        loaded = self._load(tool_id, tool_key)
+        hits: Dict[Path, List[Violation]] = {}
+        for p, digest in digests.items():
+            entry = loaded.files.get(str(p))
+            if not entry or entry.digest != digest:
+                logging.debug(f"{tool_id}: No stored results for {p}")
                 return None
+            hits[p] = self._results(loaded, entry)
+        return hits
 
-        cache_hash = metadata.get("hash")
-        cache_paths = {Path(p) for p in metadata.get("paths")}
-        cache_bento_version = metadata.get("version")
+    def get_run(
+        self, tool_id: str, tool_key: str, paths: Iterable[Path]
+    ) -> Tuple[Optional[List[Violation]], Dict[Path, Optional[FileState]]]:
+        """
+            Looks up stored results of a whole run on paths
 
-        if (
-            cache_paths != set(paths)
-            or cache_bento_version != BENTO_VERSION
-            or cache_hash != self._modified_hash(paths)
-        ):
-            logging.warning(f"Invalidating cache for {tool_id}")
-            self.__cleanup(tool_id)
+            The entry is keyed by tool_key and the contents of every path, so that
+            changing, adding, or removing any file invalidates it.
+
+            Returns a tuple of:
+              - The stored results, or None if no entry is valid
+              - Each path's current state; these states should be passed back to
+                `put_run` once results are available
+        """
+        stored = self._stored(tool_id)
+        states = {p: self._file_state(p, stored.files.get(str(p))) for p in paths}
+        results = self.lookup_run(
+            tool_id, tool_key, {p: s.digest for p, s in states.items() if s is not None}
+        )
+        if results is None or any(s is None for s in states.values()):
+            logging.debug(f"{tool_id}: Run cache miss")
+            return None, states
+        logging.debug(f"{tool_id}: Run cache hit")
+        return results, states
+
+    def lookup_run(
+        self, tool_id: str, tool_key: str, digests: Mapping[Path, str]
+    ) -> Optional[List[Violation]]:
+        """
+            Looks up stored results of a whole run on files with known contents
+
+            Like `lookup`, files are not read.
+
+            :param digests: Each path's content hash (see data_hash)
+            :return: The stored results, or None if no entry matches these contents
+        """
+        stored = self._stored(tool_id)
+        if stored.key != self._run_key(tool_key, digests) or set(stored.files) != {
+            str(p) for p in digests
+        }:
             return None
+        return [
+            v
+            for path in sorted(stored.files)
+            for v in self._results(stored, stored.files[path])
+        ]
+
+    def put_run(
+        self,
+        tool_id: str,
+        tool_key: str,
+        states: Mapping[Path, Optional[FileState]],
+        results: List[Violation],
+    ) -> None:
+        """
+            Caches results of a whole run, replacing any other entries for the tool
 
-        return cache_data_path.read_text()
+            Runs on files that could not be read are not cached.
 
-    def put(self, tool_id: str, paths: Iterable[Path], raw_results: str) -> None:
+            :param states: File states, as returned by `get_run`
         """
-            Caches raw_results as the output of running TOOL_ID on PATHS
+        digests: Dict[Path, str] = {}
+        for p, state in states.items():
+            if state is None:
+                logging.debug(f"{tool_id}: Not caching run, since {p} can not be read")
+                return
+            digests[p] = state.digest
+        if not digests:
+            return
+        # Replace any previous run's entry; this is not an invalidation of the
+        # tool's cache, so do not go through _load
+        run_key = self._run_key(tool_key, digests)
+        previous = self._entries.get(tool_id)
+        if previous is None or previous.key != run_key:
+            if previous and previous.reader:
+                previous.reader.close()
+            self._entries[tool_id] = _ToolEntries(key=run_key, files={}, reader=None)
+        # Results are stored with the first file, in their original order
+        first = min(digests, key=str)
+        self.put(
+            tool_id,
+            run_key,
+            states,
+            {p: results if p == first else [] for p in digests},
+        )
 
-            Note that RunCache.get assumed paths is not None so should be changed
-            if PATHS here is nullable
+    def put(
+        self,
+        tool_id: str,
+        tool_key: str,
+        states: Mapping[Path, Optional[FileState]],
+        results: Mapping[Path, List[Violation]],
+    ) -> None:
         """
-        self.__cleanup(tool_id)
+            Caches results for each path
+
+            Paths without a known state (e.g. because they could not be read at
+            lookup time) are not cached.
+
+            :param states: File states, as returned by `get`
+            :param results: Results, for every path in states
+        """
+        loaded = self._load(tool_id, tool_key)
+        for p, state in states.items():
+            if state is None:
+                loaded.files.pop(str(p), None)
+                continue
+            loaded.files[str(p)] = StoredFile(
+                mtime_ns=state.mtime_ns,
+                size=state.size,
+                digest=state.digest,
+                results=results[p],
+            )
 
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-        cache_metadata_path = self.__cache_metadata_path(tool_id)
         cache_data_path = self.__cache_data_path(tool_id)
 
-        # Data should be written before metadata
-        cache_data_path.write_text(raw_results)
-        hsh = self._modified_hash(paths)
+        # Write to a temporary file first, so that concurrent Bento runs never
+        # observe a partially written cache
+        tmp_path = cache_data_path.with_name(f"{cache_data_path.name}.{os.getpid()}")
+        try:
+            cache_format.write(
+                tmp_path, BENTO_VERSION, tool_key, loaded.files, loaded.reader
+            )
+        except BaseException as e:
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            if not isinstance(e, (TypeError, struct.error)):
+                raise
+            logging.warning(f"Not caching results for {tool_id}: {e}")
+            self.__cleanup(tool_id)
+            return
+
+        if loaded.reader:
+            loaded.reader.close()
+        os.replace(str(tmp_path), str(cache_data_path))
 
-        metadata = {
-            "paths": [str(p) for p in paths],
-            "hash": hsh,
-            "version": BENTO_VERSION,
-        }
+        # Stored results now refer to the new cache file
+        loaded.reader = self._open(tool_id)
+        loaded.files = loaded.reader.files() if loaded.reader else {}
 
-        with cache_metadata_path.open("w") as file:
-            json.dump(metadata, file)
+    def export(self, tool_id: str) -> Optional[Dict[str, Any]]:
+        """
+            Returns the contents of a tool's cache file as JSON-serializable data
+
+            Intended for debugging; returns None if the tool has no valid cache file.
+        """
+        reader = self._open(tool_id)
+        if reader is None:
+            return None
+        try:
+            return {
+                "version": reader.version,
+                "key": reader.key,
+                "files": {
+                    path: {
+                        "mtime": entry.mtime_ns,
+                        "size": entry.size,
+                        "hash": entry.digest,
+                        "results": to_cache_repr(reader.violations(entry.results)),
+                    }
+                    for path, entry in reader.files().items()
+                    if isinstance(entry.results, range)
+                },
+            }
+        finally:
+            reader.close()
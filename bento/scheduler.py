@@ -0,0 +1,243 @@
+import heapq
+import itertools
+import json
+import logging
+import os
+import subprocess
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import attr
+import psutil
+
+MEMORY_PER_JOB = 512 * 2 ** 20
+"""Memory budget, in bytes, for each concurrently running tool subprocess"""
+
+HISTORY_WEIGHT = 0.5
+"""Weight of previously recorded durations in a tool's duration estimate"""
+
+DEFAULT_DURATION = 1.0
+"""Estimated duration, in seconds, for tools without recorded durations"""
+
+
+class RunCancelled(Exception):
+    """
+    Raised in place of running, or completing, a subprocess once its scheduler is cancelled
+    """
+
+
+def default_jobs() -> int:
+    """
+    Returns the number of subprocesses that fit in this machine's CPU and memory budget
+    """
+    by_cpu = os.cpu_count() or 1
+    by_memory = psutil.virtual_memory().available // MEMORY_PER_JOB
+    return max(1, min(by_cpu, by_memory))
+
+
+@attr.s
+class Scheduler:
+    """
+    Limits the number of concurrently running tool subprocesses
+
+    Each running subprocess occupies a slot. When no slot is free, waiting
+    subprocesses are started in order of the estimated duration of their tool,
+    longest first, so that long-running tools do not start last and extend the
+    total run time.
+
+    Duration estimates are computed from durations recorded in previous runs,
+    which are persisted to history_path.
+
+    Once cancelled, running subprocesses are killed, and no further
+    subprocesses are started (see cancel).
+    """
+
+    jobs = attr.ib(type=int, factory=default_jobs)
+    history_path = attr.ib(type=Optional[Path], default=None)
+    _condition = attr.ib(
+        type=threading.Condition, factory=threading.Condition, init=False
+    )
+    _running = attr.ib(type=int, default=0, init=False)
+    _waiting: List[Tuple[float, int]] = attr.ib(factory=list, init=False)
+    _tickets: Iterator[int] = attr.ib(factory=itertools.count, init=False)
+    _durations: Dict[str, float] = attr.ib(default=None, init=False)
+    _cancelled = attr.ib(type=bool, default=False, init=False)
+    _kills: Dict[int, Callable[[], None]] = attr.ib(factory=dict, init=False)
+    _shield = attr.ib(type=threading.local, factory=threading.local, init=False)
+
+    def _load_durations(self) -> Dict[str, float]:
+        if self._durations is None:
+            self._durations = {}
+            if self.history_path and self.history_path.exists():
+                try:
+                    with self.history_path.open() as stream:
+                        self._durations = json.load(stream)
+                except (OSError, ValueError):
+                    logging.warning(
+                        f"Could not read tool durations from {self.history_path}"
+                    )
+        return self._durations
+
+    def estimate(self, tool_id: str) -> float:
+        """
+        Returns the estimated duration of a tool's run, in seconds
+        """
+        with self._condition:
+            durations = self._load_durations()
+            if tool_id in durations:
+                return durations[tool_id]
+            if durations:
+                return max(durations.values())
+            return DEFAULT_DURATION
+
+    def record(self, tool_id: str, duration: float) -> None:
+        """
+        Records the duration of a tool's run, in seconds
+        """
+        with self._condition:
+            durations = self._load_durations()
+            previous = durations.get(tool_id)
+            if previous is None:
+                durations[tool_id] = duration
+            else:
+                durations[tool_id] = (
+                    HISTORY_WEIGHT * previous + (1 - HISTORY_WEIGHT) * duration
+                )
+            if not self.history_path:
+                return
+            try:
+                self.history_path.parent.mkdir(parents=True, exist_ok=True)
+                with self.history_path.open("w") as stream:
+                    json.dump(durations, stream)
+            except OSError:
+                logging.warning(
+                    f"Could not write tool durations to {self.history_path}"
+                )
+
+    @contextmanager
+    def slot(self, tool_id: str) -> Iterator[None]:
+        """
+        Runs a block in a subprocess slot, waiting until a slot is available
+
+        :raises RunCancelled: If this scheduler is cancelled while waiting
+        """
+        ticket = (-self.estimate(tool_id), next(self._tickets))
+        with self._condition:
+            if self._is_cancelled():
+                raise RunCancelled()
+            heapq.heappush(self._waiting, ticket)
+            while self._running >= self.jobs or self._waiting[0] != ticket:
+                if self._is_cancelled():
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._condition.notify_all()
+                    raise RunCancelled()
+                self._condition.wait()
+            heapq.heappop(self._waiting)
+            self._running += 1
+            # The next waiter may also fit in a free slot
+            self._condition.notify_all()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._running -= 1
+                self._condition.notify_all()
+
+    def _is_cancelled(self) -> bool:
+        return self._cancelled and not getattr(self._shield, "depth", 0)
+
+    def cancel(self) -> None:
+        """
+        Cancels all subprocesses, other than those run in shielded blocks
+
+        Running subprocesses are killed (see cancellable); waiting subprocesses,
+        and subprocesses run later, raise RunCancelled instead of running.
+        """
+        with self._condition:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            kills = list(self._kills.values())
+            self._condition.notify_all()
+        for kill in kills:
+            try:
+                kill()
+            except Exception as e:
+                logging.debug(f"Could not cancel subprocess: {e}")
+
+    @contextmanager
+    def shielded(self) -> Iterator[None]:
+        """
+        Runs a block whose subprocesses are not cancelled
+
+        E.g., tool installation is shielded, so that it is never interrupted
+        part-way.
+        """
+        self._shield.depth = getattr(self._shield, "depth", 0) + 1
+        try:
+            yield
+        finally:
+            self._shield.depth -= 1
+
+    @contextmanager
+    def cancellable(self, kill: Callable[[], None]) -> Iterator[None]:
+        """
+        Runs a block that waits on a subprocess, calling kill if this scheduler is cancelled
+
+        :raises RunCancelled: If this scheduler is cancelled before the block completes
+        """
+        if getattr(self._shield, "depth", 0):
+            yield
+            return
+        key = next(self._tickets)
+        with self._condition:
+            cancelled = self._cancelled
+            if not cancelled:
+                self._kills[key] = kill
+        if cancelled:
+            kill()
+        try:
+            yield
+        except Exception as e:
+            if self._cancelled:
+                raise RunCancelled() from e
+            raise
+        finally:
+            with self._condition:
+                self._kills.pop(key, None)
+        if self._cancelled:
+            raise RunCancelled()
+
+    def run(
+        self,
+        command: List[str],
+        input: Optional[str] = None,
+        capture_output: bool = False,
+        check: bool = False,
+        **kwargs: Any,
+    ) -> subprocess.CompletedProcess:
+        """
+        Runs a command like subprocess.run, killing it if this scheduler is cancelled
+
+        This does not wait for a slot; call it in a slot block.
+
+        :raises RunCancelled: If this scheduler is cancelled before the command completes
+        """
+        if capture_output:
+            kwargs["stdout"] = subprocess.PIPE
+            kwargs["stderr"] = subprocess.PIPE
+        if input is not None:
+            kwargs["stdin"] = subprocess.PIPE
+        with subprocess.Popen(command, **kwargs) as process, self.cancellable(
+            process.kill
+        ):
+            stdout, stderr = process.communicate(input)
+        result: subprocess.CompletedProcess = subprocess.CompletedProcess(
+            process.args, process.returncode, stdout, stderr
+        )
+        if check:
+            result.check_returncode()
+        return result
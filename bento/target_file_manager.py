@@ -1,23 +1,34 @@
 import logging
+import os
+import subprocess
+import tempfile
 from collections import namedtuple
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Iterator, List
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
 
 import attr
 import click
 from pre_commit.git import zsplit
 from pre_commit.staged_files_only import staged_files_only
-from pre_commit.util import CalledProcessError, cmd_output, noop_context
+from pre_commit.util import cmd_output, noop_context
 
 import bento.git
+import bento.tracing as tracing
 from bento.error import UnsupportedGitStateException
 from bento.fignore import FileIgnore, Parser
+from bento.run_cache import RunCache
 from bento.tool_runner import RunStep
-from bento.util import Colors, echo_error, echo_newline
+from bento.util import batched, echo_error
+
+if TYPE_CHECKING:
+    import git  # noqa
 
 PATCH_CACHE = str(Path.home() / ".cache" / "bento" / "patches")
 
+PATHSPEC_BATCH_SIZE = 1000
+"""Maximum number of paths passed to a single git ls-tree"""
+
 GitStatus = namedtuple("GitStatus", ["added", "removed", "unmerged"])
 
 
@@ -57,17 +68,22 @@ class TargetFileManager:
                     we want to traverse
             staged: whether we want to scan just staged files
             ignore_rules_file_path: Path to .bentoignore file
+            index_path: If set, path of a target index that persists directory walks
+                        between runs (see TargetIndex)
     """
 
     _base_path = attr.ib(type=Path)
     _paths = attr.ib(type=List[Path])
     _staged = attr.ib(type=bool)
     _ignore_rules_file_path = attr.ib(type=Path)
+    _index_path = attr.ib(type=Optional[Path], default=None)
     _target_paths = attr.ib(type=List[Path], init=False)
 
-    def _staged_paths(self) -> List[Path]:
+    def _staged_paths(self, diff_filter: str = "ACMRTUXB") -> List[Path]:
         """
             Returns Absolute Paths to all files that are staged
+
+            :param diff_filter: Which git diff statuses to include (defaults to everything except for D)
         """
         repo = bento.git.repo()
         if not repo:
@@ -80,8 +96,7 @@ class TargetFileManager:
             "--name-only",
             "--no-ext-diff",
             "-z",
-            # Everything except for D
-            "--diff-filter=ACMRTUXB",
+            f"--diff-filter={diff_filter}",
             "--staged",
         ]
         result = repo.git.execute(cmd)
@@ -118,7 +133,10 @@ class TargetFileManager:
             )
 
         file_ignore = FileIgnore(
-            base_path=self._base_path, patterns=patterns, target_paths=paths
+            base_path=self._base_path,
+            patterns=patterns,
+            target_paths=paths,
+            index_path=self._index_path,
         )
 
         filtered: List[Path] = []
@@ -173,41 +191,169 @@ class TargetFileManager:
         )
         return GitStatus(added, removed, unmerged)
 
-    def _abort_if_untracked_and_removed(self, removed: List[str]) -> None:
+    def walked_paths(self) -> List[Path]:
         """
-            Raises UnsupportedGitStateException if any path is removed from
-            the git index but also appears in the filesystem.
+            Returns the input paths that are expanded in full to find target paths
 
-            :param removed (list): Removed paths
-            :raises UnsupportedGitStateException: If any removed paths are present on Filesystem
+            Any file under these paths that is not a target path was removed or is
+            ignored. When staged, only changed files are targets, so none are.
         """
-        untracked_removed = [r.replace(" ", r"\ ") for r in removed if Path(r).exists()]
-        if untracked_removed:
-            joined = " ".join(untracked_removed)
+        if self._staged:
+            return []
+        return [p.resolve() for p in self._paths]
 
-            def echo_cmd(cmd: str) -> None:
-                click.echo(f"    $ {click.style(cmd, bold=True)}\n", err=True)
+    def _in_head(self) -> List[Path]:
+        """
+            Returns the target paths that are staged, and that have a HEAD version
 
-            echo_error(
-                "One or more files deleted from git exist on the filesystem. Aborting to prevent data loss. To "
-                "continue, please stash by running the following two commands:"
-            )
-            echo_newline()
-            echo_cmd(f"git stash -u -- {joined}")
-            echo_cmd(f"git rm {joined}")
-            click.secho(
-                "Stashed changes can later be recovered by running:\n",
-                err=True,
-                fg=Colors.ERROR,
-            )
-            echo_cmd(f"git stash pop")
-            raise UnsupportedGitStateException()
+            Added, copied, or renamed files have no HEAD version to compare against.
+        """
+        in_head = set(self._staged_paths(diff_filter="MT"))
+        return [p for p in self._target_paths if p in in_head]
+
+    def head_digests(self) -> Optional[Dict[Path, str]]:
+        """
+            Returns content hashes (see RunCache.data_hash) of the HEAD versions of
+            the paths analyzed in the head context
+
+            Contents are read from git's object store, so HEAD is not checked out.
+
+            :return: A mapping from each path to its hash, or None if the head
+                     context must be used instead (e.g. when there are unmerged
+                     files, which the head context reports)
+        """
+        repo = bento.git.repo()
+        if not repo or self._staged_paths(diff_filter="U"):
+            return None
+        paths = self._in_head()
+        if not paths:
+            return {}
+        with tracing.span("git.cat_file"):
+            return self._head_hashes(repo, paths)
+
+    @staticmethod
+    def _cat_blobs(root: Path, objects: List[str]) -> Optional[List[bytes]]:
+        """
+            Reads the contents of git blobs, or returns None if any can not be read
+
+            :param objects: Names of the blobs (e.g. "HEAD:<path>" or object ids),
+                            which may not contain newlines
+        """
+        output = subprocess.run(
+            ["git", "cat-file", "--batch"],
+            cwd=str(root),
+            input="".join(f"{o}\n" for o in objects).encode(),
+            stdout=subprocess.PIPE,
+            check=True,
+        ).stdout
+
+        # Each object is output as "<object> <type> <size>\n<contents>\n"
+        blobs: List[bytes] = []
+        pos = 0
+        for _ in objects:
+            eol = output.find(b"\n", pos)
+            header = output[pos:eol].split()
+            if len(header) != 3 or header[1] != b"blob":
+                return None
+            start = eol + 1
+            end = start + int(header[2])
+            blobs.append(output[start:end])
+            pos = end + 1
+        return blobs
+
+    @classmethod
+    def _head_hashes(
+        cls, repo: "git.Repo", paths: List[Path]
+    ) -> Optional[Dict[Path, str]]:
+        """
+            Hashes the HEAD versions of paths, or returns None if any can not be read
+        """
+        root = Path(repo.working_tree_dir).resolve()
+        names = [p.relative_to(root).as_posix() for p in paths]
+        if any("\n" in n for n in names):
+            # Not representable in git cat-file's batch input
+            return None
+        blobs = cls._cat_blobs(root, [f"HEAD:{n}" for n in names])
+        if blobs is None:
+            return None
+        return {p: RunCache.data_hash(b) for p, b in zip(paths, blobs)}
+
+    def _link_overlay(self, head: Path, paths: List[Path]) -> None:
+        """
+            Links every entry of the project into head, other than paths and the
+            directories that contain them, which are created instead
+        """
+        base = self._base_path.resolve()
+        rels = {p.relative_to(base) for p in paths}
+        dirs = {d for r in rels for d in r.parents}
+        # Parents sort before their children
+        for d in sorted(dirs):
+            (head / d).mkdir(exist_ok=True)
+            for entry in os.scandir(str(base / d)):
+                rel = d / entry.name
+                if rel not in dirs and rel not in rels:
+                    os.symlink(entry.path, str(head / rel))
+
+    def _write_head_versions(
+        self, repo: "git.Repo", head: Path, paths: List[Path]
+    ) -> None:
+        """
+            Writes the HEAD versions of paths to their place in head
+
+            :raises subprocess.CalledProcessError: If git encounters an exception
+        """
+        root = Path(repo.working_tree_dir).resolve()
+        base = self._base_path.resolve()
+
+        # Look up blobs by object id, since paths may not be representable in
+        # git cat-file's batch input
+        entries: Dict[str, Tuple[str, str]] = {}
+        for batch in batched(
+            [p.relative_to(root).as_posix() for p in paths], PATHSPEC_BATCH_SIZE
+        ):
+            output = subprocess.run(
+                ["git", "--literal-pathspecs", "ls-tree", "-z", "--full-tree"]
+                + ["HEAD", "--", *batch],
+                cwd=str(root),
+                stdout=subprocess.PIPE,
+                check=True,
+            ).stdout
+            # Each entry is output as "<mode> <type> <object>\t<path>"
+            for record in zsplit(os.fsdecode(output)):
+                meta, name = record.split("\t", 1)
+                mode, kind, obj = meta.split()
+                if kind == "blob":
+                    entries[name] = (mode, obj)
+
+        in_tree = [p for p in paths if p.relative_to(root).as_posix() in entries]
+        if not in_tree:
+            return
+        modes, objects = zip(
+            *(entries[p.relative_to(root).as_posix()] for p in in_tree)
+        )
+        blobs = self._cat_blobs(root, list(objects))
+        if blobs is None:
+            raise subprocess.CalledProcessError(1, ["git", "cat-file", "--batch"])
+        for p, mode, blob in zip(in_tree, modes, blobs):
+            target = head / p.relative_to(base)
+            if mode == "120000":
+                os.symlink(os.fsdecode(blob), str(target))
+            else:
+                target.write_bytes(blob)
+                if mode == "100755":
+                    target.chmod(0o755)
 
     @contextmanager
-    def _head_context(self) -> Iterator[None]:
+    def _head_context(self, paths: List[Path]) -> Iterator[Path]:
         """
-        Runs a block of code on files from the current branch HEAD.
+        Provides an overlay of this project in which paths have their HEAD versions
+
+        The overlay is a temporary directory that links to every other file of
+        the project, so that tools run in it as they do in the project, while the
+        working tree itself is never modified.
 
+        :return: The overlay's base path (the project's own base path if it is
+                 not in a git repository)
         :raises subprocess.CalledProcessError: If git encounters an exception
         :raises NoGitHeadException: If git cannot detect a HEAD commit
         :raises UnsupportedGitStateException: If unmerged files are detected
@@ -215,54 +361,53 @@ class TargetFileManager:
         repo = bento.git.repo()
 
         if not repo:
-            yield
+            yield self._base_path
             return
 
         commit = bento.git.commit()
         if commit is None:
             raise NoGitHeadException()
 
-        else:
-            added, removed, unmerged = self._git_status()
+        unmerged = self._git_status().unmerged
+        if unmerged:
+            echo_error(
+                "Please resolve merge conflicts in these files before continuing:"
+            )
+            for f in unmerged:
+                click.secho(f, err=True)
+            raise UnsupportedGitStateException()
 
-            # Need to look for unmerged files first, otherwise staged_files_only will eat them
-            if unmerged:
-                echo_error(
-                    "Please resolve merge conflicts in these files before continuing:"
-                )
-                for f in unmerged:
-                    click.secho(f, err=True)
-                raise UnsupportedGitStateException()
-
-            with staged_files_only(PATCH_CACHE):
-                tree = cmd_output("git", "write-tree")[1].strip()
-                self._abort_if_untracked_and_removed(removed)
-                try:
-                    for a in added:
-                        (repo.working_tree_dir / Path(a)).unlink()
-                    cmd_output("git", "checkout", "HEAD", "--", ".")
-                    yield
-                finally:
-                    # git checkout will fail if the checked-out index deletes all files in the repo
-                    # In this case, we still want to continue without error.
-                    # Note that we have no good way of detecting this issue without inspecting the checkout output
-                    # message, which means we are fragile with respect to git version here.
-                    try:
-                        cmd_output("git", "checkout", tree.strip(), "--", ".")
-                    except CalledProcessError as ex:
-                        if (
-                            ex.output
-                            and len(ex.output) >= 2
-                            and "pathspec '.' did not match any file(s) known to git"
-                            in ex.output[1].strip()
-                        ):
-                            logging.warning(
-                                "Restoring git index failed due to total repository deletion; skipping checkout"
-                            )
-                        else:
-                            raise ex
-                    if removed:
-                        cmd_output("git", "rm", *removed)
+        with tempfile.TemporaryDirectory(prefix="bento-head-") as tmp:
+            head = Path(tmp).resolve()
+            with tracing.span("git.head_overlay", files=len(paths)):
+                self._link_overlay(head, paths)
+                self._write_head_versions(repo, head, paths)
+            yield head
+
+    @contextmanager
+    def head_context(self) -> Iterator[Tuple[Path, List[Path]]]:
+        """
+        Provides an overlay of this project in which staged files have their HEAD
+        versions (see _head_context)
+
+        Only staged paths that also exist in HEAD are analyzed (added, copied, or
+        renamed files have no HEAD version to compare against); if there are none,
+        no overlay is created.
+
+        :return: The overlay's base path, and the absolute paths to analyze in it
+        :raises subprocess.CalledProcessError: If git encounters an exception
+        :raises NoGitHeadException: If git cannot detect a HEAD commit
+        :raises UnsupportedGitStateException: If unmerged files are detected
+        """
+        paths = self._in_head()
+        # The head context is still entered for unmerged files, so that it can report them
+        if not paths and not self._staged_paths(diff_filter="U"):
+            yield self._base_path, []
+            return
+
+        base = self._base_path.resolve()
+        with self._head_context(paths) as head:
+            yield head, [head / p.relative_to(base) for p in paths]
 
     @contextmanager
     def run_context(self, staged: bool, run_step: RunStep) -> Iterator[List[Path]]:
@@ -272,7 +417,7 @@ class TargetFileManager:
 
         Possible contexts include:
 
-            Head Context: all files in current branch HEAD
+            Head Context: target files in current branch HEAD
             Staged Files Context: all files in current branch HEAD plus staged changes
                                   (hides all untracked files)
             Noop: all files as currently available on filesystem
@@ -281,6 +426,11 @@ class TargetFileManager:
             - not ignored based on .bentoignore rules and
             - exist in any path filters specified.
 
+        In the head context, only staged paths that also exist in HEAD are returned
+        (added, copied, or renamed files have no HEAD version to compare against),
+        as paths in an overlay of the project (see head_context); the working
+        tree is not modified.
+
         :param staged: Whether to use remove file diffs
         :param run_step: Which run step is in use (baseline if tool is determining baseline, check if tool is finding new results)
         :return: A Python with-expression
@@ -288,13 +438,18 @@ class TargetFileManager:
         :raises NoGitHeadException: If git cannot detect a HEAD commit
         :raises UnsupportedGitStateException: If unmerged files are detected
         """
+        target_paths = self._target_paths
         if staged and run_step == RunStep.BASELINE:
-            stash_context = self._head_context()
+            with self.head_context() as (_, head_paths):
+                yield head_paths
+            return
         elif staged:
-            stash_context = staged_files_only(PATCH_CACHE)
+            stash_context = tracing.traced(
+                staged_files_only(PATCH_CACHE), "git.stash", "git.unstash"
+            )
         else:
             # staged is False
             stash_context = noop_context()
 
         with stash_context:
-            yield self._target_paths
+            yield target_paths
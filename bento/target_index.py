@@ -0,0 +1,134 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import attr
+
+from bento import __version__ as BENTO_VERSION
+
+IGNORED = 0
+FILE = 1
+DIRECTORY = 2
+
+Listing = List[Tuple[str, int]]
+"""A directory's (name, kind) entries, where kind is IGNORED, FILE, or DIRECTORY"""
+
+RACY_INTERVAL_NS = 2 * 1_000_000_000
+"""
+Directories modified this recently before being scanned may change again without
+changing their modification time (which has limited granularity), so their
+listings are not reused
+"""
+
+
+def index_key(base_path: Path, patterns: Iterable[str]) -> str:
+    """
+    Identifies the ignore rules that an index's listings were computed with
+    """
+    h = hashlib.sha256(BENTO_VERSION.encode())
+    for p in [str(base_path), *sorted(patterns)]:
+        h.update(b"\0" + p.encode("utf-8", "surrogateescape"))
+    return h.hexdigest()
+
+
+@attr.s
+class TargetIndex:
+    """
+    Persists the results of walking a project's files between Bento runs
+
+    For each walked directory, the index holds the directory's modification
+    time, and its listing: every entry's name, and whether the entry is
+    ignored, or a surviving file or directory. Adding, removing, or renaming an
+    entry changes its directory's modification time, so a listing is reused
+    as long as its directory's modification time is unchanged; validating the
+    index thus takes one stat call per directory, rather than a directory scan
+    and ignore-rule match per entry.
+
+    Listings depend on the ignore rules; an index computed with different rules
+    (see index_key) is discarded.
+    """
+
+    path: Path = attr.ib(converter=Path)
+    key: str = attr.ib()
+    _dirs: Dict[str, Tuple[Optional[int], Listing]] = attr.ib(default=None, init=False)
+    _changed = attr.ib(type=bool, default=False, init=False)
+
+    def __attrs_post_init__(self) -> None:
+        self._dirs = {}
+        if not self.path.exists():
+            return
+        try:
+            with self.path.open() as stream:
+                data = json.load(stream)
+            if data.get("key") == self.key:
+                self._dirs = {
+                    d: (mtime, [(name, kind) for name, kind in listing])
+                    for d, (mtime, listing) in data["dirs"].items()
+                }
+        except (OSError, ValueError, KeyError, TypeError):
+            logging.warning(f"Ignoring invalid target index {self.path}")
+
+    def listing(self, directory: str, scan: Callable[[str], Listing]) -> Listing:
+        """
+        Returns a directory's listing, rescanning the directory only if it changed
+
+        :param directory: The directory's path
+        :param scan: Computes the directory's listing
+        :raises OSError: If the directory can not be read
+        """
+        mtime = os.stat(directory).st_mtime_ns
+        recorded = self._dirs.get(directory)
+        if recorded is not None and recorded[0] == mtime:
+            return recorded[1]
+
+        scanned_at = int(time.time() * 1e9)
+        listing = scan(directory)
+        if recorded is not None:
+            self._forget_removed(directory, recorded[1], listing)
+        # A listing of a racily modified directory is recorded without a
+        # modification time, so it is rescanned on the next run
+        self._dirs[directory] = (
+            mtime if mtime < scanned_at - RACY_INTERVAL_NS else None,
+            listing,
+        )
+        self._changed = True
+        return listing
+
+    def _forget_removed(self, directory: str, old: Listing, new: Listing) -> None:
+        """
+        Drops the listings of subdirectories that are no longer walked
+        """
+        walked = {name for name, kind in new if kind == DIRECTORY}
+        removed = [
+            os.path.join(directory, name)
+            for name, kind in old
+            if kind == DIRECTORY and name not in walked
+        ]
+        if not removed:
+            return
+        prefixes = tuple(r + os.sep for r in removed)
+        for d in list(self._dirs):
+            if d in removed or d.startswith(prefixes):
+                del self._dirs[d]
+
+    def save(self) -> None:
+        """
+        Writes the index, if any listing changed
+        """
+        if not self._changed:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first, so that concurrent Bento runs never
+            # observe a partially written index
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}")
+            with tmp_path.open("w") as stream:
+                json.dump({"key": self.key, "dirs": self._dirs}, stream)
+            os.replace(str(tmp_path), str(self.path))
+            self._changed = False
+        except OSError:
+            logging.warning(f"Could not write target index {self.path}")
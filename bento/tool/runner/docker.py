@@ -1,20 +1,55 @@
+import hashlib
+import json
 import logging
 import os
 import shutil
 import subprocess
 import tarfile
+import threading
 import uuid
 from abc import abstractmethod
-from io import BytesIO
 from pathlib import Path, PurePath
-from typing import TYPE_CHECKING, Generic, Iterable, List, Mapping
-
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    cast,
+)
+
+import bento.tracing as tracing
+from bento import __version__ as BENTO_VERSION
 from bento.error import DockerFailureException
+from bento.run_cache import RunCache
+from bento.scheduler import RunCancelled
 from bento.tool.tool import R, Tool
 from bento.util import Memo
 
 DOCKER_INSTALLED = Memo[bool](lambda: shutil.which("docker") is not None)
 
+DAEMON_KEY = "daemon"
+"""Tool configuration key that enables daemon mode"""
+
+DAEMON_COMMAND = ["tail", "-f", "/dev/null"]
+"""Keeps a daemon container running until it is stopped"""
+
+DAEMON_LABEL = "dev.bento.daemon"
+BASE_PATH_LABEL = "dev.bento.base-path"
+BASE_PATH_ID_LABEL = "dev.bento.base-path-id"
+IMAGE_ID_LABEL = "dev.bento.image-id"
+VERSION_LABEL = "dev.bento.version"
+
+MANIFEST_DIR = "docker"
+"""Cache subdirectory holding manifests of files copied into remote daemon containers"""
+
+_daemon_lock = threading.Lock()
+_upload_lock = threading.Lock()
+
 if TYPE_CHECKING:
     import docker.client
     from docker.models.containers import Container
@@ -34,23 +69,102 @@ def get_docker_client() -> "docker.client.DockerClient":
         raise DockerFailureException()
 
 
+def list_daemons(base_path: Optional[Path] = None) -> List["Container"]:
+    """
+    Returns all daemon containers, optionally only those serving a project path
+    """
+    labels = [f"{DAEMON_LABEL}=1"]
+    if base_path is not None:
+        labels.append(f"{BASE_PATH_LABEL}={base_path}")
+    return get_docker_client().containers.list(all=True, filters={"label": labels})
+
+
+def stop_daemons(base_path: Optional[Path] = None) -> int:
+    """
+    Stops and removes daemon containers, optionally only those serving a project path
+
+    :return: The number of stopped containers
+    """
+    daemons = list_daemons(base_path)
+    for container in daemons:
+        logging.info(f"Stopping daemon container {container.name}")
+        container.remove(force=True)
+    return len(daemons)
+
+
+class _ChunkWriter:
+    """
+    A write-only file object that accumulates written bytes until they are drained
+    """
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self.n_written = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self.n_written += len(data)
+        return len(data)
+
+    def drain(self) -> Iterator[bytes]:
+        chunks, self._chunks = self._chunks, []
+        return iter(chunks)
+
+
+def tar_stream(paths: Mapping[Path, str]) -> Iterator[bytes]:
+    """
+    Generates a tar archive of local ``paths``, stored at their mapped archive names
+
+    The archive is generated one member at a time, so that at most one file's
+    contents are held in memory.
+    """
+    writer = _ChunkWriter()
+    with tarfile.open(mode="w|", fileobj=cast(IO[bytes], writer)) as archive:
+        for p, loc in paths.items():
+            archive.add(str(p), arcname=loc)
+            yield from writer.drain()
+    yield from writer.drain()
+    logging.info(f"streamed {writer.n_written} bytes")
+
+
 def copy_into_container(
-    paths: Mapping[Path, str], container: "Container", destination_path: PurePath
+    paths: Mapping[Path, str],
+    container: "Container",
+    destination_path: PurePath,
+    manifest: Optional[Dict[str, str]] = None,
 ) -> None:
     """Copy local ``paths`` to ``destination_path`` within ``container``.
 
     The ``container`` is assumed to be running.
     If ``destination_path`` does not exist, it will be created.
+
+    The archive is streamed to the Docker API as it is generated.
+
+    If a ``manifest`` is passed, it should map the archive name of each file
+    previously copied into the container to the hash of its contents; only
+    files whose contents differ from the manifest are copied, and the manifest
+    is updated with the copied files.
     """
-    tar_buffer = BytesIO()
-    with tarfile.open(mode="w", fileobj=tar_buffer) as archive:
-        for p, loc in paths.items():
-            archive.add(str(p), arcname=loc)
-    tar_buffer.seek(0)
-    tar_bytes = tar_buffer.read()
+    to_copy = paths
+    if manifest is not None:
+        digests = {
+            loc: RunCache.content_hash(p) for p, loc in paths.items() if p.is_file()
+        }
+        to_copy = {
+            p: loc
+            for p, loc in paths.items()
+            if loc not in digests or manifest.get(loc) != digests[loc]
+        }
+        logging.info(
+            f"copying {len(to_copy)} of {len(paths)} paths to {container} (others unchanged)"
+        )
+        if not to_copy:
+            return
+
+    container.put_archive(str(destination_path), tar_stream(to_copy))
 
-    logging.info(f"sending {len(tar_bytes)} bytes to {container}")
-    container.put_archive(str(destination_path), tar_bytes)
+    if manifest is not None:
+        manifest.update(digests)
 
 
 class DockerTool(Generic[R], Tool[R]):
@@ -117,7 +231,52 @@ class DockerTool(Generic[R], Tool[R]):
     @property
     def local_volume_mapping(self) -> Mapping[str, Mapping[str, str]]:
         """The volumes to bind when Docker is running locally"""
-        return {str(self.base_path): {"bind": self.remote_code_path, "mode": "ro"}}
+        volumes = {str(self.base_path): {"bind": self.remote_code_path, "mode": "ro"}}
+        linked = self.context.linked_path
+        if linked is not None:
+            # Bind the project at its own path, so that the overlay's links resolve
+            volumes[str(linked)] = {"bind": str(linked), "mode": "ro"}
+        return volumes
+
+    @property
+    def daemon_image(self) -> Optional[str]:
+        """
+        Returns the name of the docker image used in daemon mode, or None if this
+        tool does not support daemon mode
+
+        This image must be able to run DAEMON_COMMAND.
+        """
+        return self.docker_image
+
+    @property
+    def daemon_entrypoint(self) -> Optional[List[str]]:
+        """
+        Returns the command that runs this tool in the daemon image
+
+        Defaults to the daemon image's entrypoint.
+        """
+        return None
+
+    @property
+    def use_daemon(self) -> bool:
+        """
+        Returns whether this tool runs in a persistent daemon container
+
+        Daemon mode is enabled by the tool's "daemon" option. With a local Docker
+        daemon, the project is mounted into the container; with a remote Docker
+        daemon, changed files are copied into the container before each run.
+        """
+        return (
+            bool(self.config.get(DAEMON_KEY, False)) and self.daemon_image is not None
+        )
+
+    def tool_version(self) -> str:
+        return self.docker_image
+
+    @classmethod
+    def can_shard(cls) -> bool:
+        # Each tool runs in a single, uniquely named container
+        return False
 
     def is_allowed_returncode(self, returncode: int) -> bool:
         """Returns true iff the Docker container's return code indicates no error"""
@@ -130,17 +289,35 @@ class DockerTool(Generic[R], Tool[R]):
     def _prepull_image(self) -> None:
         """
         Pulls the docker image from Docker hub
+
+        Pulled images are recorded in the install manifest, so that later runs
+        need not list local images; images removed since are pulled again when
+        their container is created.
         """
+        images = {self.docker_image}
+        if self.use_daemon and self.daemon_image:
+            images.add(self.daemon_image)
+
+        manifest = self.context.install_manifest
+        docker_host = os.environ.get("DOCKER_HOST", "")
+        key = ",".join([docker_host, *sorted(images)])
+        if manifest.is_current(self.tool_id(), key, []):
+            return
+
         client = get_docker_client()
+        tags = {t for i in client.images.list() for t in i.tags}
+        for image in images - tags:
+            client.images.pull(image)
+            logging.info(f"Pre-pulled {self.tool_id()} image {image}")
 
-        if not any(i for i in client.images.list() if self.docker_image in i.tags):
-            client.images.pull(self.docker_image)
-            logging.info(f"Pre-pulled {self.tool_id()} image")
+        image_ids = {image: client.images.get(image).id for image in images}
+        manifest.record(self.tool_id(), key, [], image_ids)
 
     def _create_container(self, targets: Iterable[str]) -> "Container":
         """
         Creates and returns the Docker container
         """
+        import docker.errors  # import inside def for performance
 
         client = get_docker_client()
 
@@ -156,6 +333,12 @@ class DockerTool(Generic[R], Tool[R]):
 
         logging.info(f"starting new {self.tool_id()} container")
 
+        try:
+            client.images.get(self.docker_image)
+        except docker.errors.ImageNotFound:
+            # The image was removed since it was recorded as pulled
+            client.images.pull(self.docker_image)
+
         container: "Container" = client.containers.create(
             self.docker_image,
             command=full_command,
@@ -169,6 +352,137 @@ class DockerTool(Generic[R], Tool[R]):
 
         return container
 
+    def _remove_container(self, container: "Container") -> None:
+        """
+        Stops and removes the Docker container, if it still exists
+        """
+        import docker.errors  # import inside def for performance
+
+        try:
+            container.remove(force=True)
+        except docker.errors.APIError as e:
+            logging.debug(f"{self.tool_id()}: Could not remove {container!r}: {e}")
+
+    def _daemon_labels(self, image_id: str) -> Dict[str, str]:
+        """
+        Returns labels that identify an up-to-date daemon container for this tool
+
+        A daemon container whose labels differ (for example, because the image was
+        updated, or the project directory was replaced) is stale.
+        """
+        stat = self.base_path.stat()
+        return {
+            DAEMON_LABEL: "1",
+            BASE_PATH_LABEL: str(self.base_path),
+            BASE_PATH_ID_LABEL: f"{stat.st_dev}:{stat.st_ino}",
+            IMAGE_ID_LABEL: image_id,
+            VERSION_LABEL: BENTO_VERSION,
+        }
+
+    def _daemon_container(self) -> "Container":
+        """
+        Returns a running daemon container for this tool's image, starting one if necessary
+
+        Stale daemon containers are replaced.
+        """
+        import docker.errors  # import inside def for performance
+
+        assert self.daemon_image is not None
+
+        with _daemon_lock:
+            client = get_docker_client()
+            try:
+                image = client.images.get(self.daemon_image)
+            except docker.errors.ImageNotFound:
+                image = client.images.pull(self.daemon_image)
+            labels = self._daemon_labels(image.id)
+            digest = hashlib.blake2b(
+                f"{self.daemon_image}:{self.base_path}".encode(), digest_size=6
+            ).hexdigest()
+            name = f"bento-warm-{digest}"
+
+            try:
+                existing = client.containers.get(name)
+                if existing.status == "running" and all(
+                    existing.labels.get(k) == v for k, v in labels.items()
+                ):
+                    return existing
+                logging.info(f"{self.tool_id()}: Replacing stale daemon container")
+                existing.remove(force=True)
+            except docker.errors.NotFound:
+                pass
+
+            logging.info(f"{self.tool_id()}: Starting daemon container {name}")
+            container = client.containers.create(
+                self.daemon_image,
+                entrypoint=DAEMON_COMMAND,
+                name=name,
+                labels=labels,
+                volumes={} if self.use_remote_docker else self.local_volume_mapping,
+                detach=True,
+                working_dir=self.remote_code_path,
+            )
+            container.start()
+            return container
+
+    def _upload_to_daemon(
+        self, container: "Container", expanded: Mapping[Path, str]
+    ) -> None:
+        """
+        Copies files that changed since they were last copied into a remote daemon container
+
+        Copied files are tracked in a per-container manifest of content hashes.
+        """
+        manifest_path = (
+            self.context.cache.cache_dir / MANIFEST_DIR / f"{container.id}.json"
+        )
+        with _upload_lock:
+            manifest: Dict[str, str] = {}
+            if manifest_path.exists():
+                try:
+                    with manifest_path.open() as stream:
+                        manifest = json.load(stream)
+                except ValueError:
+                    logging.warning(f"Ignoring invalid manifest {manifest_path}")
+
+            destination = PurePath(self.remote_code_path)
+            copy_into_container(expanded, container, destination, manifest)
+            copy_into_container(
+                self.additional_file_targets, container, destination, manifest
+            )
+
+            manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            with manifest_path.open("w") as stream:
+                json.dump(manifest, stream)
+
+    def _exec_in_daemon(
+        self, expanded: Mapping[Path, str]
+    ) -> subprocess.CompletedProcess:
+        """
+        Runs the Docker command inside this tool's daemon container
+        """
+        container = self._daemon_container()
+        if self.use_remote_docker:
+            self._upload_to_daemon(container, expanded)
+        targets = expanded.values()
+        # The daemon container overrides the image's entrypoint, so it is run explicitly
+        entrypoint = (
+            self.daemon_entrypoint
+            or container.image.attrs["Config"].get("Entrypoint")
+            or []
+        )
+        command = list(entrypoint) + self.assemble_full_command(targets)
+        logging.debug(f"{self.tool_id()}: Executing in {container.name}: {command}")
+        with self.context.scheduler.slot(self.tool_id()), tracing.span(
+            "tool.subprocess", tool=self.tool_id()
+        ):
+            return self.context.scheduler.run(
+                ["docker", "exec", "-w", self.remote_code_path, container.id, *command],
+                encoding="utf-8",
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+
     def _setup_remote_docker(
         self, container: "Container", expanded: Mapping[Path, str]
     ) -> None:
@@ -187,18 +501,30 @@ class DockerTool(Generic[R], Tool[R]):
         is_remote = self.use_remote_docker
         expanded = {t: str(t.relative_to(self.base_path)) for t in targets}
 
-        container = self._create_container(expanded.values())
-
-        if is_remote:
-            self._setup_remote_docker(container, expanded)
-
-        # Python docker does not allow -a, so use subprocess.run
-        result = subprocess.run(
-            ["docker", "start", "-a", str(container.id)],
-            encoding="utf-8",
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
+        if self.use_daemon:
+            result = self._exec_in_daemon(expanded)
+        else:
+            container = self._create_container(expanded.values())
+
+            if is_remote:
+                self._setup_remote_docker(container, expanded)
+
+            # Python docker does not allow -a, so use subprocess.run
+            try:
+                with self.context.scheduler.slot(self.tool_id()), tracing.span(
+                    "tool.subprocess", tool=self.tool_id()
+                ):
+                    result = self.context.scheduler.run(
+                        ["docker", "start", "-a", str(container.id)],
+                        encoding="utf-8",
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                    )
+            except RunCancelled:
+                # Killing the client neither stops the container, nor removes it
+                # if it never started
+                self._remove_container(container)
+                raise
 
         logging.info(
             f"{self.tool_id()}: Returned code {result.returncode} with stdout[:4000]:\n"
@@ -1,9 +1,10 @@
 import json
 import logging
+import shutil
 import subprocess
 from abc import abstractmethod
 from pathlib import Path
-from typing import Dict, Optional, Set
+from typing import Dict, List, Optional, Set
 
 import attr
 from semantic_version import NpmSpec, Version
@@ -99,10 +100,12 @@ class JsTool(Tool):
         self._npm_install(to_install)
         return set(to_install)
 
-    def _ensure_node_version(self) -> None:
+    def _ensure_node_version(self) -> str:
         """Ensures that Node.js version installed on the system is compatible with ESLint v6
         per https://github.com/eslint/eslint/blob/master/docs/user-guide/migrating-to-6.0.0.md#-nodejs-6-is-no-longer-supported
         Suppored Node.js version  ^8.10.0 || ^10.13.0 || >=11.10.1
+
+        Returns the installed version.
         """
         version = self.execute(
             ["node", "--version"],
@@ -117,3 +120,40 @@ class JsTool(Tool):
             raise NodeError(
                 f"Node.js is not installed, or its version is not >8.10.0, >10.13.0, or >=11.10.1 (found {node_version})."
             )
+        return node_version
+
+    def _install_stamp_paths(self) -> List[Path]:
+        """
+        Returns the paths whose modification times change when packages, or Node.js, are installed
+        """
+        paths = [
+            self.install_location / "package.json",
+            self.install_location / "node_modules",
+        ]
+        node_path = shutil.which("node")
+        if node_path:
+            paths.append(Path(node_path).resolve())
+        return paths
+
+    def _ensure_installed(self, packages: VersionDict) -> None:
+        """Ensures that the given packages, and a compatible Node.js version, are installed.
+
+        If nothing changed since these were last ensured, only checks the
+        modification times of the installation.
+        """
+        manifest = self.context.install_manifest
+        # Packages are installed separately for each project
+        name = f"{self.tool_id()}:{self.install_location}"
+        key = ",".join(f"{p}@{v}" for p, v in sorted(packages.items()))
+        if manifest.is_current(name, key, self._install_stamp_paths()):
+            return
+
+        self._ensure_packages(packages)
+        node_version = self._ensure_node_version()
+
+        installed = {"node": node_version}
+        for package in packages:
+            version = self._installed_version(package, location=self.install_location)
+            if version:
+                installed[package] = str(version)
+        manifest.record(name, key, self._install_stamp_paths(), installed)
@@ -0,0 +1,32 @@
+"""
+Runs a console script with arguments read from stdin
+
+Arguments are read as a JSON list, so that a script can run on more files than
+fit on a command line.
+
+This module is run as a script by the tool's virtual environment's Python, so
+must only import the standard library.
+"""
+import json
+import os
+import runpy
+import sys
+
+
+def main() -> None:
+    # Don't shadow the tool's imports with this script's directory
+    if sys.path and os.path.abspath(sys.path[0]) == os.path.dirname(
+        os.path.abspath(__file__)
+    ):
+        sys.path.pop(0)
+
+    script = sys.argv[1]
+    args = json.load(sys.stdin)
+    sys.stdin.close()
+    sys.stdin = open(os.devnull)
+    sys.argv = [script, *args]
+    runpy.run_path(script, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
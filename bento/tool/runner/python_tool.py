@@ -1,19 +1,63 @@
+import hashlib
+import io
 import json
 import logging
 import os
 import re
 import subprocess
 import sys
+import threading
 import venv
 from abc import abstractmethod
 from pathlib import Path
 from time import time
-from typing import Dict, Generic, Iterable, List, Optional, Pattern
+from typing import (
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    TextIO,
+    Tuple,
+)
 
 from semantic_version import SimpleSpec, Version
 
 import bento.constants as constants
-from bento.tool.tool import R, Tool
+import bento.tool.runner.python_launcher as python_launcher
+import bento.tool.runner.python_worker as python_worker
+import bento.tracing as tracing
+from bento import __version__ as BENTO_VERSION
+from bento.install_manifest import stamp
+from bento.tool.runner.docker import DAEMON_KEY
+from bento.tool.tool import P, R, Tool
+
+WORKER_IDLE_TIMEOUT = 15 * 60
+"""Seconds after which an unused worker process exits"""
+
+MAX_SOCKET_PATH = 100
+"""Longest worker socket path supported on all platforms, in bytes"""
+
+_worker_lock = threading.Lock()
+
+
+def stop_workers() -> int:
+    """
+    Stops all worker processes, by removing their sockets
+
+    :return: The number of stopped workers
+    """
+    sockets = list(constants.WORKER_PATH.glob("*.sock"))
+    for socket_path in sockets:
+        logging.info(f"Stopping worker at {socket_path}")
+        try:
+            socket_path.unlink()
+        except FileNotFoundError:
+            pass
+    return len(sockets)
 
 
 class PythonTool(Generic[R], Tool[R]):
@@ -24,6 +68,8 @@ class PythonTool(Generic[R], Tool[R]):
     PACKAGES: Dict[str, SimpleSpec] = {}
     PYTHON_FILE_PATTERN = re.compile(r".*\.py$")
     SHEBANG_PATTERN = re.compile(r"^#!.*python")
+    # Entry point groups (e.g. plugins) imported by worker processes on startup
+    WORKER_PRELOAD_GROUPS: List[str] = []
 
     @property
     def shebang_pattern(self) -> Optional[Pattern]:
@@ -45,6 +91,11 @@ class PythonTool(Generic[R], Tool[R]):
     def required_packages(cls) -> Dict[str, SimpleSpec]:
         return cls.PACKAGES
 
+    def tool_version(self) -> str:
+        return ",".join(
+            f"{p}{s.expression}" for p, s in sorted(self.required_packages().items())
+        )
+
     @classmethod
     def venv_dir(cls) -> Path:
         return constants.VENV_PATH / cls.venv_subdir_name()
@@ -68,26 +119,38 @@ class PythonTool(Generic[R], Tool[R]):
             except Exception:
                 venv.create(str(self.venv_dir()), with_pip=True)
 
-    def venv_exec(self, cmd: List[str], check_output: bool = True) -> str:
-        """
-        Executes tool set-up or check within its virtual environment
-        """
-        logging.debug(f"{self.tool_id()}: Running '{cmd}'")
-        before = time()
+    def _venv_env(self) -> Dict[str, str]:
         env = dict(os.environ)
         env["VIRTUAL_ENV"] = str(self.venv_dir())
         env["PATH"] = f"{self.venv_dir()}:{self.venv_dir()}/bin:" + env["PATH"]
         if "PYTHONHOME" in env:
             del env["PYTHONHOME"]
-        v = subprocess.Popen(
-            cmd,
-            cwd=str(self.base_path),
-            encoding="utf8",
-            env=env,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        stdout, stderr = v.communicate()
+        return env
+
+    def venv_exec(
+        self, cmd: List[str], check_output: bool = True, input: Optional[str] = None
+    ) -> str:
+        """
+        Executes tool set-up or check within its virtual environment
+
+        :param input: If not None, written to the command's stdin
+        """
+        logging.debug(f"{self.tool_id()}: Running '{cmd}'")
+        before = time()
+        with self.context.scheduler.slot(self.tool_id()), tracing.span(
+            "tool.subprocess", tool=self.tool_id()
+        ):
+            v = subprocess.Popen(
+                cmd,
+                cwd=str(self.base_path),
+                encoding="utf8",
+                env=self._venv_env(),
+                stdin=None if input is None else subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+            with v, self.context.scheduler.cancellable(v.kill):
+                stdout, stderr = v.communicate(input)
         after = time()
         logging.debug(f"{self.tool_id()}: Command completed in {after - before:2f} s")
         logging.debug(f"{self.tool_id()}: stderr[:4000]:\n" + stderr[0:4000])
@@ -98,11 +161,181 @@ class PythonTool(Generic[R], Tool[R]):
             )
         return stdout
 
-    def _packages_installed(self) -> Dict[str, SimpleSpec]:
+    @property
+    def use_worker(self) -> bool:
         """
-        Checks whether the given packages are installed.
+        Returns whether this tool's scripts run in a long-lived worker process
 
-        The value for each package is the version specification.
+        Worker mode is enabled by the tool's "daemon" option, and is only
+        supported on platforms with Unix sockets and fork().
+        """
+        return bool(self.config.get(DAEMON_KEY, False)) and python_worker.SUPPORTED
+
+    def worker_key(self) -> str:
+        """
+        Returns the key of an up-to-date worker process for this tool
+
+        The key changes when Bento is upgraded, or when packages are installed
+        into the tool's virtual environment; workers with a different key are
+        replaced.
+        """
+        state = [BENTO_VERSION, self.tool_version(), stamp(self._install_stamp_paths())]
+        return hashlib.blake2b(json.dumps(state).encode(), digest_size=16).hexdigest()
+
+    def _worker_socket(self, script: str) -> Path:
+        name = hashlib.blake2b(
+            f"{self.venv_dir()}:{script}".encode(), digest_size=8
+        ).hexdigest()
+        return constants.WORKER_PATH / f"{name}.sock"
+
+    def _start_worker(self, script: str, socket_path: Path, key: str) -> None:
+        """
+        Starts a worker process, returning once it accepts requests
+        """
+        logging.info(f"{self.tool_id()}: Starting worker for {script}")
+        socket_path.parent.mkdir(parents=True, exist_ok=True)
+        cmd = [
+            "python",
+            python_worker.__file__,
+            f"--socket={socket_path}",
+            f"--key={key}",
+            f"--idle-timeout={WORKER_IDLE_TIMEOUT}",
+            *(f"--preload-group={g}" for g in self.WORKER_PRELOAD_GROUPS),
+            str(self.venv_dir() / "bin" / script),
+        ]
+        worker = subprocess.Popen(
+            cmd,
+            cwd=str(self.base_path),
+            env=self._venv_env(),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        assert worker.stdout is not None
+        with worker.stdout:
+            if worker.stdout.readline() != python_worker.READY:
+                raise OSError(f"Worker for {script} failed to start")
+
+    def _worker_request(
+        self, socket_path: Path, key: str, cwd: str, args: List[str]
+    ) -> Tuple[int, str, str]:
+        """
+        Sends a request to this tool's worker, interrupting it if the run is cancelled
+        """
+        conn = python_worker.connection()
+        with self.context.scheduler.cancellable(lambda: python_worker.interrupt(conn)):
+            return python_worker.request(str(socket_path), key, cwd, args, conn)
+
+    def _worker_exec(self, script: str, args: List[str]) -> str:
+        """
+        Runs a script in this tool's worker, starting the worker if necessary
+
+        Raises OSError if the worker can not be started.
+        """
+        socket_path = self._worker_socket(script)
+        if len(bytes(socket_path)) > MAX_SOCKET_PATH:
+            raise OSError(f"Worker socket path {socket_path} is too long")
+        key = self.worker_key()
+        cwd = str(self.base_path)
+
+        with self.context.scheduler.slot(self.tool_id()), tracing.span(
+            "tool.worker", tool=self.tool_id()
+        ):
+            try:
+                returncode, stdout, stderr = self._worker_request(
+                    socket_path, key, cwd, args
+                )
+            except (OSError, python_worker.StaleWorker) as e:
+                logging.debug(f"{self.tool_id()}: {e}")
+                with _worker_lock:
+                    self._start_worker(script, socket_path, key)
+                returncode, stdout, stderr = self._worker_request(
+                    socket_path, key, cwd, args
+                )
+
+        logging.debug(f"{self.tool_id()}: Worker exited with code {returncode}")
+        logging.debug(f"{self.tool_id()}: stderr[:4000]:\n" + stderr[0:4000])
+        logging.debug(f"{self.tool_id()}: stdout[:4000]:\n" + stdout[0:4000])
+        return stdout
+
+    def _worker_run_script(self, script: str, args: List[str]) -> Optional[str]:
+        """
+        Runs a script in this tool's worker, if enabled
+
+        :return: The script's output, or None if the script could not run in a worker
+        """
+        if not self.use_worker:
+            return None
+        before = time()
+        try:
+            stdout = self._worker_exec(script, args)
+        except (OSError, python_worker.StaleWorker) as e:
+            logging.warning(
+                f"{self.tool_id()}: Could not run in worker process, falling back to a new process: {e}"
+            )
+            return None
+        logging.debug(
+            f"{self.tool_id()}: Worker run completed in {time() - before:2f} s"
+        )
+        return stdout
+
+    def _launcher_command(self, script: str) -> List[str]:
+        return [
+            "python",
+            python_launcher.__file__,
+            str(self.venv_dir() / "bin" / script),
+        ]
+
+    def venv_run_script(self, script: str, args: List[str]) -> str:
+        """
+        Runs one of the console scripts installed in this tool's virtual environment
+
+        Exit codes are ignored; returns the script's output. Arguments are not
+        passed on a command line (but via a worker's socket, or the launched
+        script's stdin), so are not limited by the system's argument space.
+
+        :param script: The script's name (e.g. "flake8")
+        """
+        stdout = self._worker_run_script(script, args)
+        if stdout is not None:
+            return stdout
+        return self.venv_exec(
+            self._launcher_command(script), check_output=False, input=json.dumps(args)
+        )
+
+    def venv_stream_script(
+        self, script: str, args: List[str], parse: Callable[[TextIO], Iterator[P]]
+    ) -> Iterator[P]:
+        """
+        Runs one of the console scripts installed in this tool's virtual environment,
+        parsing its output as the script produces it
+
+        Exit codes are ignored. Output from a worker is parsed once the script
+        completes.
+
+        :param script: The script's name (e.g. "bandit")
+        :param parse: Incrementally parses the script's output (see Tool.execute_streaming)
+        """
+        stdout = self._worker_run_script(script, args)
+        if stdout is not None:
+            yield from parse(io.StringIO(stdout))
+            return
+        yield from self.execute_streaming(
+            self._launcher_command(script),
+            parse,
+            input=json.dumps(args),
+            env=self._venv_env(),
+        )
+
+    @classmethod
+    def max_batch_bytes(cls) -> int:
+        # Scripts receive files via venv_run_script, which does not use the command line
+        return sys.maxsize
+
+    def _installed_versions(self) -> Dict[str, Version]:
+        """
+        Returns the version of each package installed in this tool's virtual environment
         """
         installed: Dict[str, Version] = {}
         for package in json.loads(
@@ -113,21 +346,54 @@ class PythonTool(Generic[R], Tool[R]):
             except ValueError:
                 # skip it
                 pass
+        return installed
+
+    def _packages_installed(
+        self, installed: Dict[str, Version]
+    ) -> Dict[str, SimpleSpec]:
+        """
+        Checks whether the given packages are installed.
 
+        The value for each package is the version specification.
+        """
         to_install: Dict[str, SimpleSpec] = {}
         for name, spec in self.required_packages().items():
             if name not in installed or not spec.match(installed[name]):
                 to_install[name] = spec
         return to_install
 
+    def _install_stamp_paths(self) -> List[Path]:
+        """
+        Returns the paths whose modification times change when packages are installed
+        """
+        venv_dir = self.venv_dir()
+        site_packages = [
+            *venv_dir.glob("lib/python*/site-packages"),
+            *venv_dir.glob("Lib/site-packages"),
+        ]
+        return [venv_dir, *sorted(site_packages)]
+
     def setup(self) -> None:
-        self.venv_create()
-        to_install = self._packages_installed()
-        if not to_install:
+        manifest = self.context.install_manifest
+        if manifest.is_current(
+            self.tool_id(), self.tool_version(), self._install_stamp_paths()
+        ):
             return
 
-        install_list = [f"{p}{s.expression}" for p, s in to_install.items()]
-        logging.info(f"Installing Python packages: {', '.join(install_list)}")
-        self.venv_exec(
-            [*PythonTool.PIP_CMD, "install", "-q", *install_list], check_output=True
+        self.venv_create()
+        installed = self._installed_versions()
+        to_install = self._packages_installed(installed)
+        if to_install:
+            install_list = [f"{p}{s.expression}" for p, s in to_install.items()]
+            logging.info(f"Installing Python packages: {', '.join(install_list)}")
+            self.venv_exec(
+                [*PythonTool.PIP_CMD, "install", "-q", *install_list], check_output=True
+            )
+            installed = self._installed_versions()
+
+        manifest.record(
+            self.tool_id(),
+            self.tool_version(),
+            self._install_stamp_paths(),
+            {p: str(v) for p, v in installed.items() if p in self.required_packages()},
         )
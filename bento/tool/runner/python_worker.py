@@ -0,0 +1,293 @@
+"""
+Long-lived worker processes for Python tools
+
+A worker runs inside a tool's virtual environment, where it imports the tool's
+console script and plugins once. It then serves requests to run the console
+script over a Unix socket: for each request, the worker forks, and the child
+runs the script in the requested working directory, with the requested
+arguments. Each run thus starts from the same pre-imported state, without
+paying for interpreter startup or plugin imports, and concurrent requests run
+concurrently.
+
+Workers are identified by a key (see PythonTool.worker_key); a worker receiving
+a request with a different key is stale, and exits. Workers also exit after an
+idle timeout, or once their socket is removed or replaced.
+
+This module is run as a script by the tool's virtual environment's Python, so
+must only import the standard library.
+"""
+import argparse
+import json
+import os
+import runpy
+import signal
+import socket
+import sys
+import tempfile
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+SUPPORTED = hasattr(os, "fork") and hasattr(socket, "AF_UNIX")
+"""Whether workers can run on this platform"""
+
+READY = b"ready\n"
+"""Written to the worker's stdout once it accepts requests"""
+
+POLL_INTERVAL = 1.0
+"""Seconds between worker checks for idleness and socket removal"""
+
+
+class StaleWorker(Exception):
+    """
+    Raised when a worker's key does not match the request's key
+    """
+
+
+def _read_message(conn: socket.socket) -> Dict[str, Any]:
+    data = bytearray()
+    while not data.endswith(b"\n"):
+        chunk = conn.recv(65536)
+        if not chunk:
+            raise EOFError("Connection closed before a complete message was received")
+        data += chunk
+    return json.loads(data.decode("utf-8", "surrogateescape"))
+
+
+def _write_message(conn: socket.socket, message: Dict[str, Any]) -> None:
+    conn.sendall(json.dumps(message).encode("utf-8", "surrogateescape") + b"\n")
+
+
+def connection() -> socket.socket:
+    """
+    Returns a new, unconnected socket for an exchange with a worker
+    """
+    return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+
+def interrupt(conn: socket.socket) -> None:
+    """
+    Interrupts an exchange over conn from another thread
+
+    The exchange then raises OSError.
+    """
+    try:
+        conn.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        # Not connected yet, or already closed
+        pass
+
+
+def exchange(
+    socket_path: str, message: Dict[str, Any], conn: Optional[socket.socket] = None
+) -> Dict[str, Any]:
+    """
+    Sends a message to the worker at socket_path, returning its response
+
+    Messages are JSON objects, each on a single line. This protocol is shared
+    with other tools' workers (see bento/extra/eslint/daemon.js).
+
+    Raises StaleWorker if the worker's key does not match the message's key, or
+    OSError if no worker can be reached.
+
+    :param conn: The socket to exchange over (see connection), so that callers
+                 can interrupt the exchange; closed once the exchange completes
+    """
+    with conn or connection() as conn:
+        conn.connect(socket_path)
+        _write_message(conn, message)
+        try:
+            response = _read_message(conn)
+        except EOFError as e:
+            raise OSError(f"Worker at {socket_path} did not respond") from e
+    if response.get("stale"):
+        raise StaleWorker(f"Worker at {socket_path} is stale")
+    return response
+
+
+def request(
+    socket_path: str,
+    key: str,
+    cwd: str,
+    args: List[str],
+    conn: Optional[socket.socket] = None,
+) -> Tuple[int, str, str]:
+    """
+    Runs a worker's console script
+
+    Raises StaleWorker if the worker at socket_path has a different key, or
+    OSError if no worker can be reached.
+
+    :param conn: As for exchange
+    :return: The script's exit code, stdout, and stderr
+    """
+    response = exchange(socket_path, {"key": key, "cwd": cwd, "args": args}, conn)
+    return response["returncode"], response["stdout"], response["stderr"]
+
+
+def _preload(groups: Iterable[str]) -> None:
+    """
+    Imports the modules of every entry point in groups (e.g. a tool's plugins)
+    """
+    modules: Set[str] = set()
+    try:
+        from importlib.metadata import entry_points  # type: ignore
+
+        eps = entry_points()
+        for group in groups:
+            selected = (
+                eps.select(group=group)
+                if hasattr(eps, "select")
+                else eps.get(group, [])
+            )
+            modules.update(ep.value.split(":")[0].strip() for ep in selected)
+    except ImportError:
+        import pkg_resources
+
+        for group in groups:
+            modules.update(
+                ep.module_name for ep in pkg_resources.iter_entry_points(group)
+            )
+    for module in sorted(modules):
+        try:
+            __import__(module)
+        except Exception:
+            # Plugins that fail to import will report their errors when the tool runs
+            pass
+
+
+def _run_script(script: str, cwd: str, args: List[str]) -> Dict[str, Any]:
+    """
+    Runs a console script, capturing its output; only called in forked children
+    """
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        with open(os.devnull, "rb") as devnull:
+            os.dup2(devnull.fileno(), 0)
+        os.dup2(out.fileno(), 1)
+        os.dup2(err.fileno(), 2)
+        returncode = 0
+        try:
+            os.chdir(cwd)
+            sys.argv = [script, *args]
+            runpy.run_path(script, run_name="__main__")
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                returncode = int(e.code)
+            elif e.code is not None:
+                print(e.code, file=sys.stderr)
+                returncode = 1
+        except BaseException:
+            import traceback
+
+            traceback.print_exc()
+            returncode = 1
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        outputs = []
+        for stream in (out, err):
+            stream.seek(0)
+            outputs.append(stream.read().decode("utf-8", "surrogateescape"))
+    return {"returncode": returncode, "stdout": outputs[0], "stderr": outputs[1]}
+
+
+def _handle(
+    conn: socket.socket, listener: socket.socket, script: str, message: Dict[str, Any]
+) -> None:
+    """
+    Serves a request in a forked child, then exits
+    """
+    status = 0
+    try:
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        listener.close()
+        _write_message(conn, _run_script(script, message["cwd"], message["args"]))
+    except BaseException:
+        status = 1
+    finally:
+        os._exit(status)
+
+
+def _socket_id(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_dev, stat.st_ino)
+
+
+def serve(socket_path: str, key: str, script: str, idle_timeout: float) -> None:
+    """
+    Serves requests to run script until the worker is idle, stale, or replaced
+    """
+    # Children are not waited on
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    # Bind to a temporary path and move it into place, so that concurrently
+    # started workers do not fail; the last one started serves requests, and the
+    # others exit once they notice that their socket was replaced
+    bind_path = f"{socket_path}.{os.getpid()}"
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(bind_path)
+    listener.listen(16)
+    listener.settimeout(POLL_INTERVAL)
+    os.replace(bind_path, socket_path)
+    own_id = _socket_id(socket_path)
+
+    sys.stdout.buffer.write(READY)
+    sys.stdout.flush()
+    with open(os.devnull, "wb") as devnull:
+        os.dup2(devnull.fileno(), 1)
+
+    idle = 0.0
+    while idle < idle_timeout and _socket_id(socket_path) == own_id:
+        try:
+            conn, _ = listener.accept()
+        except socket.timeout:
+            idle += POLL_INTERVAL
+            continue
+        idle = 0.0
+        with conn:
+            conn.settimeout(POLL_INTERVAL)
+            try:
+                message = _read_message(conn)
+            except (OSError, EOFError, ValueError):
+                continue
+            if message.get("key") != key:
+                _write_message(conn, {"stale": True})
+                break
+            conn.settimeout(None)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            if os.fork() == 0:
+                _handle(conn, listener, script, message)
+
+    listener.close()
+    if _socket_id(socket_path) == own_id:
+        os.unlink(socket_path)
+
+
+def main() -> None:
+    # Don't shadow the tool's imports with this script's directory
+    if sys.path and os.path.abspath(sys.path[0]) == os.path.dirname(
+        os.path.abspath(__file__)
+    ):
+        sys.path.pop(0)
+
+    parser = argparse.ArgumentParser(description="Serves runs of a console script")
+    parser.add_argument("--socket", required=True)
+    parser.add_argument("--key", required=True)
+    parser.add_argument("--idle-timeout", type=float, required=True)
+    parser.add_argument("--preload-group", action="append", default=[])
+    parser.add_argument("script")
+    args = parser.parse_args()
+
+    _preload(args.preload_group)
+    try:
+        # Runs the script's imports, but not its main block
+        runpy.run_path(args.script, run_name="__bento_preload__")
+    except Exception:
+        pass
+    serve(args.socket, args.key, args.script, args.idle_timeout)
+
+
+if __name__ == "__main__":
+    main()
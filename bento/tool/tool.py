@@ -1,39 +1,92 @@
+import hashlib
+import json
 import logging
-import resource
+import os
 import subprocess
+import sys
+import tempfile
+import threading
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from time import time
 from typing import (
     Any,
+    Callable,
     Dict,
     Generic,
     Iterable,
+    Iterator,
     List,
+    Mapping,
     Optional,
     Pattern,
+    Sequence,
     Set,
+    TextIO,
     Type,
     TypeVar,
+    Union,
+    cast,
 )
 
 import attr
 
+import bento.tracing as tracing
+from bento import __version__ as BENTO_VERSION
 from bento.base_context import BaseContext
+from bento.json_reader import CHUNK_SIZE
 from bento.parser import Parser
-from bento.result import from_cache_repr, to_cache_repr
-from bento.util import batched
+from bento.util import (
+    arg_max,
+    arg_size,
+    batched_by_size,
+    environment_size,
+    shard_by_size,
+)
 from bento.violation import Violation
 
 R = TypeVar("R")
 """Generic return type"""
 
+P = TypeVar("P")
+"""Generic parsed output type"""
+
 JsonR = List[Dict[str, Any]]
 """Return type for tools with a JSON representation"""
 
 
-MIN_RESERVED_ARGS = 128
-"""Number of argument positions reserved for non-file command arguments (e.g. rule ignores)"""
+RESERVED_ARG_BYTES = 32 * 1024
+"""
+Bytes of argument space reserved for non-file command arguments (e.g. rule
+ignores), and for tool-specific environment variables
+"""
+
+PARALLELISM_KEY = "parallelism"
+"""Tool configuration key for the number of concurrent runs of the tool"""
+
+AUTO_PARALLELISM = "auto"
+"""Parallelism value that runs one shard per available CPU"""
+
+_shard_executor: Optional[ThreadPoolExecutor] = None
+_shard_executor_lock = threading.Lock()
+
+
+def shard_executor() -> ThreadPoolExecutor:
+    """
+    Returns the executor on which tool shards run
+
+    This executor is shared by all tools, so that the total number of concurrent
+    shards is bounded by the number of available CPUs. Shard subprocesses
+    additionally wait for a slot on the context's scheduler.
+    """
+    global _shard_executor
+    with _shard_executor_lock:
+        if _shard_executor is None:
+            _shard_executor = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1, thread_name_prefix="bento-shard"
+            )
+        return _shard_executor
 
 
 # Note: for now, every tool *HAS* to directly inherit from this, even if it
@@ -44,6 +97,7 @@ class Tool(ABC, Generic[R]):
     """The base class for all tool plugins"""
 
     context = attr.ib(type=BaseContext)
+    _on_found: Optional[Callable[[List[Violation]], None]] = None
 
     @property
     def base_path(self) -> Path:
@@ -123,6 +177,55 @@ class Tool(ABC, Generic[R]):
         """
         pass
 
+    def stream(self, files: Iterable[str]) -> Iterator[R]:
+        """
+        Runs this tool, yielding its results in parts, as the tool produces them
+
+        Each part is parsed on its own, so that findings are produced while the
+        tool still runs, and so that memory use is bounded by the largest part,
+        rather than by the tool's whole output. By default, the results of run
+        are a single part.
+
+        Raises:
+            CalledProcessError: If execution fails
+        """
+        yield self.run(files)
+
+    def begin_run(self, tools: Sequence["Tool"]) -> None:
+        """
+        Prepares this tool to run alongside other tools
+
+        Called by the Runner before any tool runs, with every tool scheduled in the
+        run (including this one), so that tools can arrange to share work with each
+        other. Once this tool completes, or fails, end_run is called.
+        """
+        pass
+
+    def end_run(self) -> None:
+        """
+        Called by the Runner once this tool completes, or fails, in a run (see begin_run)
+        """
+        pass
+
+    def watch_findings(
+        self, on_found: Optional[Callable[[List[Violation]], None]]
+    ) -> None:
+        """
+        Sets a callback that receives this tool's findings as soon as they are found
+
+        While results runs, on_found is called with the findings parsed from each
+        part of this tool's output (see stream), and with its cached findings;
+        findings for ignored checks are excluded. If this tool runs in shards,
+        on_found may be called from several threads at once. Pass None to stop
+        watching.
+        """
+        self._on_found = on_found
+
+    def _found(self, violations: List[Violation]) -> None:
+        on_found = self._on_found
+        if on_found is not None and violations:
+            on_found(self._without_ignored(violations))
+
     @abstractmethod
     def matches_project(self, files: Iterable[Path]) -> bool:
         """
@@ -147,6 +250,70 @@ class Tool(ABC, Generic[R]):
         """
         return []
 
+    def tool_version(self) -> str:
+        """
+        Returns a string that identifies the installed version of this tool
+
+        Changing this string invalidates all cached results for this tool.
+        """
+        return ""
+
+    def cache_key(self) -> str:
+        """
+        Returns a key that identifies everything, other than file contents, that
+        determines this tool's results
+
+        This includes the Bento version, the tool version, the tool configuration,
+        and the contents of any extra cache paths.
+        """
+        extra = [
+            f"{p}:{self.context.cache.content_hash(p) if p.is_file() else ''}"
+            for p in self.extra_cache_paths()
+        ]
+        key = json.dumps(
+            [BENTO_VERSION, self.tool_version(), self.config, extra],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+    @classmethod
+    def caches_per_file(cls) -> bool:
+        """
+        Returns true if this tool's findings in a file depend only on that file's
+        contents, so that its results can be cached per file
+
+        Otherwise, results are cached for whole runs, and are invalidated when any
+        file the tool runs on changes.
+        """
+        return True
+
+    @classmethod
+    def can_shard(cls) -> bool:
+        """
+        Returns true if this tool can run concurrently on disjoint subsets of files,
+        with the union of the results equal to the results of a single run
+        """
+        return True
+
+    def parallelism(self) -> int:
+        """
+        Returns the number of shards this tool's files are split into
+
+        Configured by the tool's "parallelism" option, which is either a number of
+        shards or "auto" (one shard per CPU). Defaults to a single shard.
+        """
+        if not self.can_shard():
+            return 1
+        value: Union[int, str] = self.config.get(PARALLELISM_KEY, 1)
+        if value == AUTO_PARALLELISM:
+            return os.cpu_count() or 1
+        if not isinstance(value, int) or value < 1:
+            raise ValueError(
+                f"Invalid {PARALLELISM_KEY} for {self.tool_id()}: '{value}' (expected a positive integer or '{AUTO_PARALLELISM}')"
+            )
+        return value
+
     def project_has_file_paths(self, files: Iterable[Path]) -> bool:
         """
         Returns true iff any unignored files matches at least one extension
@@ -159,22 +326,13 @@ class Tool(ABC, Generic[R]):
 
             Returns False if a "first line" does not make sense for file_path
             i.e. file_path is a binary or is an empty file or doesnt exist
+
+            Files are read once per run for all tools (see FileClassifier).
         """
         assert self.shebang_pattern is not None
 
-        if not file_path.is_file():
-            # File doesnt exist or is a dir
-            return False
-
-        with open(file_path) as file:
-            try:
-                line: str = next(file)
-            except StopIteration:  # Empty file
-                return False
-            except UnicodeDecodeError:  # Binary file
-                return False
-
-        return self.shebang_pattern.match(line) is not None
+        shebang = self.context.file_classifier.shebang(file_path)
+        return shebang is not None and self.shebang_pattern.match(shebang) is not None
 
     def filter_paths(self, paths: Iterable[Path]) -> Set[Path]:
         """
@@ -192,7 +350,8 @@ class Tool(ABC, Generic[R]):
         Returns:
             A set of valid paths
         """
-        abspaths = [p.resolve() for p in paths]
+        # Run targets are already resolved (see TargetFileManager)
+        abspaths = [p if p.is_absolute() else p.resolve() for p in paths]
         to_run = {
             p
             for p in abspaths
@@ -207,85 +366,316 @@ class Tool(ABC, Generic[R]):
 
         Raises:
             CalledProcessError: If execution fails and check is True
+            RunCancelled: If the context's scheduler is cancelled (see Scheduler.cancel)
         """
         new_args: Dict[str, Any] = {"cwd": self.base_path, "encoding": "utf8"}
         new_args.update(kwargs)
         cmd_args = (f"'{a}'" for a in command)
         logging.debug(f"{self.tool_id()}: Running: {' '.join(cmd_args)}")
-        before = time()
-        res = subprocess.run(command, **new_args)
-        after = time()
+        with self.context.scheduler.slot(self.tool_id()), tracing.span(
+            "tool.subprocess", tool=self.tool_id()
+        ):
+            before = time()
+            res = self.context.scheduler.run(command, **new_args)
+            after = time()
         logging.debug(f"{self.tool_id()}: Command completed in {after - before:2f} s")
         return res
 
+    def execute_streaming(
+        self,
+        command: List[str],
+        parse: Callable[[TextIO], Iterator[P]],
+        is_allowed_returncode: Callable[[int], bool] = lambda returncode: True,
+        input: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Iterator[P]:
+        """
+        Runs a command on this tool's base path, parsing its stdout as the command produces it
+
+        Yields what parse yields. Once parse returns, the rest of the command's
+        stdout is discarded, and the command is waited on; if iteration stops
+        early, the command is killed.
+
+        :param parse: Incrementally parses the command's stdout
+        :param is_allowed_returncode: Whether the command's exit code indicates success
+        :param input: If not None, written to the command's stdin
+        :raises CalledProcessError: If the command fails, or its output can not be parsed
+        :raises RunCancelled: If the context's scheduler is cancelled (see Scheduler.cancel)
+        """
+        new_args: Dict[str, Any] = {"cwd": self.base_path, "encoding": "utf8"}
+        new_args.update(kwargs)
+        cmd_args = (f"'{a}'" for a in command)
+        logging.debug(f"{self.tool_id()}: Running: {' '.join(cmd_args)}")
+        # stderr is spooled to a file, so that the command never blocks on it
+        with self.context.scheduler.slot(self.tool_id()), tracing.span(
+            "tool.subprocess", tool=self.tool_id()
+        ), tempfile.TemporaryFile("w+", encoding="utf8") as stderr:
+            before = time()
+            process = subprocess.Popen(
+                command,
+                stdin=None if input is None else subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=stderr,
+                **new_args,
+            )
+            stdout = cast(TextIO, process.stdout)
+            try:
+                with self.context.scheduler.cancellable(process.kill):
+                    if process.stdin:
+                        with process.stdin:
+                            process.stdin.write(input or "")
+                    error: Optional[ValueError] = None
+                    try:
+                        yield from parse(stdout)
+                    except ValueError as e:
+                        error = e
+                    rest = stdout.read(4000)
+                    while stdout.read(CHUNK_SIZE):
+                        pass
+                    returncode = process.wait()
+            finally:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+                stdout.close()
+            after = time()
+            stderr.seek(0)
+            errors = stderr.read()
+
+        logging.debug(f"{self.tool_id()}: Command completed in {after - before:2f} s")
+        logging.debug(f"{self.tool_id()}: stderr[:4000]:\n" + errors[0:4000])
+        logging.debug(f"{self.tool_id()}: unparsed stdout[:4000]:\n" + rest)
+        if error is not None or not is_allowed_returncode(returncode):
+            raise subprocess.CalledProcessError(
+                returncode, command, output=rest, stderr=errors
+            ) from error
+
     @classmethod
     def max_batch_size(cls) -> int:
         """Returns the maximum number of files to run in a single batch"""
-        # On UNIX, max argc is stack size / 4
-        return int(resource.RLIMIT_STACK / 4) - MIN_RESERVED_ARGS
+        return sys.maxsize
+
+    @classmethod
+    def max_batch_bytes(cls) -> int:
+        """
+        Returns the maximum total size of the file arguments run in a single batch
+
+        By default, batches fit in the system's argument space, less this process's
+        environment and RESERVED_ARG_BYTES (see util.arg_size). Tools that do not
+        pass files on their command line (e.g. that pass them via stdin or an
+        argument file) are not limited, and return sys.maxsize.
+        """
+        return arg_max() - environment_size() - RESERVED_ARG_BYTES
 
     def _get_findings_from_run(self, paths: Iterable[Path]) -> List[Violation]:
         """
         Returns findings by calling tool "run" method
 
+        If this tool's parallelism is greater than one, paths are split into shards
+        of approximately equal total file size, which run concurrently on the shared
+        shard executor. Findings are then ordered by path, so that results do not
+        depend on how paths were sharded.
+
         :param paths: Paths to run on
         :return:
         """
-        paths_to_run = self.filter_paths(paths)
+        paths_to_run = set(paths)
         if not paths_to_run:
             return []
 
+        n_shards = min(self.parallelism(), len(paths_to_run))
+        if n_shards <= 1:
+            return self._run_batches(paths_to_run)
+
+        logging.debug(f"{self.tool_id()}: Running in {n_shards} shards")
+        futures = [
+            shard_executor().submit(self._run_batches, shard)
+            for shard in shard_by_size(paths_to_run, n_shards)
+        ]
+        try:
+            violations = [v for f in futures for v in f.result()]
+        except Exception:
+            for f in futures:
+                f.cancel()
+            raise
+
+        return sorted(violations, key=lambda v: v.path)
+
+    def _run_batches(self, paths: Iterable[Path]) -> List[Violation]:
+        """
+        Runs this tool on paths, in batches limited by max_batch_size and max_batch_bytes
+        """
         violations: List[Violation] = []
 
-        for batch in batched(paths_to_run, self.max_batch_size()):
-            path_list = [str(p) for p in batch]
-            raw = self.run(path_list)
+        for path_list in batched_by_size(
+            (str(p) for p in paths),
+            self.max_batch_size(),
+            self.max_batch_bytes(),
+            arg_size,
+        ):
+            parser = self.parser()
+            # Parts are parsed as the tool produces them, so parsing is nested in the run
             try:
-                violations += self.parser().parse(raw)
-            except Exception as e:
-                raise Exception(
-                    f"Could not parse output of '{self.tool_id()}':\n{raw}", e
-                )
+                with tracing.span(
+                    "tool.run", tool=self.tool_id(), files=len(path_list)
+                ):
+                    for part in self.stream(path_list):
+                        try:
+                            with tracing.span("tool.parse", tool=self.tool_id()):
+                                parsed = parser.parse(part)
+                        except Exception as e:
+                            raise Exception(
+                                f"Could not parse output of '{self.tool_id()}':\n{part}",
+                                e,
+                            )
+                        violations += parsed
+                        self._found(parsed)
+            finally:
+                parser.close()
+
+        return violations
+
+    def _get_findings_from_run_cache(self, paths: Iterable[Path]) -> List[Violation]:
+        """
+        Returns findings of a whole run, re-running this tool on all files unless
+        none have changed since the run's results were cached
 
+        :param paths: Paths to run on
+        """
+        cache = self.context.cache
+        tool_id = self.tool_id()
+        key = self.cache_key()
+
+        logging.debug(f"Checking for local cache for {tool_id}")
+        with tracing.span("cache.get", tool=tool_id):
+            cached, states = cache.get_run(tool_id, key, sorted(paths))
+        if cached is not None:
+            self._found(cached)
+            return cached
+
+        logging.debug(f"Cache entry invalid. Running {tool_id}.")
+        violations = self._get_findings_from_run(states.keys())
+        with tracing.span("cache.put", tool=tool_id):
+            cache.put_run(tool_id, key, states, violations)
         return violations
 
-    def results(self, paths: List[Path], use_cache: bool = True) -> List[Violation]:
+    def _get_findings_from_cache(
+        self, paths: Iterable[Path], walked: Iterable[Path] = ()
+    ) -> List[Violation]:
+        """
+        Returns findings, re-running this tool only on files whose results are not cached
+
+        Findings from the re-run are cached per file. If the tool reports findings in
+        files it was not run on, results from the re-run are not cached, as they can
+        not be attributed to individual files.
+
+        :param paths: Paths to run on
+        :param walked: Directories that were walked in full to find paths (see RunCache.get)
+        """
+        cache = self.context.cache
+        tool_id = self.tool_id()
+        key = self.cache_key()
+
+        logging.debug(f"Checking for local cache for {tool_id}")
+        with tracing.span("cache.get", tool=tool_id):
+            hits, misses = cache.get(tool_id, key, sorted(paths), walked)
+        violations = [v for r in hits.values() for v in r]
+        self._found(violations)
+        if not misses:
+            return violations
+
+        logging.debug(
+            f"Cache entry invalid for {len(misses)} file(s). Running {tool_id}."
+        )
+        new_violations = self._get_findings_from_run(misses.keys())
+
+        by_path: Dict[Path, List[Violation]] = {p: [] for p in misses}
+        for v in new_violations:
+            path = Path(os.path.normpath(self.base_path / v.path))
+            if path not in by_path:
+                logging.warning(
+                    f"{tool_id}: Not caching results, since a finding in {v.path} was not in the run"
+                )
+                break
+            by_path[path].append(v)
+        else:
+            with tracing.span("cache.put", tool=tool_id):
+                cache.put(tool_id, key, misses, by_path)
+
+        return violations + new_violations
+
+    def cached_results(self, digests: Mapping[Path, str]) -> Optional[List[Violation]]:
+        """
+        Returns this tool's cached findings for files with the given contents
+
+        Files need not have these contents on disk, so that findings for other
+        versions of files (e.g. their versions at HEAD) can be found without
+        checking these versions out.
+
+        :param digests: Each path's content hash (see RunCache.data_hash)
+        :return: The findings, or None if the findings for any file are not cached
+        """
+        if not self.can_use_cache():
+            return None
+        paths = sorted(self.filter_paths(digests))
+        if not self.caches_per_file():
+            with tracing.span("cache.get", tool=self.tool_id()):
+                cached = self.context.cache.lookup_run(
+                    self.tool_id(), self.cache_key(), {p: digests[p] for p in paths}
+                )
+            return None if cached is None else self._without_ignored(cached)
+        with tracing.span("cache.get", tool=self.tool_id()):
+            hits = self.context.cache.lookup(
+                self.tool_id(), self.cache_key(), {p: digests[p] for p in paths}
+            )
+        if hits is None:
+            return None
+        return self._without_ignored([v for p in paths for v in hits[p]])
+
+    def _without_ignored(self, violations: List[Violation]) -> List[Violation]:
+        """
+        Removes findings for checks that are ignored in this tool's configuration
+        """
+        ignore_set = set(self.config.get("ignore", []))
+        return [v for v in violations if v.check_id not in ignore_set]
+
+    def results(
+        self,
+        paths: Iterable[Path],
+        use_cache: bool = True,
+        routed: bool = False,
+        walked: Iterable[Path] = (),
+    ) -> List[Violation]:
         """
         Runs this tool, returning all identified violations
 
         Code runs inside virtual environment.
 
-        Before running tool, checks local RunCache for cached tool output and skips
-        if said output is still usable
+        Before running tool, checks local RunCache for cached tool output, and only
+        runs on those files whose cached output is no longer usable
 
         Parameters:
             paths (list or None): If defined, an explicit list of paths to run on
             use_cache (bool): If True, checks for cached results
+            routed (bool): If True, paths are already filtered to those this tool
+                should analyze (see bento.routing)
+            walked (list): Directories that were walked in full to find paths;
+                cached results for other files in them are pruned
 
         Raises:
             CalledProcessError: If execution fails
         """
         if not paths:
             return []
-
-        use_cache = use_cache and self.can_use_cache()
-
-        logging.debug(f"Checking for local cache for {self.tool_id()}")
-        cache_repr = self.context.cache.get(
-            self.tool_id(), paths + self.extra_cache_paths()
-        )
-        if not use_cache or cache_repr is None:
-            logging.debug(f"Cache entry invalid for {self.tool_id()}. Running Tool.")
-            violations = self._get_findings_from_run(paths)
-            if use_cache:
-                self.context.cache.put(
-                    self.tool_id(),
-                    paths + self.extra_cache_paths(),
-                    to_cache_repr(violations),
-                )
+        if not routed:
+            paths = self.filter_paths(paths)
+
+        if use_cache and self.can_use_cache():
+            if self.caches_per_file():
+                violations = self._get_findings_from_cache(paths, walked)
+            else:
+                violations = self._get_findings_from_run_cache(paths)
         else:
-            violations = from_cache_repr(cache_repr)
+            violations = self._get_findings_from_run(paths)
 
-        ignore_set = set(self.config.get("ignore", []))
-        filtered = [v for v in violations if v.check_id not in ignore_set]
-        return filtered
+        return self._without_ignored(violations)
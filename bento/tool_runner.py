@@ -10,16 +10,30 @@ from functools import partial
 from multiprocessing import Lock
 from multiprocessing.pool import ThreadPool
 from pathlib import Path
-from typing import Collection, Iterable, Iterator, List, Optional, Tuple, Union
+from typing import (
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 import attr
 import click
 from tqdm import tqdm
 
 import bento.result
+import bento.tracing as tracing
 import bento.util
 from bento.error import NoToolsConfiguredException
-from bento.result import Baseline
+from bento.result import BaselineView
+from bento.routing import route
+from bento.scheduler import RunCancelled
 from bento.tool import Tool
 from bento.violation import Violation
 
@@ -46,10 +60,15 @@ class Runner:
     skip_setup = attr.ib(type=bool, default=False)
     show_bars = attr.ib(type=bool, default=True)
     install_only = attr.ib(type=bool, default=False)
+    # If set, all tools are cancelled once any tool finds an unarchived finding
+    fail_fast = attr.ib(type=bool, default=False)
+    # Directories that were walked in full to find paths (see Tool.results)
+    walked = attr.ib(type=List[Path], factory=list)
     _lock = attr.ib(type=multiprocessing.synchronize.Lock, factory=Lock, init=False)
     _bars = attr.ib(type=List[tqdm], factory=list, init=False)
     _run = attr.ib(type=List[bool], factory=list, init=False)
     _done = attr.ib(type=bool, default=False, init=False)
+    _routes = attr.ib(type=Dict[str, Set[Path]], factory=dict, init=False)
 
     def __attrs_post_init__(self) -> None:
         self.show_bars = self.show_bars and sys.stderr.isatty()
@@ -192,17 +211,21 @@ class Runner:
         """
         Ensures that a tool is installed.
 
+        Installation is never cancelled part-way (see Scheduler.shielded).
+
         :param bar: Any associated progress bar
         :param ix: The bar index
         :param tool: The tool
         """
         with self._updating_bar(
             bar, ix, 0, max_bar_value, bento.util.SETUP_TEXT, end_text
-        ):
+        ), tracing.span(
+            "tool.setup", tool=tool.tool_id()
+        ), tool.context.scheduler.shielded():
             tool.setup()
 
     def _run_single_tool(
-        self, bar: Optional[tqdm], ix: int, tool: Tool, baseline: Baseline
+        self, bar: Optional[tqdm], ix: int, tool: Tool, baseline: BaselineView
     ) -> ToolResults:
         """
         Returns results for running a previously installed tool.
@@ -210,7 +233,6 @@ class Runner:
         :param bar: The progress bar associated with this tool
         :param ix: The current tool index
         :param tool: The tool itself
-        :param paths: Paths to pass to the tool
         :param baseline: Any baseline to subtract from this tool
         :return: Tool results
         """
@@ -222,14 +244,57 @@ class Runner:
             bento.util.PROGRESS_TEXT,
             bento.util.DONE_TEXT,
         ):
-            results = bento.result.filtered(
-                tool.tool_id(), tool.results(self.paths, self.use_cache), baseline
-            )
+            before = time.time()
+            found: List[Violation] = []
+            if self.fail_fast:
+                tool.watch_findings(
+                    partial(self._cancel_on_finding, tool, baseline, found)
+                )
+            try:
+                with tracing.span("tool.results", tool=tool.tool_id()):
+                    violations = tool.results(
+                        self._routes[tool.tool_id()],
+                        self.use_cache,
+                        routed=True,
+                        walked=self.walked,
+                    )
+            except RunCancelled:
+                results = bento.result.filtered(tool.tool_id(), found, baseline)
+                if all(v.filtered for v in results):
+                    raise
+                # This tool's findings cancelled the run; report those found so far
+                return results
+            finally:
+                tool.watch_findings(None)
+            with tracing.span("baseline.filter", tool=tool.tool_id()):
+                results = bento.result.filtered(tool.tool_id(), violations, baseline)
+            tool.context.scheduler.record(tool.tool_id(), time.time() - before)
+            if self.fail_fast and not all(v.filtered for v in results):
+                # For findings that bypassed watch_findings
+                tool.context.scheduler.cancel()
 
         return results
 
+    def _cancel_on_finding(
+        self,
+        tool: Tool,
+        baseline: BaselineView,
+        found: List[Violation],
+        violations: List[Violation],
+    ) -> None:
+        """
+        Collects a tool's findings as they are found, cancelling the run at the first unarchived finding
+        """
+        found.extend(violations)
+        rejects = baseline.get(tool.tool_id(), set())
+        if any(v.syntactic_identifier_str() not in rejects for v in violations):
+            logging.debug(
+                f"{tool.tool_id()} found a finding; cancelling remaining tools"
+            )
+            tool.context.scheduler.cancel()
+
     def _setup_and_run_single_tool(
-        self, baseline: Baseline, index_and_tool: Tuple[int, Tool]
+        self, baseline: BaselineView, index_and_tool: Tuple[int, Tool]
     ) -> RunResults:
         """Runs a tool and filters out existing findings using baseline"""
 
@@ -262,19 +327,75 @@ class Runner:
             )
 
             return tool.tool_id(), results
+        except RunCancelled as e:
+            logging.debug(f"{tool.tool_id()} cancelled")
+            return tool.tool_id(), e
         except Exception as e:
             logging.error(traceback.format_exc())
             return tool.tool_id(), e
+        finally:
+            tool.end_run()
+
+    def echo(self, lines: Iterable[str]) -> None:
+        """
+        Echoes lines to stdout, above any progress bars
+        """
+        text = "\n".join(lines)
+        with self._lock:
+            if self.show_bars and self._bars:
+                tqdm.write(text, file=sys.stdout)
+            else:
+                click.echo(text)
 
     def parallel_results(
-        self, tools: Iterable[Tool], baseline: Baseline, keep_bars: bool = True
+        self,
+        tools: Iterable[Tool],
+        baseline: BaselineView,
+        keep_bars: bool = True,
+        on_result: Optional[Callable[[RunResults], Collection[str]]] = None,
     ) -> Collection[RunResults]:
         """Runs all tools in parallel.
 
         Each tool is optionally run against a list of files. For each tool, it's results are
         filtered to those results not appearing in the whitelist.
 
-        A progress bar is emitted to stderr for each tool.
+        See iter_results.
+
+        Parameters:
+            tools: (iterable): Tools to run
+            baseline (set): The set of whitelisted finding hashes
+            keep_bars (bool): If true, progress bars are preserved after run (default True)
+            on_result (callable): If present, called with each tool's `RunResult` as soon
+                as the tool completes; returns lines to echo to stdout (above any progress
+                bars)
+
+        Returns:
+            (collection): For each tool, in order, a `RunResult`, which is a tuple of (`tool_id`, `findings`)
+        """
+        tool_list = list(tools)
+        results_by_id: Dict[str, ToolResults] = {}
+        for tool_id, results in self.iter_results(tool_list, baseline, keep_bars):
+            results_by_id[tool_id] = results
+            if on_result:
+                lines = on_result((tool_id, results))
+                if lines:
+                    self.echo(lines)
+        return [(t.tool_id(), results_by_id[t.tool_id()]) for t in tool_list]
+
+    def iter_results(
+        self, tools: Iterable[Tool], baseline: BaselineView, keep_bars: bool = True
+    ) -> Iterator[RunResults]:
+        """Runs all tools in parallel, yielding each tool's results as soon as the tool completes.
+
+        Paths are routed to tools once, before any tool runs (see bento.routing).
+        Tools can then share work with the other scheduled tools (see Tool.begin_run).
+
+        Tools are started in order of their estimated duration, longest first; the
+        number of concurrently running tool subprocesses is limited by each tool's
+        context scheduler.
+
+        A progress bar is emitted to stderr for each tool; progress bars are
+        cleaned up once all results have been yielded.
 
         Parameters:
             tools: (iterable): Tools to run
@@ -282,7 +403,7 @@ class Runner:
             keep_bars (bool): If true, progress bars are preserved after run (default True)
 
         Returns:
-            (collection): For each tool, a `RunResult`, which is a tuple of (`tool_id`, `findings`)
+            (iterator): For each tool, in order of completion, a `RunResult`
         """
         indices_and_tools = list(enumerate(tools))
         n_tools = len(indices_and_tools)
@@ -290,6 +411,13 @@ class Runner:
         if n_tools == 0:
             raise NoToolsConfiguredException()
 
+        if not self.install_only:
+            with tracing.span("run.route", files=len(self.paths)):
+                self._routes = route((t for _, t in indices_and_tools), self.paths)
+            scheduled = [t for _, t in indices_and_tools]
+            for t in scheduled:
+                t.begin_run(scheduled)
+
         if self.show_bars:
             self._setup_bars(indices_and_tools)
         self._run = [True for _, _ in indices_and_tools]
@@ -300,22 +428,27 @@ class Runner:
         )
         slow_run_thread.start()
 
-        with ThreadPool(n_tools) as pool:
-            # using partial to pass in multiple arguments to __tool_filter
-            func = partial(Runner._setup_and_run_single_tool, self, baseline)
-            all_results = pool.map(func, indices_and_tools)
-
-        self._done = True
-        slow_run_thread.join()
-
-        if self.show_bars:
-            if keep_bars:
-                for _ in self._bars:
-                    click.echo("", err=True)
-            for b in self._bars:
-                b.close()
-            if keep_bars:
-                # Progress bars terminate on whitespace
-                bento.util.echo_newline()
-
-        return all_results
+        by_estimate = sorted(
+            indices_and_tools,
+            key=lambda it: -it[1].context.scheduler.estimate(it[1].tool_id()),
+        )
+        try:
+            # Tool threads mostly wait on subprocesses, which are scheduled separately
+            with ThreadPool(n_tools) as pool:
+                # using partial to pass in multiple arguments to __tool_filter
+                func = partial(Runner._setup_and_run_single_tool, self, baseline)
+                yield from pool.imap_unordered(func, by_estimate)
+        finally:
+            self._done = True
+            slow_run_thread.join()
+
+            if self.show_bars:
+                if keep_bars:
+                    for _ in self._bars:
+                        click.echo("", err=True)
+                for b in self._bars:
+                    b.close()
+                if keep_bars:
+                    # Progress bars terminate on whitespace
+                    bento.util.echo_newline()
+                self._bars = []
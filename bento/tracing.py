@@ -0,0 +1,191 @@
+"""
+Timing spans for profiling Bento runs
+
+Code marks phases of a run with spans:
+
+    with tracing.span("tool.parse", tool=tool_id):
+        ...
+
+Spans are only recorded once tracing is started (e.g. by `bento check
+--profile`); otherwise they cost a single check. Recorded spans nest by time
+within each thread, and can be written as a Chrome trace (viewable at
+chrome://tracing or https://ui.perfetto.dev), or summarized by phase.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import (
+    Any,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    TextIO,
+    Tuple,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+
+class Span(NamedTuple):
+    name: str
+    start: float
+    duration: float
+    thread: int
+    args: Dict[str, Any]
+
+    @property
+    def label(self) -> str:
+        """The span's name, qualified by the tool it pertains to, if any"""
+        tool = self.args.get("tool")
+        return f"{self.name} [{tool}]" if tool else self.name
+
+
+class Tracer:
+    """
+    Records spans; access is threadsafe
+    """
+
+    def __init__(self) -> None:
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self._thread_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, start: float, end: float, args: Dict[str, Any]) -> None:
+        thread = threading.current_thread()
+        with self._lock:
+            self._thread_names[thread.ident or 0] = thread.name
+            self.spans.append(
+                Span(name, start - self.origin, end - start, thread.ident or 0, args)
+            )
+
+    def write_chrome_trace(self, stream: TextIO) -> None:
+        """
+        Writes recorded spans in the Chrome trace event format
+        """
+        pid = os.getpid()
+        with self._lock:
+            events: List[Dict[str, Any]] = [
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+                for tid, name in self._thread_names.items()
+            ]
+            events += [
+                {
+                    "name": s.label,
+                    "cat": s.name.split(".")[0],
+                    "ph": "X",
+                    "ts": round(s.start * 1e6),
+                    "dur": round(s.duration * 1e6),
+                    "pid": pid,
+                    "tid": s.thread,
+                    "args": s.args,
+                }
+                for s in self.spans
+            ]
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, stream, default=str)
+
+    def summary(self) -> List[Tuple[str, int, float, float]]:
+        """
+        Returns (label, count, total duration, max duration) for each span label
+
+        Labels are ordered by their first occurrence.
+        """
+        by_label: Dict[str, Tuple[int, float, float]] = {}
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        for s in spans:
+            count, total, longest = by_label.get(s.label, (0, 0.0, 0.0))
+            by_label[s.label] = (
+                count + 1,
+                total + s.duration,
+                max(longest, s.duration),
+            )
+        return [(label, *stats) for label, stats in by_label.items()]
+
+    def format_summary(self) -> str:
+        """
+        Returns the summary as a table
+        """
+        rows = self.summary()
+        width = max([len("Phase"), *(len(r[0]) for r in rows)])
+        lines = [f"{'Phase'.ljust(width)}  Count  Total (s)  Max (s)"]
+        lines += [
+            f"{label.ljust(width)}  {count:5d}  {total:9.3f}  {longest:7.3f}"
+            for label, count, total, longest in rows
+        ]
+        return "\n".join(lines)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def start() -> Tracer:
+    """
+    Starts recording spans, discarding any previously recorded spans
+    """
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop() -> Optional[Tracer]:
+    """
+    Stops recording spans, returning the tracer that recorded them (if tracing was started)
+    """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+@contextmanager
+def span(name: str, **args: Any) -> Iterator[None]:
+    """
+    Records the duration of a block
+
+    :param name: The phase's name, as "category.phase"
+    :param args: Details of the span (e.g. "tool", the ID of the tool it pertains to)
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        tracer.record(name, start, time.perf_counter(), args)
+
+
+@contextmanager
+def traced(
+    context: ContextManager[T], enter: str, exit: str, **args: Any
+) -> Iterator[T]:
+    """
+    Wraps a context manager, recording its entry and exit as separate spans
+
+    E.g., traced(staged_files_only(...), "git.stash", "git.unstash")
+    """
+    with span(enter, **args):
+        value = context.__enter__()
+    try:
+        yield value
+    except BaseException:
+        with span(exit, **args):
+            if not context.__exit__(*sys.exc_info()):
+                raise
+    else:
+        with span(exit, **args):
+            context.__exit__(None, None, None)
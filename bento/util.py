@@ -1,5 +1,6 @@
 from __future__ import unicode_literals
 
+import heapq
 import itertools
 import logging
 import os
@@ -7,6 +8,7 @@ import os.path
 import re
 import shutil
 import signal
+import struct
 import subprocess
 import sys
 import threading
@@ -25,6 +27,7 @@ from typing import (
     Iterable,
     Iterator,
     List,
+    Mapping,
     Optional,
     Pattern,
     TextIO,
@@ -60,6 +63,11 @@ BEL = "\x07"
 LINK_PRINTER_PATTERN = re.compile("(iterm2|gnome-terminal)", re.IGNORECASE)
 LINK_WIDTH = 2 * len(OSC_8) + 2 * len(BEL)
 
+ARG_MAX_FALLBACK = 128 * 1024
+"""Argument space assumed if the system does not report it, in bytes"""
+POINTER_SIZE = struct.calcsize("P")
+"""Size of each argument's pointer in a new process's argument space, in bytes"""
+
 AutocompleteSuggestions = List[Union[str, Tuple[str, str]]]
 
 
@@ -174,6 +182,88 @@ def batched(it: Iterable[_T], max_len: int) -> Iterator[Iterator[_T]]:
     )
 
 
+def batched_by_size(
+    it: Iterable[_T], max_len: int, max_size: int, size: Callable[[_T], int]
+) -> Iterator[List[_T]]:
+    """
+    Batches an iterator in lists of a maximum length and total size
+
+    Items larger than max_size are batched alone.
+
+    :param it: The iterator to batch
+    :param max_len: The maximum length
+    :param max_size: The maximum total size of each batch's items
+    :param size: Returns an item's size
+    """
+    batch: List[_T] = []
+    total = 0
+    for item in it:
+        item_size = size(item)
+        if batch and (len(batch) >= max_len or total + item_size > max_size):
+            yield batch
+            batch = []
+            total = 0
+        batch.append(item)
+        total += item_size
+    if batch:
+        yield batch
+
+
+def arg_max() -> int:
+    """
+    Returns the number of bytes available for a new process's arguments and environment
+    """
+    try:
+        value = os.sysconf("SC_ARG_MAX")
+    except (AttributeError, ValueError, OSError):
+        value = -1
+    return value if value > 0 else ARG_MAX_FALLBACK
+
+
+def arg_size(arg: str) -> int:
+    """
+    Returns the number of bytes an argument (or environment entry) uses of arg_max()
+
+    This is the argument's encoded length, its terminator, and its pointer.
+    """
+    return len(os.fsencode(arg)) + 1 + POINTER_SIZE
+
+
+def environment_size(env: Optional[Mapping[str, str]] = None) -> int:
+    """
+    Returns the number of bytes an environment (by default, this process's) uses of arg_max()
+    """
+    env = os.environ if env is None else env
+    return sum(arg_size(f"{k}={v}") for k, v in env.items()) + POINTER_SIZE
+
+
+def shard_by_size(paths: Iterable[Path], n_shards: int) -> List[List[Path]]:
+    """
+    Splits paths into at most n_shards shards of approximately equal total file size
+
+    Largest files are assigned first, each to the currently smallest shard. The
+    result depends only on the paths and their sizes; each shard is sorted.
+
+    :param paths: The paths to shard
+    :param n_shards: The maximum number of shards
+    """
+
+    def size(p: Path) -> int:
+        try:
+            return p.stat().st_size
+        except OSError:
+            return 0
+
+    weighted = sorted(((size(p), p) for p in paths), key=lambda x: (-x[0], x[1]))
+    heap = [(0, i) for i in range(min(n_shards, len(weighted)))]
+    shards: List[List[Path]] = [[] for _ in heap]
+    for weight, p in weighted:
+        total, i = heapq.heappop(heap)
+        shards[i].append(p)
+        heapq.heappush(heap, (total + weight, i))
+    return [sorted(s) for s in shards]
+
+
 def less(
     output: Collection[Collection[str]], pager: bool = True, overrun_pages: int = 0
 ) -> None:
@@ -3,13 +3,29 @@ import textwrap
 from typing import Any, Dict, Optional
 
 import attr
-import pymmh3 as mmh3
 
+try:
+    # C implementation of murmur3, if installed (pip install bento-cli[fast])
+    import mmh3
 
-@attr.s(frozen=True, hash=False)
+    def _hash128(key: str) -> int:
+        return mmh3.hash128(key.encode(), signed=False)
+
+
+except ImportError:
+    import pymmh3
+
+    def _hash128(key: str) -> int:
+        # Bit-identical to the C implementation, but much slower
+        return pymmh3.hash128(key)
+
+
+@attr.s(frozen=True, hash=False, slots=True)
 class Violation:
     """
     N.B.: line and column are 1-based, not 0-based
+
+    The syntactic identifier is computed on first use, and memoized.
     """
 
     BASELINE_IGNORED_ITEMS = ["line", "column", "link", "filtered"]
@@ -26,12 +42,76 @@ class Violation:
     semantic_context = None
     filtered = attr.ib(type=Optional[bool], default=None, hash=None, cmp=False)
     link = attr.ib(type=Optional[str], default=None, hash=None, cmp=False, kw_only=True)
+    _identifier = attr.ib(
+        type=Optional[int], default=None, init=False, cmp=False, repr=False
+    )
 
-    def syntactic_identifier_int(self) -> int:
-        # Use murmur3 hash to minimize collisions
+    @classmethod
+    def restore(
+        cls,
+        tool_id: str,
+        check_id: str,
+        path: str,
+        line: int,
+        column: int,
+        message: str,
+        severity: int,
+        syntactic_context: str,
+        filtered: Optional[bool],
+        link: Optional[str],
+        identifier: Optional[int],
+    ) -> "Violation":
+        """
+        Recreates a stored violation, without re-running attribute converters
+
+        :param syntactic_context: The stored syntactic context, which is already dedented
+        :param identifier: The stored syntactic identifier, if known
+        """
+        v = object.__new__(cls)
+        # Violation is frozen, so bypass its __setattr__
+        set_attr = object.__setattr__
+        set_attr(v, "tool_id", tool_id)
+        set_attr(v, "check_id", check_id)
+        set_attr(v, "path", path)
+        set_attr(v, "line", line)
+        set_attr(v, "column", column)
+        set_attr(v, "message", message)
+        set_attr(v, "severity", severity)
+        set_attr(v, "syntactic_context", syntactic_context)
+        set_attr(v, "filtered", filtered)
+        set_attr(v, "link", link)
+        set_attr(v, "_identifier", identifier)
+        return v
+
+    def with_filtered(self, filtered: Optional[bool]) -> "Violation":
+        """
+        Returns a copy of this violation with a new filtered state
 
-        str_id = str((self.check_id, self.path, self.syntactic_context))
-        return mmh3.hash128(str_id)
+        Unlike attr.evolve, this keeps the memoized syntactic identifier.
+        """
+        return Violation.restore(
+            tool_id=self.tool_id,
+            check_id=self.check_id,
+            path=self.path,
+            line=self.line,
+            column=self.column,
+            message=self.message,
+            severity=self.severity,
+            syntactic_context=self.syntactic_context,
+            filtered=filtered,
+            link=self.link,
+            identifier=self._identifier,
+        )
+
+    def syntactic_identifier_int(self) -> int:
+        identifier = self._identifier
+        if identifier is None:
+            # Use murmur3 hash to minimize collisions
+            str_id = str((self.check_id, self.path, self.syntactic_context))
+            identifier = _hash128(str_id)
+            # Violation is frozen, so bypass its __setattr__
+            object.__setattr__(self, "_identifier", identifier)
+        return identifier
 
     def syntactic_identifier_str(self) -> str:
         id_bytes = int.to_bytes(
@@ -45,7 +125,7 @@ class Violation:
         return self.syntactic_identifier_int()
 
     def to_dict(self) -> Dict[str, Any]:
-        d = attr.asdict(self)
+        d = attr.asdict(self, filter=lambda a, _: a.init)
         for i in Violation.BASELINE_IGNORED_ITEMS:
             d.pop(i)
         return d
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmarks FileIgnore against the previous (per-entry fnmatch) implementation
+
+Generates a synthetic tree of about 100k files, including ignored directories
+(node_modules, .git, dist, build caches), then walks it with both implementations,
+checks that they produce identical entries, and reports wall-clock times.
+
+Usage: scripts/benchmark_fignore.py [--files N] [--repeat R]
+"""
+import argparse
+import fnmatch
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Set
+
+from bento.fignore import Entry, FileIgnore, Parser, Processor
+
+REPO_PATH = Path(__file__).resolve().parent.parent
+IGNORE_FILES = [
+    REPO_PATH / "bento" / "configs" / "extra-ignore-patterns",
+    REPO_PATH / ".gitignore",
+]
+
+
+class LegacyFileIgnore(FileIgnore):
+    """
+    The FileIgnore walker prior to compiled matching and subtree pruning
+    """
+
+    def __attrs_post_init__(self) -> None:
+        self._processed_patterns = Processor(self.base_path).process(self.patterns)
+        self._init_cache()
+
+    def _survives(self, path: Path) -> bool:
+        for p in self._processed_patterns:
+            if path.is_dir() and p.endswith("/") and fnmatch.fnmatch(str(path), p[:-1]):
+                return False
+            if fnmatch.fnmatch(str(path), p):
+                return False
+            if p.endswith("/") and fnmatch.fnmatch(
+                "/" + str(path.relative_to(self.base_path)), p + "*"
+            ):
+                return False
+            if (
+                p.endswith("/")
+                and p.startswith(str(self.base_path))
+                and fnmatch.fnmatch(str(path), p + "*")
+            ):
+                return False
+        return True
+
+    def _legacy_walk(self, this_path: str) -> Iterator[Entry]:
+        if not Path(this_path).exists():
+            return
+        if Path(this_path).is_file():
+            yield Entry(Path(this_path), self._survives(Path(this_path)))
+        else:
+            for e in os.scandir(this_path):
+                if e.is_symlink():
+                    continue
+                elif self._survives(Path(e.path)):
+                    yield from self._legacy_walk(e.path)
+                else:
+                    yield Entry(Path(e.path), False)
+
+    def _init_cache(self) -> None:
+        self._walk_cache = {}
+        for target in self.target_paths:
+            self._walk_cache.update((e.path, e) for e in self._legacy_walk(str(target)))
+
+
+def make_tree(root: Path, n_files: int) -> None:
+    """
+    Creates a tree of n_files files under root, about a third of which are ignored
+    """
+    rng = random.Random(0)
+    exts = [".py", ".js", ".ts", ".md", ".json", ".pyc", ".txt"]
+    ignored = ["node_modules", ".git", "dist", "build", "__pycache__", ".mypy_cache"]
+    created = 0
+    package = 0
+    while created < n_files:
+        pkg = root / f"pkg{package}"
+        package += 1
+        for d in range(rng.randint(2, 6)):
+            parts = [f"mod{d}"] + [f"sub{i}" for i in range(rng.randint(0, 3))]
+            if rng.random() < 0.3:
+                parts.insert(rng.randint(0, len(parts)), rng.choice(ignored))
+            directory = pkg.joinpath(*parts)
+            directory.mkdir(parents=True, exist_ok=True)
+            for f in range(rng.randint(10, 60)):
+                (directory / f"file{f}{rng.choice(exts)}").touch()
+                created += 1
+
+
+def entries(fi: FileIgnore) -> Dict[Path, bool]:
+    return {e.path: e.survives for e in fi.entries()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_tree(root, args.files)
+        patterns: Set[str] = set()
+        for ignore_file in IGNORE_FILES:
+            with ignore_file.open() as lines:
+                patterns |= Parser(root, ignore_file).parse(lines)
+        print(f"Generated {args.files} files, {len(patterns)} ignore patterns")
+
+        timings = {}
+        results = {}
+        for name, cls in [("legacy", LegacyFileIgnore), ("current", FileIgnore)]:
+            best = float("inf")
+            for _ in range(args.repeat):
+                before = time.perf_counter()
+                fi = cls(root, patterns, [root])
+                best = min(best, time.perf_counter() - before)
+            timings[name] = best
+            results[name] = entries(fi)
+            print(f"{name:>8}: {best:.3f} s ({len(results[name])} entries)")
+
+        assert results["legacy"] == results["current"], "Implementations differ"
+        print(f" speedup: {timings['legacy'] / timings['current']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmarks Violation identifiers against the previous (unslotted, unmemoized) implementation
+
+Creates 100k violations, then computes their identifiers the way a check run
+does: once to filter against the archive, once to dump results, and once more
+to collect the head baseline. Checks that both implementations produce identical
+identifiers, and reports wall-clock times and memory use.
+
+Install mmh3 (pip install bento-cli[fast]) to benchmark the C hash implementation.
+
+Usage: scripts/benchmark_violation.py [--violations N] [--repeat R]
+"""
+import argparse
+import binascii
+import textwrap
+import time
+import tracemalloc
+from typing import Any, Callable, List, Optional, Set
+
+import attr
+import pymmh3
+
+import bento.violation
+from bento.violation import Violation
+
+
+@attr.s(frozen=True, hash=False)
+class LegacyViolation:
+    """
+    The Violation class prior to slots and identifier memoization
+    """
+
+    tool_id = attr.ib(type=str)
+    check_id = attr.ib(type=str)
+    path = attr.ib(type=str)
+    line = attr.ib(type=int, hash=None, cmp=False)
+    column = attr.ib(type=int, hash=None, cmp=False)
+    message = attr.ib(type=str, hash=None, cmp=False)
+    severity = attr.ib(type=int, hash=None, cmp=False)
+    syntactic_context = attr.ib(type=str, converter=textwrap.dedent)
+    filtered = attr.ib(type=Optional[bool], default=None, hash=None, cmp=False)
+    link = attr.ib(type=Optional[str], default=None, hash=None, cmp=False, kw_only=True)
+
+    def syntactic_identifier_int(self) -> int:
+        str_id = str((self.check_id, self.path, self.syntactic_context))
+        return pymmh3.hash128(str_id)
+
+    def syntactic_identifier_str(self) -> str:
+        id_bytes = int.to_bytes(
+            self.syntactic_identifier_int(), byteorder="big", length=16, signed=False
+        )
+        return str(binascii.hexlify(id_bytes), "ascii")
+
+    def __hash__(self) -> int:
+        return self.syntactic_identifier_int()
+
+
+def make_violations(cls: Callable[..., Any], n: int) -> List[Any]:
+    return [
+        cls(
+            tool_id="r2c.flake8",
+            check_id=f"E{i % 300}",
+            path=f"src/module{i // 50}.py",
+            line=i % 500 + 1,
+            column=1,
+            message="Line too long",
+            severity=1,
+            syntactic_context=f"    value = compute_something({i}, other_argument)",
+        )
+        for i in range(n)
+    ]
+
+
+def run(violations: List[Any]) -> Set[str]:
+    # Filtering, dumping results, and collecting the head baseline each
+    # compute every identifier
+    ids: Set[str] = set()
+    for _ in range(3):
+        ids = {v.syntactic_identifier_str() for v in violations}
+    set(violations)
+    return ids
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--violations", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    uses_c = "mmh3" in bento.violation._hash128.__code__.co_names
+    print(f"Hash implementation: {'mmh3 (C)' if uses_c else 'pymmh3'}")
+
+    timings = {}
+    results = {}
+    for name, cls in [("legacy", LegacyViolation), ("current", Violation)]:
+        tracemalloc.start()
+        violations = make_violations(cls, args.violations)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        best = float("inf")
+        for _ in range(args.repeat):
+            # Start each repetition from freshly created violations
+            violations = make_violations(cls, args.violations)
+            before = time.perf_counter()
+            results[name] = run(violations)
+            best = min(best, time.perf_counter() - before)
+        timings[name] = best
+        print(f"{name:>8}: {best:.3f} s, {memory / 2 ** 20:.1f} MiB")
+
+    assert results["legacy"] == results["current"], "Identifiers differ"
+    print(f" speedup: {timings['legacy'] / timings['current']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Prints a tool's cached results as JSON, for debugging
+
+Usage: scripts/export_run_cache.py TOOL_ID [--cache-dir .bento/cache]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import bento.constants as constants
+from bento.run_cache import RunCache
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("tool_id")
+    parser.add_argument(
+        "--cache-dir", type=Path, default=constants.RESOURCE_PATH / constants.CACHE_PATH
+    )
+    args = parser.parse_args()
+
+    exported = RunCache(args.cache_dir).export(args.tool_id)
+    if exported is None:
+        sys.exit(f"No valid cache for {args.tool_id} in {args.cache_dir}")
+    json.dump(exported, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+class DockerException(Exception): ...
+class APIError(DockerException): ...
+class NotFound(APIError): ...
+class ImageNotFound(NotFound): ...
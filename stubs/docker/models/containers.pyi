@@ -11,6 +11,7 @@ from typing import (
     Union,
 )
 
+from .images import Image
 from .resource import Model
 
 class ExecResult(NamedTuple):
@@ -18,6 +19,14 @@ class ExecResult(NamedTuple):
     output: Union[bytes, Generator, SocketType, Tuple[bytes, bytes]]
 
 class Container(Model):
+    @property
+    def name(self) -> str: ...
+    @property
+    def status(self) -> str: ...
+    @property
+    def labels(self) -> Mapping[str, str]: ...
+    @property
+    def image(self) -> Image: ...
     def exec_run(
         self,
         cmd: Union[Iterable[str], str],
@@ -34,7 +43,7 @@ class Container(Model):
         workdir: Optional[str] = None,
         demux: bool = False,
     ) -> ExecResult: ...
-    def put_archive(self, path: str, data: bytes) -> bool: ...
+    def put_archive(self, path: str, data: Union[bytes, Iterable[bytes]]) -> bool: ...
     def remove(self, **kwargs: Any) -> None: ...
     def start(self, **kwargs: Any) -> None: ...
     def stop(self, **kwargs: Any) -> None: ...
@@ -55,6 +64,7 @@ class ContainerCollection:
         remove: bool = False,
         **kwargs: Any
     ) -> Optional[Union[bytes, Container]]: ...
+    def get(self, container_id: str) -> Container: ...
     def list(
         self,
         all: bool = False,
@@ -18,6 +18,7 @@ class Image(Model):
     def tags(self) -> List[str]: ...
 
 class ImageCollection:
+    def get(self, name: str) -> Image: ...
     def list(
         self,
         name: Optional[str] = None,
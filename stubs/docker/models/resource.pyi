@@ -1,4 +1,7 @@
+from typing import Any, Dict
+
 class Model:
     # dict.get is used internally so this could technically be -> Optional[str]
     @property
     def id(self) -> str: ...
+    attrs: Dict[str, Any]
@@ -0,0 +1,4 @@
+def hash128(
+    key: bytes, seed: int = ..., x64arch: bool = ..., signed: bool = ...
+) -> int:
+    ...
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, NamedTuple
 
 class Process():
 
@@ -7,3 +7,12 @@ class Process():
 
     def name(self) -> str:
         ...
+
+
+class svmem(NamedTuple):
+    total: int
+    available: int
+
+
+def virtual_memory() -> svmem:
+    ...
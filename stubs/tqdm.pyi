@@ -1,4 +1,4 @@
-from typing import Any, Iterable, Optional
+from typing import Any, Iterable, Optional, TextIO
 
 class tqdm:
     def __init__(
@@ -29,3 +29,5 @@ class tqdm:
     def update(self, n: int = 1) -> None: ...
     def close(self) -> None: ...
     def set_postfix_str(self, text: str) -> None: ...
+    @classmethod
+    def write(cls, s: str, file: Optional[TextIO]=None, end: str="\n", nolock: bool=False) -> None: ...
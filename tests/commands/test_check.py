@@ -34,6 +34,26 @@ def test_check_compare_archive() -> None:
     assert len(parsed) == 4
 
 
+def test_check_profile() -> None:
+    """Validates that check reports the time spent in each phase with --profile"""
+
+    runner = CliRunner(mix_stderr=False)
+    context = Context(base_path=SIMPLE)
+    context.cache.wipe()
+
+    result = runner.invoke(
+        check, ["--formatter", "json", "--all", "--profile", str(SIMPLE)], obj=context
+    )
+    assert len(json.loads(result.stdout)) == 4
+    assert "tool.run [r2c.eslint]" in result.stderr
+
+    trace_path = context.cache.cache_dir / bento.constants.PROFILE_FILE_NAME
+    events = json.loads(trace_path.read_text())["traceEvents"]
+    assert {"run.check", "tool.parse [r2c.eslint]", "format"} <= {
+        e["name"] for e in events
+    }
+
+
 def test_check_no_diff_noop() -> None:
     """Validates that bare check with no diffs is noop"""
 
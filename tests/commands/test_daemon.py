@@ -0,0 +1,49 @@
+from pathlib import Path
+from typing import List, Optional
+
+from click.testing import CliRunner
+
+import bento.commands.daemon
+from _pytest.monkeypatch import MonkeyPatch
+from bento.commands.daemon import daemon
+from bento.context import Context
+
+INTEGRATION = Path(__file__).parent.parent / "integration"
+SIMPLE = INTEGRATION / "simple"
+
+
+def __patch_stop(monkeypatch: MonkeyPatch) -> List[Optional[Path]]:
+    stopped: List[Optional[Path]] = []
+
+    def stop_daemons(base_path: Optional[Path] = None) -> int:
+        stopped.append(base_path)
+        return 2
+
+    monkeypatch.setattr(bento.commands.daemon, "stop_daemons", stop_daemons)
+    monkeypatch.setattr(bento.commands.daemon, "stop_workers", lambda: 1)
+    monkeypatch.setattr(bento.commands.daemon.DOCKER_INSTALLED, "_value", True)
+    return stopped
+
+
+def test_stop(monkeypatch: MonkeyPatch) -> None:
+    """Validates that only this project's daemons are stopped by default"""
+    stopped = __patch_stop(monkeypatch)
+    context = Context(base_path=SIMPLE)
+
+    result = CliRunner().invoke(daemon, ["stop"], obj=context)
+
+    assert result.exit_code == 0
+    assert stopped == [context.base_path]
+    assert "Stopped 2 daemon container(s)" in result.output
+    assert "Stopped 1 worker process(es)" in result.output
+
+
+def test_stop_all(monkeypatch: MonkeyPatch) -> None:
+    """Validates that all daemons are stopped with --all"""
+    stopped = __patch_stop(monkeypatch)
+    context = Context(base_path=SIMPLE)
+
+    result = CliRunner().invoke(daemon, ["stop", "--all"], obj=context)
+
+    assert result.exit_code == 0
+    assert stopped == [None]
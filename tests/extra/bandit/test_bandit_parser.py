@@ -1,7 +1,9 @@
+import io
+import json
 import os
 from pathlib import Path
 
-from bento.extra.bandit import BanditTool
+from bento.extra.bandit import BanditParser, BanditTool
 from bento.violation import Violation
 from tests.test_tool import context_for
 
@@ -61,3 +63,31 @@ def test_run(tmp_path: Path) -> None:
     ]
 
     assert violations == expectation
+
+
+def test_report_parts() -> None:
+    result = {
+        "code": "3 import subprocess\n",
+        "filename": "bar.py",
+        "issue_severity": "LOW",
+        "issue_text": "Consider possible security implications.",
+        "line_number": 3,
+        "line_range": [3],
+        "more_info": "https://bandit.readthedocs.io/",
+        "test_id": "B404",
+    }
+    report = json.dumps(
+        {
+            "errors": [{"filename": "foo.py", "reason": "syntax error"}],
+            "generated_at": "2019-09-17T16:56:51Z",
+            "metrics": {"bar.py": {"loc": 3}},
+            "results": [result, {**result, "line_number": 4, "line_range": [4]}],
+        }
+    )
+    parser = BanditParser(SIMPLE_INTEGRATION_PATH)
+
+    parts = list(BanditTool._report_parts(io.StringIO(report)))
+
+    # The report is split into its errors, and each of its results
+    assert len(parts) == 3
+    assert [v for p in parts for v in parser.parse(p)] == parser.parse(report)
@@ -1,9 +1,16 @@
 import json
 import os
+import shutil
 import subprocess
 from pathlib import Path
+from typing import Set
 
+import pytest
+
+import bento.constants
+from _pytest.monkeypatch import MonkeyPatch
 from bento.extra.eslint import EslintParser, EslintTool
+from bento.tool.runner.python_tool import stop_workers
 from bento.violation import Violation
 from tests.test_tool import context_for
 
@@ -154,6 +161,77 @@ def test_typescript_run(tmp_path: Path) -> None:
 #     assert violations == []
 
 
+# Reports the options it was called with, how many engines were created, and its process
+FAKE_ESLINT = """
+let engines = 0;
+class CLIEngine {
+  constructor(options) {
+    this.options = options;
+    engines += 1;
+  }
+  executeOnFiles(files) {
+    return {
+      results: files.map(filePath => ({
+        filePath,
+        messages: [
+          {
+            ruleId: null,
+            severity: 0,
+            message: JSON.stringify({ options: this.options, engines, pid: process.pid }),
+            line: 1,
+            column: 1,
+          },
+        ],
+        source: "",
+      })),
+    };
+  }
+}
+module.exports = { CLIEngine };
+"""
+
+
+def test_run_in_daemon(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    if shutil.which("node") is None:
+        pytest.skip("Requires Node.js")
+    monkeypatch.setattr(bento.constants, "WORKER_PATH", tmp_path / "workers")
+    tool = EslintTool(
+        context_for(
+            tmp_path,
+            EslintTool.ESLINT_TOOL_ID,
+            tmp_path,
+            {"daemon": True, "ignore": ["semi"]},
+        )
+    )
+    eslint_module = tool.install_location / "node_modules" / "eslint"
+    eslint_module.mkdir(parents=True)
+    (eslint_module / "index.js").write_text(FAKE_ESLINT)
+    tool.eslintrc_path.write_text("rules: {}\n")
+
+    target = str(tmp_path / "init.js")
+    pids: Set[int] = set()
+    try:
+        for _ in range(2):
+            results = tool.run([target])
+            assert [r["filePath"] for r in results] == [target]
+            # Results are slimmed
+            assert "source" not in results[0]
+            source = json.loads(results[0]["messages"][0]["message"])
+            assert source["options"]["configFile"] == str(tool.eslintrc_path)
+            assert source["options"]["rules"] == {"semi": "off"}
+            # The engine is reused
+            assert source["engines"] == 1
+            pids.add(source["pid"])
+        assert len(pids) == 1
+
+        # Changing the configuration restarts the worker
+        os.utime(tool.eslintrc_path, ns=(0, 0))
+        message = tool.run([target])[0]["messages"][0]["message"]
+        assert json.loads(message)["pid"] not in pids
+    finally:
+        assert stop_workers() == 1
+
+
 def test_file_match(tmp_path: Path) -> None:
     f = EslintTool(context_for(tmp_path, EslintTool.ESLINT_TOOL_ID)).file_name_filter
 
@@ -180,8 +258,56 @@ def test_missing_source() -> None:
             column=0,
             message="Unexpected console statement.",
             severity=1,
-            syntactic_context="",
+            # Read from the file, as output by Bento's formatter
+            syntactic_context="console.log(3)",
         )
     ]
 
     assert result == expectation
+
+
+def test_missing_source_crlf(tmp_path: Path) -> None:
+    """Context read from files must match the source that ESLint embeds"""
+    text = "const s = {\r\n  a: '\u00e9',\r\n};\r\n"
+    (tmp_path / "crlf.js").write_bytes(text.encode("utf-8"))
+    message = {
+        "ruleId": "no-unused-vars",
+        "severity": 2,
+        "message": "'s' is assigned a value but never used.",
+        "line": 1,
+        "column": 7,
+        "endLine": 3,
+    }
+    result = {"filePath": str(tmp_path / "crlf.js"), "messages": [message]}
+
+    parser = EslintParser(tmp_path)
+    (read,) = parser.parse([dict(result)])
+    (embedded,) = parser.parse([dict(result, source=text)])
+
+    assert read.syntactic_context == "const s = {\r\n  a: '\u00e9',\r\n};"
+    assert read == embedded
+    assert read.syntactic_identifier_str() == embedded.syntactic_identifier_str()
+
+
+def test_formatter() -> None:
+    if shutil.which("node") is None:
+        pytest.skip("Requires Node.js")
+    with (THIS_PATH / "eslint_violation_simple.json").open() as json_file:
+        data = json_file.read()
+
+    formatted = subprocess.run(
+        [
+            "node",
+            "-e",
+            f"process.stdout.write(require(process.argv[1])({data}))",
+            str(EslintTool.FORMATTER_SCRIPT),
+        ],
+        stdout=subprocess.PIPE,
+        check=True,
+    ).stdout
+    results = json.loads(formatted)
+
+    assert "source" not in results[0]
+    assert "nodeType" not in results[0]["messages"][0]
+    parser = EslintParser(BASE_PATH)
+    assert parser.parse(results) == parser.parse(json.loads(data))
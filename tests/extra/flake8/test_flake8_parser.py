@@ -1,7 +1,15 @@
+import json
 import os
 from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
 
-from bento.extra.flake8 import Flake8Parser, Flake8Tool
+import bento.constants
+from _pytest.monkeypatch import MonkeyPatch
+from bento.base_context import BaseContext
+from bento.extra.boto3 import Boto3Tool
+from bento.extra.flake8 import Flake8Parser, Flake8PluginTool, Flake8Tool
+from bento.tool.runner.python_tool import stop_workers
+from bento.tool_runner import Runner
 from bento.violation import Violation
 from tests.test_tool import context_for
 
@@ -76,9 +84,106 @@ def test_run(tmp_path: Path) -> None:
     assert violations == expectation
 
 
+def test_run_in_worker(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    """Validates that results are unchanged when flake8 runs in a worker process"""
+    monkeypatch.setattr(bento.constants, "WORKER_PATH", tmp_path / "workers")
+    tool = Flake8Tool(
+        context_for(tmp_path, Flake8Tool.TOOL_ID, SIMPLE_INTEGRATION_PATH)
+    )
+    tool.setup()
+    expectation = tool.results(SIMPLE_TARGETS, use_cache=False)
+
+    tool = Flake8Tool(
+        context_for(
+            tmp_path, Flake8Tool.TOOL_ID, SIMPLE_INTEGRATION_PATH, {"daemon": True}
+        )
+    )
+    try:
+        for _ in range(2):
+            assert tool.results(SIMPLE_TARGETS, use_cache=False) == expectation
+        assert list((tmp_path / "workers").glob("*.sock"))
+    finally:
+        assert stop_workers() == 1
+
+
 def test_file_match(tmp_path: Path) -> None:
     f = Flake8Tool(context_for(tmp_path, Flake8Tool.TOOL_ID)).file_name_filter
 
     assert f.match("py") is None
     assert f.match("foo.py") is not None
     assert f.match("foo.pyi") is None
+
+
+def test_shared_run(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    a = tmp_path / "a.py"
+    b = tmp_path / "b.py"
+    for target in [a, b]:
+        target.write_text("pass\n")
+    context = BaseContext(
+        base_path=tmp_path,
+        config={"tools": {"flake8": {}, "r2c.boto3": {}, "dlint": {}}},
+        cache_path=tmp_path / "cache",
+    )
+    flake8 = Flake8Tool(context)
+    boto3 = Boto3Tool(context)
+
+    def result(path: str, code: str) -> Dict[str, Any]:
+        return {
+            "code": code,
+            "filename": path,
+            "line_number": 1,
+            "column_number": 1,
+            "text": code,
+            "physical_line": "pass",
+        }
+
+    runs: List[Tuple[List[str], List[str]]] = []
+
+    def run_flake8(
+        self: Flake8PluginTool, paths: Iterable[str], prefixes: Iterable[str]
+    ) -> str:
+        runs.append((sorted(paths), sorted(prefixes)))
+        return json.dumps(
+            {
+                p: [result(p, "E999"), result(p, "r2c-boto3-hardcoded-access-token")]
+                for p in paths
+            }
+        )
+
+    def check_ids(tools: List[Flake8PluginTool], paths: List[Path]) -> Dict[str, Any]:
+        runner = Runner(paths=paths, use_cache=True, skip_setup=True)
+        return {
+            tool_id: sorted((Path(v.path).name, v.check_id) for v in vv)
+            for tool_id, vv in runner.parallel_results(tools, {})
+            if isinstance(vv, list)
+        }
+
+    monkeypatch.setattr(Flake8PluginTool, "run_flake8", run_flake8)
+
+    # Plugin tools that are not scheduled are not selected
+    assert check_ids([flake8], [a]) == {"flake8": [("a.py", "parse-error")]}
+    assert runs == [([str(a)], sorted(Flake8Tool.code_prefixes()))]
+
+    # Plugin tools with different cache misses share a single pass
+    runs.clear()
+    assert check_ids([flake8, boto3], [a, b]) == {
+        "flake8": [("a.py", "parse-error"), ("b.py", "parse-error")],
+        "r2c.boto3": [
+            ("a.py", "hardcoded-access-token"),
+            ("b.py", "hardcoded-access-token"),
+        ],
+    }
+    assert runs == [
+        (
+            [str(a), str(b)],
+            sorted(Flake8Tool.code_prefixes() + Boto3Tool.code_prefixes()),
+        )
+    ]
+    assert flake8._shared_run is None
+
+    # Tools whose results are all cached do not participate
+    b.write_text("pass  # modified\n")
+    check_ids([flake8], [b])
+    runs.clear()
+    check_ids([flake8, boto3], [b])
+    assert runs == [([str(b)], sorted(Boto3Tool.code_prefixes()))]
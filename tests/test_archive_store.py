@@ -0,0 +1,87 @@
+import io
+import json
+import time
+from pathlib import Path
+from typing import Dict
+
+import bento.result
+from bento.archive_store import ArchiveStore
+from bento.result import ToolResults
+from tests.test_results import FINDINGS
+
+ARCHIVE: Dict[str, ToolResults] = {
+    "r2c.eslint": FINDINGS,
+    "r2c.flake8": {"violations": {}},
+}
+
+
+def __store(tmp_path: Path) -> ArchiveStore:
+    return ArchiveStore(
+        index_path=tmp_path / "cache" / "archive.sqlite",
+        json_path=tmp_path / "archive.json",
+    )
+
+
+def test_lookup(tmp_path: Path) -> None:
+    (tmp_path / "archive.json").write_text(json.dumps(ARCHIVE))
+
+    baseline = __store(tmp_path).baseline()
+    assert set(baseline.keys()) == {"r2c.eslint", "r2c.flake8"}
+    assert "ab901b8d5807dcf6074c35f9aa053ec2" in baseline["r2c.eslint"]
+    assert "ab901b8d5807dcf6074c35f9aa053ec2" not in baseline["r2c.flake8"]
+
+
+def test_export_matches_json(tmp_path: Path) -> None:
+    """Exports should be formatted as archives written by write_tool_results"""
+    (tmp_path / "archive.json").write_text(json.dumps(ARCHIVE))
+
+    exported = io.StringIO()
+    __store(tmp_path).export(exported)
+    expected = io.StringIO()
+    bento.result.write_tool_results(expected, ARCHIVE)
+    assert exported.getvalue() == expected.getvalue()
+
+    exported = io.StringIO()
+    ArchiveStore(tmp_path / "empty.sqlite", tmp_path / "missing.json").export(exported)
+    assert exported.getvalue() == "{}"
+
+
+def test_add_and_save(tmp_path: Path) -> None:
+    (tmp_path / "archive.json").write_text(json.dumps(ARCHIVE))
+    store = __store(tmp_path)
+    violations = FINDINGS["violations"]
+
+    # Nothing new to archive
+    assert store.add("r2c.eslint", violations) == 0
+    assert not store.save()
+
+    new = {"0" * 32: violations["ab901b8d5807dcf6074c35f9aa053ec2"]}
+    assert store.add("r2c.bandit", new) == 1
+    assert store.save()
+    store.close()
+
+    with (tmp_path / "archive.json").open() as stream:
+        saved = bento.result.json_to_violation_hashes(stream)
+    assert saved["r2c.bandit"] == {"0" * 32}
+    assert len(saved["r2c.eslint"]) == 2
+
+
+def test_reimport_on_change(tmp_path: Path) -> None:
+    """The index should be rebuilt when the JSON archive changes"""
+    (tmp_path / "archive.json").write_text(json.dumps(ARCHIVE))
+    baseline = __store(tmp_path).baseline()
+    assert "ab901b8d5807dcf6074c35f9aa053ec2" in baseline["r2c.eslint"]
+
+    time.sleep(1e-2)
+    (tmp_path / "archive.json").write_text(json.dumps({"r2c.eslint": {}}))
+    baseline = __store(tmp_path).baseline()
+    assert "ab901b8d5807dcf6074c35f9aa053ec2" not in baseline["r2c.eslint"]
+
+
+def test_corrupt_index(tmp_path: Path) -> None:
+    (tmp_path / "archive.json").write_text(json.dumps(ARCHIVE))
+    (tmp_path / "cache").mkdir()
+    (tmp_path / "cache" / "archive.sqlite").write_text("not a database")
+
+    baseline = __store(tmp_path).baseline()
+    assert "ab901b8d5807dcf6074c35f9aa053ec2" in baseline["r2c.eslint"]
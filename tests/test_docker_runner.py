@@ -0,0 +1,62 @@
+import io
+import tarfile
+from pathlib import Path, PurePath
+from typing import Dict, Iterable, List, Union
+
+from bento.tool.runner.docker import copy_into_container, tar_stream
+
+
+class FakeContainer:
+    def __init__(self) -> None:
+        self.uploads: List[Dict[str, bytes]] = []
+
+    def put_archive(self, path: str, data: Union[bytes, Iterable[bytes]]) -> bool:
+        assert not isinstance(data, bytes), "archive should be streamed"
+        buffer = io.BytesIO(b"".join(data))
+        with tarfile.open(fileobj=buffer) as archive:
+            self.uploads.append(
+                {
+                    m.name: archive.extractfile(m).read()  # type: ignore
+                    for m in archive.getmembers()
+                }
+            )
+        return True
+
+
+def __write_files(tmp_path: Path) -> Dict[Path, str]:
+    paths = {}
+    for name in ["a.py", "b.py"]:
+        p = tmp_path / name
+        p.write_text(f"# {name}")
+        paths[p] = name
+    return paths
+
+
+def test_tar_stream(tmp_path: Path) -> None:
+    paths = __write_files(tmp_path)
+    # Large enough to exceed tarfile's stream buffer
+    (tmp_path / "b.py").write_bytes(b"#" * (1 << 16))
+    chunks = list(tar_stream(paths))
+    assert len(chunks) > 1
+    assert max(len(c) for c in chunks) < (1 << 16)
+
+    with tarfile.open(fileobj=io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.getnames() == ["a.py", "b.py"]
+
+
+def test_copy_only_changed(tmp_path: Path) -> None:
+    paths = __write_files(tmp_path)
+    container = FakeContainer()
+    manifest: Dict[str, str] = {}
+
+    copy_into_container(paths, container, PurePath("/src"), manifest)  # type: ignore
+    assert container.uploads == [{"a.py": b"# a.py", "b.py": b"# b.py"}]
+    assert set(manifest.keys()) == {"a.py", "b.py"}
+
+    # Unchanged files are not copied again
+    copy_into_container(paths, container, PurePath("/src"), manifest)  # type: ignore
+    assert len(container.uploads) == 1
+
+    (tmp_path / "b.py").write_text("changed")
+    copy_into_container(paths, container, PurePath("/src"), manifest)  # type: ignore
+    assert container.uploads[1] == {"b.py": b"changed"}
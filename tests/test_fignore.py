@@ -5,7 +5,7 @@ from typing import Collection, Set
 
 import pytest
 from _pytest.monkeypatch import MonkeyPatch
-from bento.fignore import FileIgnore, Parser, Processor, open_ignores
+from bento.fignore import FileIgnore, Matcher, Parser, Processor, open_ignores
 
 THIS_PATH = Path(os.path.dirname(__file__))
 BASE_PATH = (THIS_PATH / "..").resolve()
@@ -78,6 +78,33 @@ def test_ignore_full_path() -> None:
     assert WALK_PATH / "dist/foo/bar.js" not in all_files
 
 
+def test_ignored_dir_is_pruned() -> None:
+    fi = FileIgnore(WALK_PATH, {"dist/"}, [WALK_PATH])
+    all_paths = {e.path for e in fi.entries()}
+    assert WALK_PATH / "dist" in all_paths
+    assert not fi[WALK_PATH / "dist"].survives
+    assert not any(WALK_PATH / "dist" in p.parents for p in all_paths)
+
+
+def test_matcher() -> None:
+    base = Path("/base")
+    patterns = {"foo/", "/init.js", "*.pyc", "dist/foo/", ".b*/", "a/b"}
+    matcher = Matcher(base, Processor(base).process(patterns))
+
+    assert matcher.ignores("/base/x/foo", True)
+    assert not matcher.ignores("/base/x/foo", False)
+    assert matcher.ignores("/base/x/foo/y.js", False)
+    assert matcher.ignores("/base/dist/foo/z.js", False)
+    assert matcher.ignores("/base/init.js", False)
+    assert not matcher.ignores("/base/x/init.js", False)
+    assert matcher.ignores("/base/x/y.pyc", False)
+    assert matcher.ignores("/base/.bento", True)
+    assert matcher.ignores("/base/.bento/config.yml", False)
+    assert matcher.ignores("/base/a/b", False)
+    # Directory rules do not fire on parents of the base path
+    assert not Matcher(Path("/foo/base"), {"**/foo/"}).ignores("/foo/base/z", False)
+
+
 def __parse(text: str, base_path: Path = BASE_PATH) -> Set[str]:
     lines = io.StringIO(text)
     parser = Parser(base_path, Path("test"))
@@ -0,0 +1,38 @@
+import os
+from pathlib import Path
+
+from bento.file_classifier import FileClass, FileClassifier, sniff
+
+
+def test_sniff() -> None:
+    assert sniff(b"#!/usr/bin/env python3\nprint()\n") == FileClass(
+        binary=False, shebang="#!/usr/bin/env python3"
+    )
+    assert sniff(b"#!/bin/sh\r\n") == FileClass(binary=False, shebang="#!/bin/sh")
+    assert sniff(b"print()\n#!/bin/sh\n") == FileClass(binary=False, shebang=None)
+    assert sniff(b"#!\x00\x01") == FileClass(binary=True, shebang=None)
+    assert sniff(b"") == FileClass(binary=False, shebang=None)
+
+
+def test_classify_cached_per_mtime(tmp_path: Path) -> None:
+    path = tmp_path / "script"
+    path.write_text("#!/bin/bash\n")
+    os.utime(path, ns=(0, 0))
+    classifier = FileClassifier()
+
+    assert classifier.shebang(path) == "#!/bin/bash"
+
+    # Unchanged modification times do not re-read the file
+    path.write_text("#!/usr/bin/python\n")
+    os.utime(path, ns=(0, 0))
+    assert classifier.shebang(path) == "#!/bin/bash"
+
+    os.utime(path, ns=(0, 1))
+    assert classifier.shebang(path) == "#!/usr/bin/python"
+
+
+def test_classify_not_a_file(tmp_path: Path) -> None:
+    classifier = FileClassifier()
+
+    assert classifier.classify(tmp_path) is None
+    assert classifier.shebang(tmp_path / "missing") is None
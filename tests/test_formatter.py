@@ -108,3 +108,16 @@ def test_histo_formatter() -> None:
     output = "\n".join(histo_formatter.dump(VIOLATIONS))
 
     assert strip_ansi(output) == expectation
+
+
+def test_streaming_formatters() -> None:
+    for name in ["stylish", "clippy"]:
+        fmt = bento.formatter.for_name(name, NULL_CONTEXT, {})
+        assert fmt.streams
+        assert fmt.dump_tool("r2c.eslint", VIOLATIONS["r2c.eslint"]) == fmt.dump(
+            VIOLATIONS
+        )
+        assert not fmt.dump_tool("r2c.eslint", [])
+
+    for name in ["json", "histo", "reporter"]:
+        assert not bento.formatter.for_name(name, NULL_CONTEXT, {}).streams
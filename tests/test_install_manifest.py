@@ -0,0 +1,44 @@
+from pathlib import Path
+
+from bento.install_manifest import InstallManifest
+
+
+def test_is_current(tmp_path: Path) -> None:
+    installed = tmp_path / "venv"
+    installed.mkdir()
+    manifest_path = tmp_path / "installed.json"
+
+    manifest = InstallManifest(manifest_path)
+    assert not manifest.is_current("tool", "key", [installed])
+    manifest.record("tool", "key", [installed], {"package": "1.0.0"})
+    assert manifest.is_current("tool", "key", [installed])
+
+    # Entries are persisted
+    manifest = InstallManifest(manifest_path)
+    assert manifest.is_current("tool", "key", [installed])
+    assert not manifest.is_current("tool", "other_key", [installed])
+    assert not manifest.is_current("other_tool", "key", [installed])
+
+    # Changing an installation path invalidates the entry
+    (installed / "package").mkdir()
+    assert not manifest.is_current("tool", "key", [installed])
+
+
+def test_missing_path(tmp_path: Path) -> None:
+    installed = tmp_path / "venv"
+    manifest = InstallManifest(tmp_path / "installed.json")
+    manifest.record("tool", "key", [installed], {})
+    assert manifest.is_current("tool", "key", [installed])
+
+    installed.mkdir()
+    assert not manifest.is_current("tool", "key", [installed])
+
+
+def test_wipe(tmp_path: Path) -> None:
+    manifest_path = tmp_path / "installed.json"
+    manifest = InstallManifest(manifest_path)
+    manifest.record("tool", "key", [], {})
+    manifest.wipe()
+
+    assert not manifest.is_current("tool", "key", [])
+    assert not InstallManifest(manifest_path).is_current("tool", "key", [])
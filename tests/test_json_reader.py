@@ -0,0 +1,50 @@
+import io
+import json
+from typing import Any, Dict, List
+
+import pytest
+
+from bento.json_reader import JsonReader
+
+DOCUMENT = {
+    "errors": [{"filename": "foo.py", "reason": "syntax error"}],
+    "metrics": {"foo.py": {"loc": 12345}, "bar.py": {"loc": 0.5}},
+    "results": [
+        {"line": i, "text": f"finding {i}", "ok": i % 2 == 0} for i in range(20)
+    ],
+}
+
+
+def test_items() -> None:
+    values = [1, 12345, -0.5, "a string", None, True, [1, [2]], {"a": {}}]
+    for chunk_size in [1, 3, 1024]:
+        reader = JsonReader(io.StringIO(f" {json.dumps(values)} trailer"), chunk_size)
+
+        assert list(reader.items()) == values
+
+
+def test_members() -> None:
+    for chunk_size in [1, 7, 1024]:
+        reader = JsonReader(io.StringIO(json.dumps(DOCUMENT, indent=2)), chunk_size)
+
+        decoded: Dict[str, Any] = {}
+        results: List[Any] = []
+        for key in reader.members():
+            if key == "results":
+                results = list(reader.items())
+            else:
+                decoded[key] = reader.value()
+
+        assert results == DOCUMENT["results"]
+        assert decoded == {k: v for k, v in DOCUMENT.items() if k != "results"}
+
+
+def test_empty() -> None:
+    assert list(JsonReader(io.StringIO("[]")).items()) == []
+    assert list(JsonReader(io.StringIO("{ }")).members()) == []
+
+
+def test_invalid() -> None:
+    for text in ["", "[1, 2", '[{"a": 1', "[1 2]", "{1: 2}", "{}"]:
+        with pytest.raises(ValueError):
+            list(JsonReader(io.StringIO(text), chunk_size=2).items())
@@ -0,0 +1,62 @@
+from pathlib import Path
+
+from bento.line_index import LineIndex
+from bento.util import fetch_line_in_file
+
+CONTENT = "first\nsecond\r\nthird\rfourth\r\r\n\nünïcode\nlast"
+
+
+def test_matches_fetch_line_in_file(tmp_path: Path) -> None:
+    path = tmp_path / "source.txt"
+    path.write_bytes(CONTENT.encode())
+    index = LineIndex()
+
+    for line_number in range(1, 11):
+        assert index.line(path, line_number) == fetch_line_in_file(path, line_number)
+    assert index.line(path, 2) == "second\n"
+    assert index.line(path, 8) == "last"
+    assert index.line(path, 9) is None
+    index.close()
+
+
+def test_terminated_and_empty_files(tmp_path: Path) -> None:
+    terminated = tmp_path / "terminated.txt"
+    terminated.write_text("a\nb\n")
+    empty = tmp_path / "empty.txt"
+    empty.write_text("")
+    index = LineIndex()
+
+    assert index.line(terminated, 2) == "b\n"
+    assert index.line(terminated, 3) is None
+    assert index.line(empty, 1) is None
+    assert index.line(tmp_path / "missing.txt", 1) is None
+    index.close()
+
+
+def test_reads_file_once(tmp_path: Path) -> None:
+    path = tmp_path / "source.txt"
+    path.write_text("a\nb\n")
+    index = LineIndex()
+
+    assert index.line(path, 1) == "a\n"
+    path.unlink()
+    assert index.line(path, 2) == "b\n"
+    index.close()
+
+
+def test_newline_mode(tmp_path: Path) -> None:
+    path = tmp_path / "source.txt"
+    path.write_bytes(CONTENT.encode() + b"\n\xff")
+    index = LineIndex(encoding="utf-8", errors="replace", newline="\n")
+
+    assert [index.line(path, n) for n in range(1, 9)] == [
+        "first\n",
+        "second\r\n",
+        "third\rfourth\r\r\n",
+        "\n",
+        "ünïcode\n",
+        "last\n",
+        "\ufffd",
+        None,
+    ]
+    index.close()
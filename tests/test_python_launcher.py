@@ -0,0 +1,35 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import bento.tool.runner.python_launcher as python_launcher
+from bento.util import arg_max
+
+SCRIPT = """
+import sys
+
+def main():
+    print(len(sys.argv) - 1, sys.argv[-1], sys.stdin.read() == "")
+    sys.exit(3)
+
+if __name__ == "__main__":
+    main()
+"""
+
+
+def test_launch(tmp_path: Path) -> None:
+    script = tmp_path / "script"
+    script.write_text(SCRIPT)
+    # More arguments than fit on a command line
+    args = [f"{ix:08d}.py" for ix in range(arg_max() // 8)]
+
+    result = subprocess.run(
+        [sys.executable, python_launcher.__file__, str(script)],
+        input=json.dumps(args),
+        stdout=subprocess.PIPE,
+        encoding="utf8",
+    )
+
+    assert result.returncode == 3
+    assert result.stdout == f"{len(args)} {args[-1]} True\n"
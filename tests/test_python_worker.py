@@ -0,0 +1,86 @@
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+import bento.tool.runner.python_worker as python_worker
+
+SCRIPT = """
+import os
+import sys
+import time
+
+def main():
+    if "sleep" in sys.argv:
+        time.sleep(30)
+    sys.stdout.buffer.write(" ".join([os.getcwd(), *sys.argv[1:]]).encode())
+    print("warning", file=sys.stderr)
+    sys.exit(len(sys.argv) - 1)
+
+if __name__ == "__main__":
+    main()
+"""
+
+pytestmark = pytest.mark.skipif(
+    not python_worker.SUPPORTED, reason="Workers require Unix sockets and fork()"
+)
+
+
+def __start(tmp_path: Path, key: str) -> str:
+    script = tmp_path / "script"
+    script.write_text(SCRIPT)
+    socket_path = tmp_path / "worker.sock"
+    worker = subprocess.Popen(
+        [
+            sys.executable,
+            python_worker.__file__,
+            f"--socket={socket_path}",
+            f"--key={key}",
+            "--idle-timeout=30",
+            str(script),
+        ],
+        stdout=subprocess.PIPE,
+    )
+    assert worker.stdout is not None
+    assert worker.stdout.readline() == python_worker.READY
+    return str(socket_path)
+
+
+def test_request(tmp_path: Path) -> None:
+    socket_path = __start(tmp_path, "key")
+
+    for args in [["a.py"], ["a.py", "b.py"]]:
+        returncode, stdout, stderr = python_worker.request(
+            socket_path, "key", str(tmp_path), args
+        )
+        assert returncode == len(args)
+        assert stdout == " ".join([str(tmp_path), *args])
+        assert stderr == "warning\n"
+
+    Path(socket_path).unlink()
+
+
+def test_stale(tmp_path: Path) -> None:
+    socket_path = __start(tmp_path, "old")
+
+    with pytest.raises(python_worker.StaleWorker):
+        python_worker.request(socket_path, "new", str(tmp_path), [])
+    # The stale worker exits
+    with pytest.raises(OSError):
+        python_worker.request(socket_path, "old", str(tmp_path), [])
+
+
+def test_interrupt(tmp_path: Path) -> None:
+    socket_path = __start(tmp_path, "key")
+
+    conn = python_worker.connection()
+    threading.Timer(0.5, python_worker.interrupt, [conn]).start()
+    before = time.time()
+    with pytest.raises(OSError):
+        python_worker.request(socket_path, "key", str(tmp_path), ["sleep"], conn)
+    assert time.time() - before < 10
+
+    Path(socket_path).unlink()
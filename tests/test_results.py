@@ -76,3 +76,32 @@ def test_filter_results() -> None:
     filtered = result.filtered("r2c_eslint", VIOLATIONS, baseline)
     assert filtered[0].filtered
     assert not filtered[1].filtered
+
+
+def test_filter_results_keeps_identifier() -> None:
+    identifiers = [v.syntactic_identifier_int() for v in VIOLATIONS]
+
+    filtered = result.filtered("r2c_eslint", VIOLATIONS, {})
+    assert filtered == VIOLATIONS
+    assert [v._identifier for v in filtered] == identifiers
+
+
+def test_hash_matches_reference() -> None:
+    """Identifiers must not change with the murmur3 implementation in use"""
+    import pymmh3
+
+    import bento.violation
+
+    for key in ["", "a", "console.log(3)" * 7, "¯\\_(ツ)_/¯ 漢字"]:
+        assert bento.violation._hash128(key) == pymmh3.hash128(key)
+
+
+def test_cache_repr_round_trip() -> None:
+    for v in VIOLATIONS:
+        v.syntactic_identifier_str()
+
+    loaded = result.from_cache_repr(result.to_cache_repr(VIOLATIONS))
+    assert loaded == VIOLATIONS
+    assert [v.syntactic_identifier_str() for v in loaded] == [
+        v.syntactic_identifier_str() for v in VIOLATIONS
+    ]
@@ -0,0 +1,84 @@
+from pathlib import Path
+from typing import Callable, Iterable, List, Set
+
+from bento.base_context import BaseContext
+from bento.extra.bandit import BanditTool
+from bento.extra.eslint import EslintTool
+from bento.extra.flake8 import Flake8Tool
+from bento.extra.hadolint import HadolintTool
+from bento.extra.jinjalint import JinjalintTool
+from bento.extra.shellcheck import ShellcheckTool
+from bento.routing import route
+from bento.tool import Tool
+
+FILES = {
+    "a.py": "import os\n",
+    "sub/a.py": "",
+    "b.sh": "echo\n",
+    "python_script": "#!/usr/bin/env python3\n",
+    "shell_script": "#!/bin/bash\n",
+    "not_a_script": "echo\n#!/bin/bash\n",
+    "Dockerfile": "FROM scratch\n",
+    "build.dockerfile": "FROM scratch\n",
+    "index.js": "",
+    "page.html": "",
+    "binary": "#!\0",
+}
+
+
+def __paths(tmp_path: Path) -> List[Path]:
+    paths = []
+    for name, contents in FILES.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(contents)
+        paths.append(path)
+    return paths
+
+
+def __tools(tmp_path: Path) -> List[Tool]:
+    context = BaseContext(
+        base_path=tmp_path,
+        config={"tools": {}},
+        cache_path=tmp_path / "cache",
+        resource_path=tmp_path / "resource",
+    )
+    # Constructors of concrete tools; a list of classes would be typed Type[Tool],
+    # which mypy does not allow instantiating
+    tool_types: List[Callable[[BaseContext], Tool]] = [
+        BanditTool,
+        EslintTool,
+        Flake8Tool,
+        HadolintTool,
+        JinjalintTool,
+        ShellcheckTool,
+    ]
+    return [tool(context) for tool in tool_types]
+
+
+def test_route_matches_filter_paths(tmp_path: Path) -> None:
+    paths = __paths(tmp_path)
+    tools = __tools(tmp_path)
+
+    routes = route(tools, paths)
+
+    for t in tools:
+        assert routes[t.tool_id()] == t.filter_paths(paths), t.tool_id()
+    assert routes["flake8"] == {
+        tmp_path / "a.py",
+        tmp_path / "sub/a.py",
+        tmp_path / "python_script",
+    }
+    assert routes["shellcheck"] == {tmp_path / "b.sh", tmp_path / "shell_script"}
+
+
+def test_route_custom_filter(tmp_path: Path) -> None:
+    paths = __paths(tmp_path)
+
+    class CustomTool(ShellcheckTool):
+        def filter_paths(self, paths: Iterable[Path]) -> Set[Path]:
+            return {p for p in paths if p.name == "Dockerfile"}
+
+    tool = CustomTool(__tools(tmp_path)[0].context)
+
+    assert route([tool], paths) == {"shellcheck": {tmp_path / "Dockerfile"}}
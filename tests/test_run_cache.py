@@ -1,14 +1,43 @@
 import os
-import tempfile
 import time
 from pathlib import Path
-from typing import Tuple
+from typing import Any, Tuple
 
+import attr
+import pytest
 from _pytest.monkeypatch import MonkeyPatch
+
+import bento.cache_format
+from bento.result import to_cache_repr
 from bento.run_cache import RunCache
+from bento.violation import Violation
 
 TOOL_ID = "tool_name_here"
-TOOL_OUTPUT = "this is tool output"
+TOOL_KEY = "tool_key_here"
+TOOL_OUTPUT = [
+    Violation(
+        tool_id=TOOL_ID,
+        check_id="check",
+        path="subdir/hello.txt",
+        line=1,
+        column=2,
+        message="this is tool output",
+        severity=2,
+        syntactic_context="hello",
+    ),
+    Violation(
+        tool_id=TOOL_ID,
+        check_id="другой",
+        path="subdir/hello.txt",
+        line=1,
+        column=0,
+        message="",
+        severity=1,
+        syntactic_context="    indented\n    text",
+        filtered=True,
+        link="https://bento.dev",
+    ),
+]
 THIS_PATH = os.path.dirname(__file__)
 
 
@@ -21,79 +50,249 @@ def __ensure_ubuntu_mtime_change() -> None:
     time.sleep(1e-2)
 
 
-def __hash(tmp_file: Path) -> str:
-    with tempfile.TemporaryDirectory() as cache_dir:
-        return RunCache(cache_dir)._modified_hash([tmp_file])
-
-
-def __setup_test_dir(
-    tmp_path: Path, subdir_name: str = "subdir", touch_file: bool = True
-) -> Tuple[str, Path]:
-    subdir = tmp_path / subdir_name
+def __setup_test_dir(tmp_path: Path) -> Tuple[Path, Path]:
+    subdir = tmp_path / "subdir"
     subdir.mkdir()
     file = subdir / "hello.txt"
-    if touch_file:
-        file.touch()
-    hsh = __hash(file)
-    return hsh, file
+    file.write_text("hello")
+    return tmp_path / "cache", file
 
 
-def test_modified_hash_no_changes(tmp_path: Path) -> None:
-    """modified_hash should not change if no files change"""
+def __populate(cache_path: Path, file: Path) -> None:
+    cache = RunCache(cache_path)
+    hits, misses = cache.get(TOOL_ID, TOOL_KEY, [file])
+    assert not hits
+    assert list(misses.keys()) == [file]
+    cache.put(TOOL_ID, TOOL_KEY, misses, {file: TOOL_OUTPUT})
 
-    hsh, file = __setup_test_dir(tmp_path)
+
+def test_content_hash_no_changes(tmp_path: Path) -> None:
+    """content_hash should not change if file contents do not change"""
+    _, file = __setup_test_dir(tmp_path)
+    hsh = RunCache.content_hash(file)
     __ensure_ubuntu_mtime_change()
+    file.touch()
 
-    assert hsh == __hash(file)
+    assert hsh == RunCache.content_hash(file)
 
 
-def test_modified_hash_new_file_subdir(tmp_path: Path) -> None:
-    """modified_hash should change if a new file in subdir is added"""
-    hsh, file = __setup_test_dir(tmp_path, touch_file=False)
+def test_content_hash_modify(tmp_path: Path) -> None:
+    """content_hash should change if a file is modified"""
+    _, file = __setup_test_dir(tmp_path)
+    hsh = RunCache.content_hash(file)
+    file.write_text("goodbye")
 
-    file.touch()
+    assert hsh != RunCache.content_hash(file)
 
-    assert hsh != __hash(file)
 
+def test_get(tmp_path: Path) -> None:
+    cache_path, file = __setup_test_dir(tmp_path)
+    __populate(cache_path, file)
 
-def test_modified_hash_touch(tmp_path: Path) -> None:
-    """modified_hash should change if a file is modified"""
+    # Check cache is retrievable
+    cache = RunCache(cache_path)
+    hits, misses = cache.get(TOOL_ID, TOOL_KEY, [file])
+    assert hits == {file: TOOL_OUTPUT}
+    assert not misses
 
-    hsh, file = __setup_test_dir(tmp_path)
+    # Check that touching file does not invalidate cache
     __ensure_ubuntu_mtime_change()
     file.touch()
 
-    assert hsh != __hash(file)
+    cache = RunCache(cache_path)
+    hits, _ = cache.get(TOOL_ID, TOOL_KEY, [file])
+    assert hits == {file: TOOL_OUTPUT}
+
+    # Check that modifying file invalidates cache
+    file.write_text("goodbye")
+
+    cache = RunCache(cache_path)
+    hits, misses = cache.get(TOOL_ID, TOOL_KEY, [file])
+    assert not hits
+    assert list(misses.keys()) == [file]
+
 
+def test_lookup(tmp_path: Path) -> None:
+    """Results should be retrievable by content hash, without reading files"""
+    cache_path, file = __setup_test_dir(tmp_path)
+    __populate(cache_path, file)
+    hello = RunCache.data_hash(b"hello")
+    assert hello == RunCache.content_hash(file)
+    file.write_text("goodbye")
 
-def test_modified_hash_remove(tmp_path: Path) -> None:
-    """modified_hash should change if a file is removed"""
+    cache = RunCache(cache_path)
+    assert cache.lookup(TOOL_ID, TOOL_KEY, {file: hello}) == {file: TOOL_OUTPUT}
+    assert cache.lookup(TOOL_ID, TOOL_KEY, {file: RunCache.content_hash(file)}) is None
+    assert cache.lookup(TOOL_ID, TOOL_KEY, {file: hello, file.parent: hello}) is None
 
-    hsh, file = __setup_test_dir(tmp_path)
+
+def test_get_only_modified(tmp_path: Path) -> None:
+    """Modifying a file should not invalidate the cache for other files"""
+    cache_path, file = __setup_test_dir(tmp_path)
+    other = file.parent / "other.txt"
+    other.write_text("other")
+
+    cache = RunCache(cache_path)
+    _, misses = cache.get(TOOL_ID, TOOL_KEY, [file, other])
+    cache.put(TOOL_ID, TOOL_KEY, misses, {file: TOOL_OUTPUT, other: []})
+
+    other.write_text("modified")
+
+    cache = RunCache(cache_path)
+    hits, misses = cache.get(TOOL_ID, TOOL_KEY, [file, other])
+    assert hits == {file: TOOL_OUTPUT}
+    assert list(misses.keys()) == [other]
+
+
+def test_get_new_key(tmp_path: Path) -> None:
+    """Changing the tool key should invalidate the cache"""
+    cache_path, file = __setup_test_dir(tmp_path)
+    __populate(cache_path, file)
+
+    cache = RunCache(cache_path)
+    hits, misses = cache.get(TOOL_ID, "another_key", [file])
+    assert not hits
+    assert list(misses.keys()) == [file]
+
+
+def test_get_removed(tmp_path: Path) -> None:
+    """Removed files should not be cached"""
+    cache_path, file = __setup_test_dir(tmp_path)
+    __populate(cache_path, file)
     file.unlink()
 
-    assert hsh != __hash(file)
+    cache = RunCache(cache_path)
+    hits, misses = cache.get(TOOL_ID, TOOL_KEY, [file])
+    assert not hits
+    assert misses == {file: None}
+
+
+def test_wipe(tmp_path: Path) -> None:
+    cache_path, file = __setup_test_dir(tmp_path)
+    __populate(cache_path, file)
+
+    cache = RunCache(cache_path)
+    cache.wipe()
+    hits, _ = cache.get(TOOL_ID, TOOL_KEY, [file])
+    assert not hits
+
+
+def test_round_trip(tmp_path: Path) -> None:
+    """All violation fields should be restored from the cache"""
+    cache_path, file = __setup_test_dir(tmp_path)
+    __populate(cache_path, file)
+
+    hits, _ = RunCache(cache_path).get(TOOL_ID, TOOL_KEY, [file])
+    for expected, actual in zip(TOOL_OUTPUT, hits[file]):
+        assert attr.astuple(actual) == attr.astuple(expected)
+        assert actual.syntactic_identifier_str() == expected.syntactic_identifier_str()
+
+
+def test_get_invalid(tmp_path: Path) -> None:
+    """Invalid cache files should be ignored"""
+    cache_path, file = __setup_test_dir(tmp_path)
+    __populate(cache_path, file)
+    cache_file = cache_path / f"{TOOL_ID}.bin"
+    cache_file.write_bytes(cache_file.read_bytes()[:-1])
+
+    cache = RunCache(cache_path)
+    hits, misses = cache.get(TOOL_ID, TOOL_KEY, [file])
+    assert not hits
+    assert list(misses.keys()) == [file]
+
+
+def test_put_preserves_other_files(tmp_path: Path) -> None:
+    """Rewriting the cache should preserve results of files that were not re-run"""
+    cache_path, file = __setup_test_dir(tmp_path)
+    other = file.parent / "other.txt"
+    other.write_text("other")
+
+    cache = RunCache(cache_path)
+    _, misses = cache.get(TOOL_ID, TOOL_KEY, [file, other])
+    cache.put(TOOL_ID, TOOL_KEY, misses, {file: TOOL_OUTPUT, other: []})
+
+    other.write_text("modified")
+    cache = RunCache(cache_path)
+    _, misses = cache.get(TOOL_ID, TOOL_KEY, [other])
+    cache.put(TOOL_ID, TOOL_KEY, misses, {other: TOOL_OUTPUT[:1]})
+
+    cache = RunCache(cache_path)
+    hits, misses = cache.get(TOOL_ID, TOOL_KEY, [file, other])
+    assert hits == {file: TOOL_OUTPUT, other: TOOL_OUTPUT[:1]}
+    assert not misses
+
+
+def test_get_prunes_removed_files(tmp_path: Path) -> None:
+    """Files missing from a walked directory should have their results dropped"""
+    cache_path, file = __setup_test_dir(tmp_path)
+    other = file.parent / "other.txt"
+    other.write_text("other")
+    outside = tmp_path / "outside.txt"
+    outside.write_text("outside")
+
+    cache = RunCache(cache_path)
+    _, misses = cache.get(TOOL_ID, TOOL_KEY, [file, other, outside])
+    cache.put(TOOL_ID, TOOL_KEY, misses, {file: TOOL_OUTPUT, other: [], outside: []})
+
+    other.unlink()
+    file.write_text("modified")
+    cache = RunCache(cache_path)
+    _, misses = cache.get(TOOL_ID, TOOL_KEY, [file], walked=[file.parent])
+    cache.put(TOOL_ID, TOOL_KEY, misses, {file: []})
+
+    exported = RunCache(cache_path).export(TOOL_ID)
+    assert exported is not None
+    assert set(exported["files"]) == {str(file), str(outside)}
+
+
+def test_get_run(tmp_path: Path) -> None:
+    """Whole-run results should be reused only if no file changed"""
+    cache_path, file = __setup_test_dir(tmp_path)
+    other = file.parent / "other.txt"
+    other.write_text("other")
+
+    cache = RunCache(cache_path)
+    results, states = cache.get_run(TOOL_ID, TOOL_KEY, [file, other])
+    assert results is None
+    cache.put_run(TOOL_ID, TOOL_KEY, states, TOOL_OUTPUT)
+
+    cache = RunCache(cache_path)
+    results, _ = cache.get_run(TOOL_ID, TOOL_KEY, [file, other])
+    assert results == TOOL_OUTPUT
+    digests = {p: RunCache.content_hash(p) for p in [file, other]}
+    assert cache.lookup_run(TOOL_ID, TOOL_KEY, digests) == TOOL_OUTPUT
+
+    # Any changed, removed, or added file invalidates the run
+    assert RunCache(cache_path).get_run(TOOL_ID, TOOL_KEY, [file])[0] is None
+    assert RunCache(cache_path).get_run(TOOL_ID, "other_key", [file, other])[0] is None
+    __ensure_ubuntu_mtime_change()
+    other.write_text("modified")
+    results, states = RunCache(cache_path).get_run(TOOL_ID, TOOL_KEY, [file, other])
+    assert results is None
 
 
-def test_get(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
-    _, file = __setup_test_dir(tmp_path)
+def test_put_failed_write(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    """A failed cache write should not leave a partial cache file behind"""
+    cache_path, file = __setup_test_dir(tmp_path)
 
-    paths = [file]
+    def write(path: Path, *args: Any) -> None:
+        path.write_bytes(b"partial")
+        raise OSError("No space left on device")
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        cache_path = Path(tmpdir)
+    monkeypatch.setattr(bento.cache_format, "write", write)
+    cache = RunCache(cache_path)
+    _, misses = cache.get(TOOL_ID, TOOL_KEY, [file])
+    with pytest.raises(OSError):
+        cache.put(TOOL_ID, TOOL_KEY, misses, {file: TOOL_OUTPUT})
 
-        # Check cache is retrievable
-        cache = RunCache(cache_path)
-        assert cache.get(TOOL_ID, paths) is None
-        cache.put(TOOL_ID, paths, TOOL_OUTPUT)
+    assert not list(cache_path.iterdir())
 
-        cache = RunCache(cache_path)
-        assert cache.get(TOOL_ID, paths) == TOOL_OUTPUT
 
-        # Check that modifying file invalidates cache
-        __ensure_ubuntu_mtime_change()
-        file.touch()
+def test_export(tmp_path: Path) -> None:
+    cache_path, file = __setup_test_dir(tmp_path)
+    __populate(cache_path, file)
 
-        cache = RunCache(cache_path)
-        assert cache.get(TOOL_ID, paths) is None
+    exported = RunCache(cache_path).export(TOOL_ID)
+    assert exported is not None
+    assert exported["key"] == TOOL_KEY
+    assert exported["files"][str(file)]["results"] == to_cache_repr(TOOL_OUTPUT)
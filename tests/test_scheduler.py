@@ -0,0 +1,134 @@
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from bento.scheduler import DEFAULT_DURATION, RunCancelled, Scheduler
+
+SLEEP = [sys.executable, "-c", "import time; time.sleep(60)"]
+
+
+def test_slots_bounded() -> None:
+    scheduler = Scheduler(jobs=2)
+    lock = threading.Lock()
+    running: List[int] = [0]
+    max_running: List[int] = [0]
+
+    def work() -> None:
+        with scheduler.slot("tool"):
+            with lock:
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+
+    assert max_running[0] == 2
+
+
+def test_longest_first(tmp_path: Path) -> None:
+    scheduler = Scheduler(jobs=1)
+    for tool_id, duration in [("short", 1.0), ("medium", 5.0), ("long", 10.0)]:
+        scheduler.record(tool_id, duration)
+
+    started: List[str] = []
+
+    def work(tool_id: str) -> None:
+        with scheduler.slot(tool_id):
+            started.append(tool_id)
+
+    # Occupy the only slot until all other tools are waiting
+    with scheduler.slot("long"):
+        threads = [
+            threading.Thread(target=work, args=(t,))
+            for t in ["short", "long", "medium"]
+        ]
+        for th in threads:
+            th.start()
+        while len(scheduler._waiting) < len(threads):
+            time.sleep(0.01)
+
+    for th in threads:
+        th.join()
+
+    assert started == ["long", "medium", "short"]
+
+
+def test_estimates_persisted(tmp_path: Path) -> None:
+    history_path = tmp_path / "durations.json"
+    scheduler = Scheduler(jobs=1, history_path=history_path)
+    assert scheduler.estimate("tool") == DEFAULT_DURATION
+
+    scheduler.record("tool", 4.0)
+    scheduler.record("tool", 2.0)
+
+    scheduler = Scheduler(jobs=1, history_path=history_path)
+    assert scheduler.estimate("tool") == 3.0
+    # Unknown tools are estimated as the longest known tool
+    assert scheduler.estimate("other") == 3.0
+
+
+def test_run() -> None:
+    scheduler = Scheduler(jobs=1)
+    result = scheduler.run(
+        [sys.executable, "-c", "print(input())"],
+        input="text",
+        capture_output=True,
+        encoding="utf8",
+    )
+    assert result.returncode == 0
+    assert result.stdout == "text\n"
+
+    with pytest.raises(subprocess.CalledProcessError):
+        scheduler.run([sys.executable, "-c", "exit(1)"], check=True)
+
+
+def test_cancel() -> None:
+    scheduler = Scheduler(jobs=1)
+    errors: List[Exception] = []
+
+    def work() -> None:
+        try:
+            with scheduler.slot("tool"):
+                scheduler.run(SLEEP)
+        except RunCancelled as e:
+            errors.append(e)
+
+    # One thread runs a subprocess, while the other waits for a slot
+    threads = [threading.Thread(target=work) for _ in range(2)]
+    for th in threads:
+        th.start()
+    while not (scheduler._kills and scheduler._waiting):
+        time.sleep(0.01)
+    before = time.monotonic()
+    scheduler.cancel()
+    for th in threads:
+        th.join()
+
+    assert time.monotonic() - before < 10
+    assert len(errors) == 2
+    assert not scheduler._kills
+
+    with pytest.raises(RunCancelled):
+        with scheduler.slot("tool"):
+            pass
+
+
+def test_cancel_shielded() -> None:
+    scheduler = Scheduler(jobs=1)
+    scheduler.cancel()
+
+    with scheduler.shielded(), scheduler.slot("tool"):
+        result = scheduler.run([sys.executable, "-c", "exit(3)"])
+
+    assert result.returncode == 3
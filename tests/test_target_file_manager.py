@@ -0,0 +1,98 @@
+import re
+import subprocess
+from pathlib import Path
+from typing import Iterable, Pattern
+
+import attr
+from _pytest.monkeypatch import MonkeyPatch
+
+import bento.orchestrator
+from bento.run_cache import RunCache
+from bento.target_file_manager import TargetFileManager
+from tests.test_tool import ToolFixture, context_for, result_for
+
+
+def __git(repo: Path, *args: str) -> None:
+    subprocess.run(
+        ["git", "-c", "user.name=bento", "-c", "user.email=bento@example.com", *args],
+        cwd=repo,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def __repo(tmp_path: Path, monkeypatch: MonkeyPatch) -> Path:
+    """
+    Creates a repository with a committed, a modified, and an added file
+    """
+    repo = (tmp_path / "repo").resolve()
+    repo.mkdir()
+    (repo / ".bentoignore").write_text("")
+    (repo / "same.py").write_text("same\n")
+    (repo / "modified.py").write_text("committed\n")
+    __git(repo, "init", "-q")
+    __git(repo, "add", ".")
+    __git(repo, "commit", "-q", "-m", "initial")
+
+    (repo / "modified.py").write_text("staged\n")
+    (repo / "added.py").write_text("added\n")
+    __git(repo, "add", ".")
+    monkeypatch.chdir(repo)
+    return repo
+
+
+def __manager(repo: Path) -> TargetFileManager:
+    return TargetFileManager(repo, [repo], True, repo / ".bentoignore")
+
+
+def test_head_digests(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    repo = __repo(tmp_path, monkeypatch)
+
+    assert __manager(repo).head_digests() == {
+        repo / "modified.py": RunCache.data_hash(b"committed\n")
+    }
+
+
+def test_head_context_overlays_head_paths(
+    tmp_path: Path, monkeypatch: MonkeyPatch
+) -> None:
+    repo = __repo(tmp_path, monkeypatch)
+    files = [repo / "same.py", repo / "modified.py", repo / "added.py"]
+    mtimes = [p.stat().st_mtime_ns for p in files]
+
+    with __manager(repo).head_context() as (head, paths):
+        assert paths == [head / "modified.py"]
+        assert (head / "modified.py").read_text() == "committed\n"
+        assert (head / "same.py").resolve() == repo / "same.py"
+        assert (head / "added.py").resolve() == repo / "added.py"
+    assert not head.exists()
+
+    assert (repo / "modified.py").read_text() == "staged\n"
+    assert [p.stat().st_mtime_ns for p in files] == mtimes
+
+
+def test_head_comparison_keeps_working_tree(
+    tmp_path: Path, monkeypatch: MonkeyPatch
+) -> None:
+    """Running tools on HEAD should not modify any file in the working tree"""
+    repo = __repo(tmp_path, monkeypatch)
+    files = [repo / "same.py", repo / "modified.py", repo / "added.py"]
+    mtimes = [p.stat().st_mtime_ns for p in files]
+
+    @attr.s
+    class ContentTool(ToolFixture):
+        @property
+        def file_name_filter(self) -> Pattern:
+            return re.compile(r".*\.py")
+
+        def run(self, files: Iterable[str]) -> str:
+            return ",".join(Path(f).read_text().strip() for f in files)
+
+    tool = ContentTool(context_for(tmp_path, "test", base_path=repo))
+    baseline, _ = bento.orchestrator._calculate_head_comparison(__manager(repo), [tool])
+
+    # Results were not cached, so the tool ran on HEAD's version of the file
+    assert baseline == {
+        "test": {result_for(Path("committed")).syntactic_identifier_str()}
+    }
+    assert [p.stat().st_mtime_ns for p in files] == mtimes
@@ -0,0 +1,94 @@
+import os
+import time
+from pathlib import Path
+from typing import List, Set
+
+from _pytest.monkeypatch import MonkeyPatch
+from bento.fignore import FileIgnore
+from bento.target_index import TargetIndex, index_key
+
+PATTERNS = {"node_modules/", "*.pyc"}
+
+
+def __tree(base: Path) -> None:
+    for p in ["a.py", "a.pyc", "src/b.py", "src/lib/c.py", "node_modules/d/e.js"]:
+        (base / p).parent.mkdir(parents=True, exist_ok=True)
+        (base / p).write_text("")
+    # Recently modified directories are always rescanned
+    past = time.time() - 60
+    for d in [base, base / "src", base / "src" / "lib"]:
+        os.utime(d, (past, past))
+
+
+def __kept(base: Path, index_path: Path, patterns: Set[str] = PATTERNS) -> Set[Path]:
+    fi = FileIgnore(base, patterns, [base], index_path=index_path)
+    return {e.path for e in fi.entries() if e.survives}
+
+
+def __count_scans(monkeypatch: MonkeyPatch) -> List[str]:
+    scanned: List[str] = []
+    scan = FileIgnore._scan
+
+    def counting_scan(self: FileIgnore, this_path: str) -> List:
+        scanned.append(this_path)
+        return scan(self, this_path)
+
+    monkeypatch.setattr(FileIgnore, "_scan", counting_scan)
+    return scanned
+
+
+def test_matches_walk(tmp_path: Path) -> None:
+    base = tmp_path / "project"
+    __tree(base)
+    index_path = tmp_path / "targets.json"
+    expected = {base / "a.py", base / "src/b.py", base / "src/lib/c.py"}
+
+    assert {
+        e.path for e in FileIgnore(base, PATTERNS, [base]).entries() if e.survives
+    } == expected
+    assert __kept(base, index_path) == expected
+    assert index_path.exists()
+    assert __kept(base, index_path) == expected
+
+
+def test_rescans_changed_directories(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    base = tmp_path / "project"
+    __tree(base)
+    index_path = tmp_path / "targets.json"
+    __kept(base, index_path)
+
+    scanned = __count_scans(monkeypatch)
+    __kept(base, index_path)
+    assert scanned == []
+
+    (base / "src" / "new.py").write_text("")
+    assert base / "src/new.py" in __kept(base, index_path)
+    assert scanned == [str(base / "src")]
+
+
+def test_forgets_removed_directories(tmp_path: Path) -> None:
+    base = tmp_path / "project"
+    __tree(base)
+    index_path = tmp_path / "targets.json"
+    __kept(base, index_path)
+
+    for p in ["src/lib/c.py", "src/lib", "src/b.py", "src"]:
+        path = base / p
+        if path.is_dir():
+            path.rmdir()
+        else:
+            path.unlink()
+    assert __kept(base, index_path) == {base / "a.py"}
+
+    key = index_key(base, FileIgnore(base, PATTERNS, [base])._processed_patterns)
+    index = TargetIndex(index_path, key)
+    assert set(index._dirs) == {str(base)}
+
+
+def test_discarded_when_patterns_change(tmp_path: Path) -> None:
+    base = tmp_path / "project"
+    __tree(base)
+    index_path = tmp_path / "targets.json"
+    __kept(base, index_path)
+
+    assert base / "a.pyc" in __kept(base, index_path, {"node_modules/"})
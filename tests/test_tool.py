@@ -1,11 +1,29 @@
 import os
 import re
+import subprocess
+import sys
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Pattern, Type, Union
-
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    TextIO,
+    Type,
+    Union,
+)
+
+import pytest
 from bento.base_context import BaseContext
+from bento.json_reader import JsonReader
 from bento.parser import Parser
+from bento.run_cache import RunCache
+from bento.scheduler import RunCancelled
 from bento.tool import output
+from bento.util import arg_max, arg_size, environment_size
 from bento.violation import Violation
 
 THIS_PATH = Path(os.path.dirname(__file__))
@@ -123,3 +141,183 @@ def test_tool_run_ignores(tmp_path: Path) -> None:
     result = tool.results([_relpath("test_tool.py")])
 
     assert not result
+
+
+def test_tool_run_cached(tmp_path: Path) -> None:
+    base_path = tmp_path / "base"
+    base_path.mkdir()
+    first = base_path / "test_tool.py"
+    second = base_path / "sub" / "test_tool.py"
+    second.parent.mkdir()
+    first.write_text("first")
+    second.write_text("second")
+
+    runs: List[List[str]] = []
+
+    class CountingToolFixture(ToolFixture):
+        def run(self, files: Iterable[str]) -> str:
+            runs.append(list(files))
+            return super().run(runs[-1])
+
+    tool = CountingToolFixture(tmp_path, base_path=base_path)
+    expectation = {result_for(first), result_for(second)}
+
+    assert set(tool.results([first, second])) == expectation
+    assert len(runs) == 1
+
+    # Unchanged files should not be re-run
+    assert set(tool.results([first, second])) == expectation
+    assert len(runs) == 1
+
+    # Only modified files should be re-run
+    second.write_text("modified")
+    assert set(tool.results([first, second])) == expectation
+    assert runs[-1] == [str(second)]
+
+
+def test_tool_cached_results(tmp_path: Path) -> None:
+    base_path = tmp_path / "base"
+    base_path.mkdir()
+    path = base_path / "test_tool.py"
+    path.write_text("committed")
+
+    tool = ToolFixture(tmp_path, base_path=base_path)
+    tool.results([path])
+    path.write_text("staged")
+
+    committed = RunCache.data_hash(b"committed")
+    assert tool.cached_results({path: committed}) == [result_for(path)]
+    assert tool.cached_results({path: RunCache.data_hash(b"staged")}) is None
+    # Paths this tool does not run on need no cached results
+    assert tool.cached_results({path: committed, base_path / "other.py": ""}) == [
+        result_for(path)
+    ]
+
+
+def test_tool_run_sharded(tmp_path: Path) -> None:
+    base_path = tmp_path / "base"
+    paths = [base_path / d / "test_tool.py" for d in ["a", "b", "c", "d"]]
+    for ix, p in enumerate(paths):
+        p.parent.mkdir(parents=True)
+        p.write_text("x" * (ix + 1) * 100)
+
+    runs: List[List[str]] = []
+
+    class CountingToolFixture(ToolFixture):
+        def run(self, files: Iterable[str]) -> str:
+            runs.append(list(files))
+            return super().run(runs[-1])
+
+    tool = CountingToolFixture(tmp_path, base_path=base_path, config={"parallelism": 2})
+    result = tool.results(list(reversed(paths)), use_cache=False)
+
+    assert result == [result_for(p) for p in paths]
+    # Shards are balanced by file size
+    assert sorted(runs) == [
+        [str(paths[0]), str(paths[3])],
+        [str(paths[1]), str(paths[2])],
+    ]
+
+
+def test_tool_run_batched(tmp_path: Path) -> None:
+    base_path = tmp_path / "base"
+    paths = [base_path / d / "test_tool.py" for d in ["a", "b", "c", "dd"]]
+    for p in paths:
+        p.parent.mkdir(parents=True)
+        p.touch()
+    # Fits two of the shorter paths, but not the longer one with any other
+    max_bytes = 2 * arg_size(str(paths[0]))
+
+    runs: List[List[str]] = []
+
+    class BatchedToolFixture(ToolFixture):
+        @classmethod
+        def max_batch_bytes(cls) -> int:
+            return max_bytes
+
+        def run(self, files: Iterable[str]) -> str:
+            runs.append(list(files))
+            return super().run(runs[-1])
+
+    tool = BatchedToolFixture(tmp_path, base_path=base_path)
+    result = tool.results(paths, use_cache=False)
+
+    assert sorted(result) == sorted(result_for(p) for p in paths)
+    # Batches are limited by their paths' total size
+    assert sorted(f for r in runs for f in r) == [str(p) for p in paths]
+    assert all(sum(arg_size(f) for f in r) <= max_bytes for r in runs)
+    assert len(runs) == 3
+
+
+def test_tool_max_batch_bytes() -> None:
+    # Default batches fit on a command line, and are not split by count
+    assert 0 < ToolFixture.max_batch_bytes() < arg_max() - environment_size()
+    assert ToolFixture.max_batch_size() == sys.maxsize
+
+
+def test_tool_run_streamed(tmp_path: Path) -> None:
+    paths = [_relpath("test_tool.py"), _relpath("test_run_cache.py")]
+    parsed: List[str] = []
+
+    class StreamingParserFixture(ParserFixture):
+        def parse(self, tool_output: str) -> List[Violation]:
+            parsed.append(tool_output)
+            return super().parse(tool_output)
+
+    class StreamingToolFixture(ToolFixture):
+        @property
+        def file_name_filter(self) -> Pattern:
+            return re.compile(r"test_(tool|run_cache)\.py")
+
+        @property
+        def parser_type(self) -> Type[Parser]:
+            return StreamingParserFixture
+
+        def stream(self, files: Iterable[str]) -> Iterator[str]:
+            yield from sorted(files)
+
+    result = StreamingToolFixture(tmp_path).results(paths, use_cache=False)
+
+    assert result == [result_for(p) for p in sorted(paths)]
+    # Each part is parsed on its own
+    assert parsed == sorted(str(p) for p in paths)
+
+
+def test_tool_execute_streaming(tmp_path: Path) -> None:
+    tool = ToolFixture(tmp_path)
+    script = (
+        "import sys; print('[' + sys.stdin.read() + ', 1, 2] trailer'); sys.exit(1)"
+    )
+
+    def parse(stdout: TextIO) -> Iterator[int]:
+        return JsonReader(stdout).items()
+
+    command = [sys.executable, "-c", script]
+    assert list(tool.execute_streaming(command, parse, input="0")) == [0, 1, 2]
+    # The command fails, or its output is invalid
+    with pytest.raises(subprocess.CalledProcessError):
+        list(tool.execute_streaming(command, parse, lambda c: c == 0, input="0"))
+    with pytest.raises(subprocess.CalledProcessError):
+        list(tool.execute_streaming(command, parse, input="}"))
+
+
+def test_tool_execute_streaming_cancelled(tmp_path: Path) -> None:
+    tool = ToolFixture(tmp_path)
+    script = "import time; print('[0,', flush=True); time.sleep(60); print('1]')"
+
+    def parse(stdout: TextIO) -> Iterator[int]:
+        return JsonReader(stdout, chunk_size=1).items()
+
+    items = tool.execute_streaming([sys.executable, "-c", script], parse)
+    # The command is killed while its output is parsed
+    assert next(items) == 0
+    tool.context.scheduler.cancel()
+    with pytest.raises(RunCancelled):
+        list(items)
+
+
+def test_tool_invalid_parallelism(tmp_path: Path) -> None:
+    tool = ToolFixture(tmp_path, config={"parallelism": 0})
+
+    with pytest.raises(ValueError):
+        tool.results([_relpath("test_tool.py")])
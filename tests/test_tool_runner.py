@@ -1,5 +1,7 @@
+import sys
+import time
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Set, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Set, TextIO, Tuple
 
 import bento.cli
 import bento.context
@@ -7,7 +9,9 @@ import bento.result
 import bento.tool_runner
 import pytest
 from _pytest.monkeypatch import MonkeyPatch
+from bento.scheduler import RunCancelled
 from bento.violation import Violation
+from tests.test_tool import ToolFixture, context_for
 
 THIS_PATH = Path(__file__).parent
 BASE_PATH = THIS_PATH.parent
@@ -104,3 +108,68 @@ def test_tool_runner_no_yml() -> None:
     runner = bento.tool_runner.Runner(use_cache=True, paths=[Path.cwd()])
     args = [runner, [], set(), None]
     pytest.raises(Exception, bento.tool_runner.Runner.parallel_results, *args)
+
+
+def test_tool_parallel_results_on_result(monkeypatch: MonkeyPatch) -> None:
+    """Validates that each tool's results are passed to on_result as the tool completes"""
+    monkeypatch.chdir(BASE_PATH / "tests/integration/simple")
+    context = bento.context.Context()
+    tools = list(context.tools.values())
+    completed: List[str] = []
+
+    def on_result(result: bento.tool_runner.RunResults) -> List[str]:
+        completed.append(result[0])
+        return []
+
+    results = bento.tool_runner.Runner(
+        paths=[context.base_path], use_cache=True
+    ).parallel_results(tools, {}, on_result=on_result)
+
+    assert sorted(completed) == sorted(t.tool_id() for t in tools)
+    assert [tid for tid, _ in results] == [t.tool_id() for t in tools]
+
+
+def test_tool_parallel_results_fail_fast(tmp_path: Path) -> None:
+    """Validates that a finding cancels all tools as soon as it is parsed"""
+    sleep = [sys.executable, "-c", "import time; time.sleep(60)"]
+
+    class FindingTool(ToolFixture):
+        def stream(self, files: Iterable[str]) -> Iterator[str]:
+            yield ",".join(files)
+
+            def parse(stdout: TextIO) -> Iterator[str]:
+                return iter(stdout)
+
+            yield from self.execute_streaming(sleep, parse)
+
+    class SlowTool(ToolFixture):
+        @classmethod
+        def tool_id(self) -> str:
+            return "slow"
+
+        def run(self, files: Iterable[str]) -> str:
+            self.execute(sleep)
+            return ""
+
+    context = context_for(tmp_path, "test")
+    context.config["tools"]["slow"] = {}
+    tools = [FindingTool(tmp_path), SlowTool(tmp_path)]
+    for t in tools:
+        t.context = context
+
+    before = time.time()
+    results = dict(
+        bento.tool_runner.Runner(
+            paths=[THIS_PATH / "test_tool.py"],
+            use_cache=False,
+            skip_setup=True,
+            fail_fast=True,
+        ).parallel_results(tools, {})
+    )
+
+    assert time.time() - before < 30
+    # Findings found before the run was cancelled are reported
+    found = results["test"]
+    assert isinstance(found, list)
+    assert [Path(v.path).name for v in found] == ["test_tool.py"]
+    assert isinstance(results["slow"], RunCancelled)
@@ -0,0 +1,87 @@
+import io
+import json
+from contextlib import contextmanager
+from typing import Iterator, List
+
+import pytest
+
+import bento.tracing as tracing
+
+
+@contextmanager
+def __tracing() -> Iterator[tracing.Tracer]:
+    """Starts tracing, stopping it even if the test fails"""
+    tracer = tracing.start()
+    try:
+        yield tracer
+    finally:
+        tracing.stop()
+
+
+def test_spans_not_recorded_unless_started() -> None:
+    with tracing.span("tool.run", tool="r2c.flake8"):
+        pass
+    assert tracing.stop() is None
+
+
+def test_nested_spans() -> None:
+    with __tracing() as tracer:
+        with tracing.span("run.check"):
+            for _ in range(2):
+                with tracing.span("tool.run", tool="r2c.flake8"):
+                    pass
+        with tracing.span("tool.run"):
+            pass
+
+        assert tracing.stop() is tracer
+    outer = next(s for s in tracer.spans if s.name == "run.check")
+    for inner in tracer.spans:
+        if inner.args:
+            assert outer.start <= inner.start
+            assert inner.start + inner.duration <= outer.start + outer.duration
+
+    labels = [label for label, _, _, _ in tracer.summary()]
+    assert labels == ["run.check", "tool.run [r2c.flake8]", "tool.run"]
+    count, total, longest = tracer.summary()[1][1:]
+    assert count == 2
+    assert longest <= total
+    assert "tool.run [r2c.flake8]" in tracer.format_summary()
+
+
+def test_chrome_trace() -> None:
+    with __tracing() as tracer:
+        with tracing.span("tool.parse", tool="r2c.eslint"):
+            pass
+
+    stream = io.StringIO()
+    tracer.write_chrome_trace(stream)
+    events = json.loads(stream.getvalue())["traceEvents"]
+
+    assert {e["ph"] for e in events} == {"M", "X"}
+    (span,) = [e for e in events if e["ph"] == "X"]
+    assert span["name"] == "tool.parse [r2c.eslint]"
+    assert span["cat"] == "tool"
+    assert span["args"] == {"tool": "r2c.eslint"}
+    assert span["dur"] >= 0
+
+
+def test_traced() -> None:
+    calls: List[str] = []
+
+    @contextmanager
+    def stash() -> Iterator[str]:
+        calls.append("enter")
+        try:
+            yield "stashed"
+        finally:
+            calls.append("exit")
+
+    with __tracing() as tracer:
+        with tracing.traced(stash(), "git.stash", "git.unstash") as value:
+            assert value == "stashed"
+        with pytest.raises(ValueError):
+            with tracing.traced(stash(), "git.stash", "git.unstash"):
+                raise ValueError()
+
+    assert calls == ["enter", "exit", "enter", "exit"]
+    assert [s.name for s in tracer.spans] == ["git.stash", "git.unstash"] * 2